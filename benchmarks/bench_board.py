@@ -0,0 +1,134 @@
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from tetris_engine import GRID_WIDTH, GRID_HEIGHT, SHAPES, WALL_MARGIN, Block, TetrisEngine
+
+# Porównanie starej planszy (lista list) z maskami bitowymi w TetrisEngine.
+# Uruchomienie: python benchmarks/bench_board.py
+
+
+def valid_move_lists(grid, block, x_offset=0, y_offset=0):
+    for y, row in enumerate(block.shape):
+        for x, cell in enumerate(row):
+            if cell:
+                new_x = block.x + x + x_offset
+                new_y = block.y + y + y_offset
+                if (new_x < 0 or new_x >= GRID_WIDTH or
+                    new_y >= GRID_HEIGHT or
+                    (new_y >= 0 and grid[new_y][new_x])):
+                    return False
+    return True
+
+
+def clear_lines_lists(game, grid):
+    # Dawne Game.clear_lines bez animacji mignięcia
+    lines_to_clear = [i for i, row in enumerate(grid) if all(row)]
+    for i in lines_to_clear:
+        del grid[i]
+        grid.insert(0, [0 for _ in range(GRID_WIDTH)])
+
+    lines_cleared = len(lines_to_clear)
+    if lines_cleared > 0:
+        game.lines_cleared += lines_cleared
+        game.score += [100, 300, 500, 800][lines_cleared - 1] * game.level
+        if game.lines_cleared // 10 > (game.lines_cleared - lines_cleared) // 10:
+            game.level += 1
+            game.fall_speed = max(0.05, game.fall_speed * 0.8)
+
+
+def random_board(rng, height, full_rows):
+    # Stos o zadanej wysokości z dziurami, z kilkoma pełnymi liniami
+    engine = TetrisEngine(seed=0)
+    for y in range(GRID_HEIGHT - height, GRID_HEIGHT):
+        cells = [rng.random() < 0.7 for _ in range(GRID_WIDTH)]
+        cells[rng.randrange(GRID_WIDTH)] = False
+        if y >= GRID_HEIGHT - full_rows:
+            cells = [True] * GRID_WIDTH
+        for x, filled in enumerate(cells):
+            if filled:
+                engine.grid[y][x] = 1
+                engine.rows[y] |= 1 << (x + WALL_MARGIN)
+    engine.refresh_surface()
+    lists = [list(row) for row in engine.grid]
+    return engine, lists
+
+
+def bench(label, func, number):
+    seconds = min(timeit.repeat(func, number=number, repeat=5))
+    print("{:<34} {:>10.0f} ns/call".format(label, seconds / number * 1e9))
+    return seconds
+
+
+def main():
+    rng = random.Random(1)
+    engine, lists = random_board(rng, height=8, full_rows=0)
+    blocks = []
+    for shape_id, shape in enumerate(SHAPES):
+        for x in range(GRID_WIDTH - len(shape[0]) + 1):
+            blocks.append(Block(x, GRID_HEIGHT - 10, shape_id))
+
+    def old_valid():
+        for block in blocks:
+            valid_move_lists(lists, block, 0, 1)
+
+    def new_valid():
+        for block in blocks:
+            engine.valid_move(block, 0, 1)
+
+    number = 2000
+    old = bench("valid_move, lista list ({} klocków)".format(len(blocks)), old_valid, number)
+    new = bench("valid_move, maski bitowe", new_valid, number)
+    print("  przyspieszenie: {:.1f}x".format(old / new))
+
+    templates = [random_board(random.Random(seed), height=12, full_rows=seed % 5) for seed in range(20)]
+    old_game = TetrisEngine(seed=0)
+
+    # Każde wywołanie potrzebuje świeżej kopii planszy, więc koszt samego kopiowania odejmujemy
+    def old_copy():
+        for _, template in templates:
+            [row[:] for row in template]
+
+    def old_clear():
+        for _, template in templates:
+            clear_lines_lists(old_game, [row[:] for row in template])
+
+    def new_copy():
+        for template, _ in templates:
+            engine.rows = template.rows[:]
+            engine.grid = [row[:] for row in template.grid]
+            engine.column_tops = template.column_tops[:]
+
+    def new_clear():
+        for template, _ in templates:
+            engine.rows = template.rows[:]
+            engine.grid = [row[:] for row in template.grid]
+            engine.column_tops = template.column_tops[:]
+            engine.clear_lines()
+        engine.events = []
+
+    number = 500
+    old = bench("clear_lines, lista list (20 plansz)", old_clear, number) - bench("  (kopiowanie planszy)", old_copy, number)
+    new = bench("clear_lines, maski bitowe", new_clear, number) - bench("  (kopiowanie planszy)", new_copy, number)
+    print("  przyspieszenie bez kopiowania: {:.1f}x".format(old / new))
+
+    # Najczęstszy przypadek: po zablokowaniu klocka nie ma pełnej linii, planszy nie trzeba kopiować
+    engine, lists = random_board(random.Random(2), height=12, full_rows=0)
+
+    def old_no_lines():
+        clear_lines_lists(old_game, lists)
+
+    def new_no_lines():
+        engine.clear_lines()
+
+    number = 20000
+    old = bench("clear_lines bez pełnych linii, listy", old_no_lines, number)
+    new = bench("clear_lines bez pełnych linii, maski", new_no_lines, number)
+    print("  przyspieszenie: {:.1f}x".format(old / new))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# Bez monitora: okno SDL "dummy", kontekst moderngl bez okna (jak w bench_suite.py)
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(BENCH_DIR, "..")
+sys.path.insert(0, ROOT)
+
+from frame_profiler import percentile
+from tetris_capture import CAPTURE_FPS
+
+# Koszt nagrywania (tetris_capture.py) w wątku gry: gra z autopilotem przez --seconds bez nagrywania
+# i z nagrywaniem do katalogu tymczasowego; klatki/s, etap "capture" w ms, zapisane i utracone klatki.
+# --slow-write-ms udaje wolny dysk albo koder - klatki mają przepadać, a klatki/s gry nie spadać.
+# Na renderze programowym (llvmpipe) etap "capture" zawiera też dokończenie rysowania klatki, na które
+# inaczej czekałby flip - porównuj klatki/s, nie sam etap.
+# Uruchomienie:
+#   python benchmarks/bench_capture.py
+#   python benchmarks/bench_capture.py --format png --size 1280x720
+#   python benchmarks/bench_capture.py --slow-write-ms 100
+
+
+def play(size, seconds, capture_format=None, slow_write_ms=0):
+    # Jeden przebieg w tym procesie; z capture_format nagrywamy do katalogu tymczasowego
+    import pygame
+    os.chdir(ROOT)
+    import tetris_single as ts
+    from tetris_capture import VideoCapture
+
+    class SlowCapture(VideoCapture):
+        def write_frame(self, number, pixels):
+            time.sleep(slow_write_ms / 1000)
+            super().write_frame(number, pixels)
+
+    ts.init_game(size, headless=True)
+    ts.profiler.set_enabled(True)
+    capture = None
+    ended = {}
+
+    # Na QUIT game.run sam zamyka nagranie (stop_capture przed pygame.quit); zapamiętujemy tylko czas gry,
+    # bez dopisywania reszty kolejki przy zamknięciu
+    original_stop = ts.stop_capture
+
+    def stop_after_game():
+        ended.setdefault("elapsed", time.perf_counter() - start)
+        original_stop()
+
+    # Zapis gry przy QUIT i nagranie lądują w katalogu tymczasowym
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        if capture_format:
+            path = "capture.rgb" if capture_format == "raw" else "frames" + os.sep
+            cls = SlowCapture if slow_write_ms else VideoCapture
+            capture = ts.video_capture = cls(ts.fisheye_ctx, (ts.DISPLAY_WIDTH, ts.DISPLAY_HEIGHT), path, fps=ts.CAPTURE_FPS)
+        game = ts.Game(seed=0)
+        game.reset_game()
+        game.autoplay = True
+        timer = threading.Timer(seconds, pygame.event.post, (pygame.event.Event(pygame.QUIT),))
+        ts.stop_capture = stop_after_game
+        start = time.perf_counter()
+        timer.start()
+        try:
+            game.run()
+        except SystemExit:
+            pass
+        timer.cancel()
+        ts.stop_capture = original_stop
+        os.chdir(ROOT)
+    stage = sorted(ts.profiler.samples.get("capture", ()))
+    return {
+        "fps": ts.upload_stats["frames"] / ended.get("elapsed", time.perf_counter() - start),
+        "size": [ts.DISPLAY_WIDTH, ts.DISPLAY_HEIGHT],
+        "capture_p50": percentile(stage, 0.5),
+        "capture_p95": percentile(stage, 0.95),
+        "capture_p99": percentile(stage, 0.99),
+        "capture_max": stage[-1] if stage else 0.0,
+        **(capture.stats() if capture else {}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cost of recording the final framebuffer during play")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--size", default="1920x1080", help="window size")
+    parser.add_argument("--format", choices=("raw", "png"), default="raw")
+    parser.add_argument("--slow-write-ms", type=float, default=0, help="extra delay per written frame")
+    parser.add_argument("--run", choices=("off", "on"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    size = tuple(int(v) for v in args.size.split("x"))
+
+    if args.run:
+        result = play(size, args.seconds, args.format if args.run == "on" else None, args.slow_write_ms)
+        print(json.dumps(result))
+        return
+
+    # Każdy przebieg w osobnym procesie - QUIT zamyka pygame (jak w bench_power.py)
+    results = {}
+    for run in ("off", "on"):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--run", run, "--size", args.size, "--seconds", str(args.seconds),
+             "--format", args.format, "--slow-write-ms", str(args.slow_write_ms)],
+            capture_output=True, text=True, check=True).stdout
+        results[run] = json.loads(output.splitlines()[-1])
+
+    on = results["on"]
+    print("{}x{} -> {} at {} fps{}".format(on["size"][0], on["size"][1], args.format, CAPTURE_FPS,
+                                           ", {:.0f} ms per written frame".format(args.slow_write_ms) if args.slow_write_ms else ""))
+    print("game fps: {:.0f} without capture, {:.0f} with capture".format(results["off"]["fps"], on["fps"]))
+    print("capture stage ms: p50 {:.2f}  p95 {:.2f}  p99 {:.2f}  max {:.2f}".format(
+        on["capture_p50"], on["capture_p95"], on["capture_p99"], on["capture_max"]))
+    print("frames: {captured} captured, {written} written, {dropped} dropped".format(**on))
+
+
+if __name__ == "__main__":
+    main()
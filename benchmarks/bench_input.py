@@ -0,0 +1,89 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+
+# Bez monitora: okno SDL "dummy", kontekst moderngl bez okna (jak w bench_suite.py)
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(BENCH_DIR, "..")
+sys.path.insert(0, ROOT)
+
+from frame_profiler import percentile
+
+# Opóźnienie od naciśnięcia klawisza do wyświetlenia klatki przy dużym APM: osobny wątek wysyła
+# KEYDOWN/KEYUP w losowych odstępach, gra liczy opóźnienie każdego naciśnięcia (InputTimeline.presented).
+# Uruchomienie:
+#   python benchmarks/bench_input.py
+#   python benchmarks/bench_input.py --apm 600 --seconds 20 --size 1280x720
+
+
+def press_keys(keys, apm, seconds, hold_ms, posted, stop):
+    import pygame
+
+    rng = random.Random(0)
+    interval = 60 / apm
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end and not stop.is_set():
+        key = rng.choice(keys)
+        pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=key))
+        posted.append(key)
+        time.sleep(hold_ms / 1000)
+        pygame.event.post(pygame.event.Event(pygame.KEYUP, key=key))
+        # Odstępy losowe wokół średniej, żeby naciśnięcia nie trafiały zawsze w tę samą fazę klatki
+        time.sleep(max(0.0, rng.uniform(0.5, 1.5) * interval - hold_ms / 1000))
+    pygame.event.post(pygame.event.Event(pygame.QUIT))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Input-to-present latency of the game under a synthetic high-APM player")
+    parser.add_argument("--apm", type=float, default=400, help="key presses per minute")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--hold-ms", type=float, default=40, help="how long each key stays down (below DAS, no repeats)")
+    parser.add_argument("--size", default="1920x1080", help="window size")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    import pygame
+    import tetris_single as ts
+
+    ts.init_game(tuple(int(v) for v in args.size.split("x")), headless=True)
+    game = ts.Game(seed=0)
+    game.controls.latency = deque()
+    keys = [pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN]
+    posted = []
+    stop = threading.Event()
+    sender = threading.Thread(target=press_keys, args=(keys, args.apm, args.seconds, args.hold_ms, posted, stop))
+
+    # Zapis gry przy QUIT i powtórki lądują w katalogu tymczasowym, nie obok prawdziwych
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        game.reset_game()
+        frames = ts.upload_stats["frames"]
+        start = time.perf_counter()
+        sender.start()
+        try:
+            game.run()
+        except SystemExit:
+            pass
+        stop.set()
+        sender.join()
+        seconds = time.perf_counter() - start
+        os.chdir(ROOT)
+
+    latency = sorted(game.controls.latency)
+    print("{} presses sent, {} reached the screen, {:.0f} fps{}".format(
+        len(posted), len(latency), (ts.upload_stats["frames"] - frames) / seconds, ", game over" if game.game_over else ""))
+    if latency:
+        print("input to present ms: p50 {:.1f}  p95 {:.1f}  p99 {:.1f}  max {:.1f}".format(
+            percentile(latency, 0.5), percentile(latency, 0.95), percentile(latency, 0.99), latency[-1]))
+
+
+if __name__ == "__main__":
+    main()
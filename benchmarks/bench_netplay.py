@@ -0,0 +1,49 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(BENCH_DIR, "..")
+VERSUS = os.path.join(ROOT, "tetris_versus.py")
+
+# Partia versus dwóch botów na jednym komputerze (loopback): każdy w osobnym procesie, jak dwóch graczy.
+# Przepustowość w obie strony, rozmiar różnic planszy, rozjazdy plansz i RTT (ping idzie tą samą drogą
+# co wiadomości gry, odpowiada wątek sieci przeciwnika). Uruchomienie:
+#   python benchmarks/bench_netplay.py
+#   python benchmarks/bench_netplay.py --seconds 60 --action-ms 80
+
+FRAME_MS = 1000 / 60
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Versus match between two bot processes over loopback TCP")
+    parser.add_argument("--seconds", type=float, default=20.0, help="match length limit")
+    parser.add_argument("--action-ms", type=float, default=100, help="bot speed: one action every N ms")
+    parser.add_argument("--port", type=int, default=7797)
+    args = parser.parse_args()
+
+    common = ["--seconds", str(args.seconds), "--action-ms", str(args.action_ms), "--json"]
+    host = subprocess.Popen([sys.executable, VERSUS, "--host", "--port", str(args.port), "--seed", "0"] + common,
+                            stdout=subprocess.PIPE, text=True)
+    # Gospodarz wypisuje jedną linię, gdy już nasłuchuje
+    host.stdout.readline()
+    client = subprocess.run([sys.executable, VERSUS, "--connect", "127.0.0.1:{}".format(args.port)] + common,
+                            capture_output=True, text=True, check=True)
+    results = {"host": json.loads(host.communicate()[0].splitlines()[-1]), "client": json.loads(client.stdout)}
+
+    print("{:<8} {:>8} {:>7} {:>9} {:>9} {:>9} {:>8} {:>8} {:>8} {:>8} {:>8}".format(
+        "player", "result", "pieces", "sent B/s", "recv B/s", "B/delta", "desyncs", "rtt p50", "rtt p95", "rtt p99", "rtt max"))
+    for name, stats in results.items():
+        print("{:<8} {:>8} {:>7} {:>9.0f} {:>9.0f} {:>9.1f} {:>8} {:>8.2f} {:>8.2f} {:>8.2f} {:>8.2f}".format(
+            name, stats["outcome"] or "-", stats["locks"], stats["sent_bps"], stats["received_bps"],
+            stats["delta_bytes_avg"], stats["desyncs"], stats["rtt_p50"], stats["rtt_p95"], stats["rtt_p99"],
+            stats["rtt_max"]))
+    worst = max(stats["rtt_p99"] for stats in results.values())
+    print("one-way latency p99 ~{:.2f} ms ({} one {:.1f} ms frame)".format(
+        worst / 2, "under" if worst / 2 < FRAME_MS else "OVER", FRAME_MS))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# Bez monitora: okno SDL "dummy", kontekst moderngl bez okna (jak w bench_suite.py)
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(BENCH_DIR, "..")
+sys.path.insert(0, ROOT)
+
+# Zużycie CPU przez grę na poszczególnych ekranach: czas procesora / czas zegarowy przez --seconds.
+# Każdy tryb w osobnym procesie - QUIT zamyka pygame, a po ponownym init zostałyby stare czcionki i tekstury.
+# Uruchomienie:
+#   python benchmarks/bench_power.py
+#   python benchmarks/bench_power.py --seconds 10 --size 3840x2160
+# Uwaga: sterownik "dummy" nie umie obudzić SDL_WaitEvent, więc czeka w pętli co 1 ms - oczekiwanie
+# na zdarzenia kosztuje tu trochę więcej niż w prawdziwym oknie (X11, Wayland, Windows, macOS).
+
+# nazwa -> (POWER_SAVING, ekran, zdarzenia wysłane zaraz po starcie)
+MODES = {
+    "menu (power saving off)": (False, "menu", ()),
+    "menu": (True, "menu", ()),
+    "paused game (power saving off)": (False, "paused", ()),
+    "paused game": (True, "paused", ()),
+    "game": (True, "game", ()),
+    "game, window lost focus": (True, "game", ("WINDOWFOCUSLOST",)),
+}
+
+
+def cpu_usage(func, seconds, events=(), warmup=1.0):
+    # func() chodzi, aż dostanie QUIT; mierzymy seconds sekund po warmup (pierwsze klatki ekranu się nie liczą)
+    import pygame
+
+    def post(event_type):
+        pygame.event.post(pygame.event.Event(event_type))
+
+    start = {}
+
+    def mark():
+        start["cpu"] = time.process_time()
+        start["wall"] = time.perf_counter()
+
+    timers = [threading.Timer(0.2, post, (getattr(pygame, name),)) for name in events]
+    timers.append(threading.Timer(warmup, mark))
+    timers.append(threading.Timer(warmup + seconds, post, (pygame.QUIT,)))
+    for timer in timers:
+        timer.start()
+    try:
+        func()
+    except SystemExit:
+        pass
+    for timer in timers:
+        timer.cancel()
+    return (time.process_time() - start["cpu"]) / (time.perf_counter() - start["wall"])
+
+
+def run_mode(name, size, seconds):
+    power_saving, screen, events = MODES[name]
+    os.chdir(ROOT)
+    import tetris_single as ts
+
+    ts.init_game(size, headless=True)
+    ts.POWER_SAVING = power_saving
+
+    def play():
+        if screen == "menu":
+            ts.main()
+            return
+        game = ts.Game(seed=0)
+        game.reset_game()
+        game.run(paused=screen == "paused")
+
+    # Zapis gry przy QUIT i powtórki lądują w katalogu tymczasowym, nie obok prawdziwych
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        usage = cpu_usage(play, seconds, events)
+        os.chdir(ROOT)
+    return usage
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU usage of the game per screen, with and without power saving")
+    parser.add_argument("--seconds", type=float, default=5.0, help="how long to measure each mode")
+    parser.add_argument("--size", default="1920x1080", help="window size")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        size = tuple(int(v) for v in args.size.split("x"))
+        print(run_mode(args.mode, size, args.seconds))
+        return
+
+    print("{:<36} {:>8}".format("mode", "cpu"))
+    for name in MODES:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--mode", name, "--size", args.size,
+             "--seconds", str(args.seconds)],
+            capture_output=True, text=True, check=True).stdout
+        print("{:<36} {:>7.1%}".format(name, float(output.split()[-1])))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+# Bez monitora i bez GPU: okno SDL "dummy", osobny kontekst moderngl (EGL, np. llvmpipe)
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(BENCH_DIR, "..")
+sys.path.insert(0, ROOT)
+
+from tetris_engine import SNAPSHOT_SIZE, DROP, LEFT, RIGHT, ROTATE, Block, TetrisEngine
+from bench_board import random_board
+
+# Zestaw pomiarów silnika i rysowania, wynik w JSON i porównanie z zapisanym baseline.
+# Uruchomienie:
+#   python benchmarks/bench_suite.py                      # pomiar + porównanie z benchmarks/baseline.json
+#   python benchmarks/bench_suite.py --save-baseline      # nowy baseline
+#   python benchmarks/bench_suite.py --only engine --fail-on-regression
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_SIZES = "1920x1080,3840x2160"
+
+
+def measure(func, runs, setup=None, batch=1):
+    # func(arg) dostaje wynik setup() (przygotowanie nie jest mierzone), czas dzielimy na batch operacji
+    times = []
+    for _ in range(runs):
+        arg = setup() if setup else None
+        start = time.perf_counter_ns()
+        func(arg)
+        times.append((time.perf_counter_ns() - start) / batch / 1000)
+    times.sort()
+    return {
+        "median_us": times[len(times) // 2],
+        "min_us": times[0],
+        "p95_us": times[min(len(times) - 1, int(round(0.95 * (len(times) - 1))))],
+        "runs": runs,
+        "batch": batch,
+    }
+
+
+# --- Silnik -------------------------------------------------------------------
+
+def record_states(count, seed=0):
+    # Plansze z prawdziwych (losowo granych) partii: co kilka kroków zapis planszy i aktywnego klocka
+    rng = random.Random(seed)
+    engine = TetrisEngine(seed=seed)
+    actions = [LEFT, LEFT, RIGHT, RIGHT, ROTATE, DROP]
+    states = []
+    while len(states) < count:
+        engine.step([rng.choice(actions)], 1.0)
+        if engine.game_over:
+            engine.reset_game()
+            continue
+        if rng.random() < 0.2:
+            block = engine.current_block
+            states.append((engine.rows[:], [bytearray(row) for row in engine.grid],
+                           (block.x, block.y, block.shape_id, block.rotation)))
+    return states
+
+
+def load_state(engine, state):
+    rows, grid, (x, y, shape_id, rotation) = state
+    engine.rows = rows[:]
+    engine.grid = [bytearray(row) for row in grid]
+    engine.current_block = Block(x, y, shape_id, rotation)
+    engine.refresh_surface()
+    engine.events = []
+
+
+def bench_engine(runs):
+    states = record_states(200)
+    engine = TetrisEngine(seed=0)
+    results = {}
+
+    blocks = [Block(*state[2]) for state in states]
+    offsets = ((-1, 0), (1, 0), (0, 1))
+
+    def valid_move(_):
+        for state, block in zip(states, blocks):
+            engine.rows = state[0]
+            for dx, dy in offsets:
+                engine.valid_move(block, dx, dy)
+
+    results["engine.valid_move"] = measure(valid_move, runs, batch=len(states) * len(offsets))
+
+    def fresh_blocks():
+        return [Block(*state[2]) for state in states]
+
+    def rotate_block(blocks):
+        for state, block in zip(states, blocks):
+            engine.rows = state[0]
+            engine.current_block = block
+            engine.rotate_block()
+
+    results["engine.rotate_block"] = measure(rotate_block, runs, setup=fresh_blocks, batch=len(states))
+
+    def resting_engines():
+        engines = []
+        for seed, state in enumerate(states):
+            copy = TetrisEngine(seed=seed)
+            load_state(copy, state)
+            while copy.valid_move(copy.current_block, 0, 1):
+                copy.current_block.y += 1
+            engines.append(copy)
+        return engines
+
+    def lock_block(engines):
+        for copy in engines:
+            copy.lock_block()
+
+    results["engine.lock_block"] = measure(lock_block, runs, setup=resting_engines, batch=len(states))
+
+    engines = resting_engines()
+    for copy, state in zip(engines, states):
+        copy.current_block = Block(*state[2])
+
+    def drop_distance(_):
+        for copy in engines:
+            copy.drop_distance(copy.current_block)
+
+    results["engine.drop_distance"] = measure(drop_distance, runs, batch=len(engines))
+
+    boards = [random_board(random.Random(seed), height=12, full_rows=seed % 5)[0] for seed in range(50)]
+
+    def board_copies():
+        copies = []
+        for board in boards:
+            copy = TetrisEngine(seed=0)
+            copy.rows = board.rows[:]
+            copy.grid = [bytearray(row) for row in board.grid]
+            copy.column_tops = board.column_tops[:]
+            copies.append(copy)
+        return copies
+
+    def clear_lines(copies):
+        for copy in copies:
+            copy.clear_lines()
+
+    results["engine.clear_lines"] = measure(clear_lines, runs, setup=board_copies, batch=len(boards))
+
+    snapshots = []
+    for state in states:
+        load_state(engine, state)
+        snapshots.append(engine.snapshot())
+    buffer = bytearray(SNAPSHOT_SIZE)
+
+    def snapshot(_):
+        for state in states:
+            engine.snapshot(buffer)
+
+    def restore(_):
+        for data in snapshots:
+            engine.restore(data)
+
+    results["engine.snapshot"] = measure(snapshot, runs, batch=len(states))
+    results["engine.restore"] = measure(restore, runs, batch=len(snapshots))
+    return results
+
+
+# --- Rysowanie ----------------------------------------------------------------
+
+def bench_render(sizes, runs, render_resolution=None):
+    import pygame
+    os.chdir(ROOT)
+    import tetris_single as ts
+
+    ts.RENDER_RESOLUTION = render_resolution
+    results = {}
+    state = record_states(60, seed=1)[-1]
+    renderer = None
+    for width, height in sizes:
+        if getattr(ts, "fisheye_ctx", None) is not None:
+            ts.fisheye_ctx.release()
+        ts.init_game((width, height), headless=True)
+        ctx = ts.fisheye_ctx
+        renderer = ctx.info.get("GL_RENDERER")
+        prefix = "render.{}x{}.".format(width, height)
+        if (ts.SCREEN_WIDTH, ts.SCREEN_HEIGHT) != (width, height):
+            # Płótno mniejsze niż okno - osobne nazwy, żeby nie porównywać z baseline w natywnej rozdzielczości
+            prefix = "render.{}x{}@{}x{}.".format(width, height, ts.SCREEN_WIDTH, ts.SCREEN_HEIGHT)
+
+        game = ts.Game(seed=0)
+        load_state(game, state)
+        margin_left, margin_top = ts.get_margins()
+        game.draw(margin_left, margin_top)
+        ctx.finish()
+
+        def full_frame(_):
+            game.invalidate_layers()
+            game.draw(margin_left, margin_top)
+            ctx.finish()
+
+        def steady_frame(_):
+            game.draw(margin_left, margin_top)
+            ctx.finish()
+
+        def compose_full(_):
+            game.invalidate_layers()
+            game.compose_frame(margin_left, margin_top)
+
+        def upload(_):
+            ts.upload_surface(ts.fisheye_texture, ts.screen)
+            ctx.finish()
+
+        # Zwykła klatka gry: klocek o wiersz niżej, wysyłane tylko prostokąty zmienione w compose_frame
+        block = game.current_block
+        if game.valid_move(block, 0, 1):
+            block.y += 1
+        dirty_rects = game.compose_frame(margin_left, margin_top)
+
+        def upload_dirty(_):
+            ts.upload_surface(ts.fisheye_texture, ts.screen, dirty_rects)
+            ctx.finish()
+
+        def board_cells(_):
+            # Zablokowane komórki planszy na GPU (tekstura id kształtów + paleta)
+            ts.render_board_cells(ts.board_pass, game.board_cells(), game.board_origin)
+            ctx.finish()
+
+        def theme_switch(_):
+            # Sama zmiana motywu; plansza dostaje nową paletę przy następnym render_board_cells
+            ts.apply_theme((ts.current_theme_idx + 1) % len(ts.THEMES))
+
+        def crt_passes(_):
+            ts.render_crt_passes(ts.crt_passes, ts.fisheye_texture, ts.screen.get_size(), ts.CRT_EFFECTS)
+            ctx.finish()
+
+        def fisheye_only(_):
+            ts.render_fisheye_gl(ctx, ts.fisheye_prog, ts.fisheye_vao, ts.fisheye_texture, ts.screen, distortion=0.15)
+            ctx.finish()
+
+        def fisheye_effects(_):
+            ts.render_fisheye_gl(ctx, ts.fisheye_prog, ts.fisheye_vao, ts.fisheye_texture, ts.screen,
+                                 distortion=0.15, effects=ts.CRT_EFFECTS)
+            ctx.finish()
+
+        results[prefix + "game_draw_full"] = measure(full_frame, runs)
+        results[prefix + "game_draw_steady"] = measure(steady_frame, runs)
+        results[prefix + "compose_frame_full"] = measure(compose_full, runs)
+        results[prefix + "upload_surface"] = measure(upload, runs)
+        results[prefix + "upload_surface_dirty"] = measure(upload_dirty, runs)
+        results[prefix + "render_board_cells"] = measure(board_cells, runs)
+        theme = ts.current_theme_idx
+        results[prefix + "apply_theme"] = measure(theme_switch, runs)
+        ts.apply_theme(theme)
+        results[prefix + "render_crt_passes"] = measure(crt_passes, runs)
+        results[prefix + "render_fisheye_gl"] = measure(fisheye_only, runs)
+        results[prefix + "render_fisheye_gl_effects"] = measure(fisheye_effects, runs)
+    pygame.quit()
+    return results, renderer
+
+
+# --- Wynik i porównanie ---------------------------------------------------------
+
+def compare(results, baseline, threshold):
+    # Zwraca listę nazw, które zwolniły o więcej niż threshold (np. 0.15 = 15%).
+    # Porównujemy minimum, jak timeit - mediana na współdzielonej maszynie za bardzo pływa.
+    regressions = []
+    print("{:<52} {:>12} {:>12} {:>8}".format("benchmark", "min us", "baseline", "ratio"))
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print("{:<52} {:>12.2f} {:>12} {:>8}".format(name, result["min_us"], "-", "-"))
+            continue
+        ratio = result["min_us"] / base["min_us"] if base["min_us"] else float("inf")
+        mark = ""
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            mark = "  REGRESSION"
+        print("{:<52} {:>12.2f} {:>12.2f} {:>7.2f}x{}".format(name, result["min_us"], base["min_us"], ratio, mark))
+    return regressions
+
+
+def parse_sizes(text):
+    return [tuple(int(v) for v in size.split("x")) for size in text.split(",") if size]
+
+
+def parse_render_resolution(text):
+    # "0.5" - ułamek rozmiaru okna, "1920x1080" - stałe płótno
+    if text is None:
+        return None
+    if "x" in text:
+        return parse_sizes(text)[0]
+    return float(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless benchmarks for the engine and the renderer")
+    parser.add_argument("--only", choices=("engine", "render"), help="run only one group")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="render sizes, e.g. 1920x1080,3840x2160")
+    parser.add_argument("--engine-runs", type=int, default=50)
+    parser.add_argument("--render-runs", type=int, default=10)
+    parser.add_argument("--render-resolution", help="internal canvas: a fraction like 0.5 or a size like 1920x1080")
+    parser.add_argument("--output", default="bench_results.json", help="where to write this run's results")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="also store the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown before reporting a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    results = {}
+    renderer = None
+    if args.only in (None, "engine"):
+        results.update(bench_engine(args.engine_runs))
+    if args.only in (None, "render"):
+        render_results, renderer = bench_render(parse_sizes(args.sizes), args.render_runs,
+                                                parse_render_resolution(args.render_resolution))
+        results.update(render_results)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "gl_renderer": renderer,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print("baseline: {} ({})".format(args.baseline, baseline["meta"].get("gl_renderer")))
+        regressions = compare(results, baseline["results"], args.threshold)
+    else:
+        compare(results, {}, args.threshold)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print("saved baseline to", args.baseline)
+
+    if regressions:
+        print("{} benchmark(s) slower than baseline by more than {:.0%}".format(len(regressions), args.threshold))
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
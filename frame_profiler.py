@@ -0,0 +1,120 @@
+import json
+import time
+from collections import deque
+
+# Pomiar czasu etapów klatki (bez pygame). Wyłączony profiler zwraca w stage()
+# wspólny pusty context manager, więc instrumentacja w kodzie rysowania prawie nic nie kosztuje.
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter_ns())
+        return False
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class FrameProfiler:
+    # window - ile ostatnich klatek wchodzi do p50/p95/p99, trace_limit - ile zdarzeń trzymamy do eksportu
+    def __init__(self, window=300, trace_limit=200000):
+        self.enabled = False
+        self.window = window
+        self.samples = {}
+        self.frame_totals = {}
+        self.trace = deque(maxlen=trace_limit)
+        self.origin = time.perf_counter_ns()
+        self.last_frame_end = None
+        self.frames = 0
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        self.frame_totals = {}
+        self.last_frame_end = None
+
+    def stage(self, name):
+        if not self.enabled:
+            return NULL_STAGE
+        return _Stage(self, name)
+
+    def record(self, name, start_ns, end_ns, track="CPU"):
+        self.frame_totals[name] = self.frame_totals.get(name, 0) + end_ns - start_ns
+        self.trace.append((name, track, start_ns, end_ns))
+
+    def add_sample(self, name, ms, start_ns=None, track=None):
+        # Pomiary spoza bieżącej klatki, np. czas GPU odczytany z opóźnieniem
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = deque(maxlen=self.window)
+        samples.append(ms)
+        if start_ns is not None:
+            self.trace.append((name, track or name, start_ns, start_ns + int(ms * 1e6)))
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter_ns()
+        if self.last_frame_end is not None:
+            self.add_sample("frame", (now - self.last_frame_end) / 1e6)
+            self.trace.append(("frame", "Frames", self.last_frame_end, now))
+        self.last_frame_end = now
+        for name, total in self.frame_totals.items():
+            self.add_sample(name, total / 1e6)
+        self.frame_totals = {}
+        self.frames += 1
+
+    def summary(self):
+        # [(nazwa, p50, p95, p99)] w ms, najpierw cała klatka, potem najdroższe etapy
+        rows = []
+        for name, samples in self.samples.items():
+            values = sorted(samples)
+            rows.append((name, percentile(values, 0.5), percentile(values, 0.95), percentile(values, 0.99)))
+        rows.sort(key=lambda row: (row[0] != "frame", -row[2]))
+        return rows
+
+    def export_chrome_trace(self, path):
+        # Format "Trace Event" - do otwarcia w chrome://tracing albo ui.perfetto.dev
+        tracks = {}
+        events = []
+        for name, track, start_ns, end_ns in self.trace:
+            tid = tracks.setdefault(track, len(tracks) + 1)
+            events.append({
+                "name": name,
+                "ph": "X",
+                "pid": 1,
+                "tid": tid,
+                "ts": (start_ns - self.origin) / 1000,
+                "dur": (end_ns - start_ns) / 1000,
+            })
+        for track, tid in tracks.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": track}})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(events)
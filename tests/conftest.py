@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Moduły gry leżą w katalogu głównym repozytorium (jak w benchmarks/)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
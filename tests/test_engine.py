@@ -0,0 +1,124 @@
+import random
+
+from tetris_engine import (
+    DOWN, DROP, EMPTY_ROW, FULL_ROW, GRID_HEIGHT, GRID_WIDTH, LEFT, PIECES, RIGHT, ROTATE, SNAPSHOT_INPUT_BUFFER,
+    SNAPSHOT_SIZE, WALL_MARGIN, Block, TetrisEngine,
+)
+
+# Reguły gry bez pygame: python -m pytest tests
+
+
+def clearing_engine(seed=1):
+    # Pełna linia na dole i zrzut klocka - silnik stoi w animacji czyszczenia (clear_delay > 0)
+    engine = TetrisEngine(seed=seed, clear_delay=2.0)
+    engine.rows[GRID_HEIGHT - 1] = FULL_ROW
+    engine.grid[GRID_HEIGHT - 1][:] = bytes([1]) * GRID_WIDTH
+    engine.refresh_surface()
+    engine.step([DROP], 0)
+    assert engine.clearing_rows
+    return engine
+
+
+def test_snapshot_round_trip():
+    engine = clearing_engine()
+    engine.step([LEFT, ROTATE], 0.5)
+    data = engine.snapshot()
+    assert len(data) == SNAPSHOT_SIZE
+    copy = TetrisEngine(seed=99, clear_delay=2.0)
+    copy.restore(data)
+    assert copy.snapshot() == data
+
+
+def test_snapshot_during_clear_keeps_buffered_inputs():
+    # Więcej akcji w trakcie animacji, niż mieści snapshot: po restore oba silniki muszą iść tak samo
+    engine = clearing_engine()
+    engine.step([LEFT, DOWN, RIGHT] * 6 + [ROTATE], 0.5)
+    assert len(engine.input_buffer) == SNAPSHOT_INPUT_BUFFER
+    copy = TetrisEngine(seed=99, clear_delay=2.0)
+    copy.restore(engine.snapshot())
+    assert copy.input_buffer == engine.input_buffer
+    engine.step([], 6.0)
+    copy.step([], 6.0)
+    assert copy.snapshot() == engine.snapshot()
+
+
+def test_wall_kick_moves_piece_off_wall():
+    # Pionowe T przy prawej ścianie: obrót do poziomu mieści się dopiero po przesunięciu o kolumnę w lewo
+    engine = TetrisEngine(seed=1)
+    engine.current_block = Block(GRID_WIDTH - 2, 5, 2, 1)
+    assert engine.rotation_target(engine.current_block) == (GRID_WIDTH - 3, 5, 2)
+    engine.apply_input(ROTATE)
+    block = engine.current_block
+    assert (block.x, block.y, block.rotation) == (GRID_WIDTH - 3, 5, 2)
+
+
+def test_rotation_without_room_is_rejected():
+    # Pionowe I przy ścianie: żaden kick (do dwóch kolumn) nie robi miejsca na cztery komórki
+    engine = TetrisEngine(seed=1)
+    engine.current_block = Block(GRID_WIDTH - 1, 5, 0, 1)
+    assert engine.rotation_target(engine.current_block) is None
+    engine.apply_input(ROTATE)
+    block = engine.current_block
+    assert (block.x, block.y, block.rotation) == (GRID_WIDTH - 1, 5, 1)
+
+
+def test_rows_follow_grid_and_clear_shifts_down():
+    engine = TetrisEngine(seed=1)
+    # Dwa pionowe I w lewych kolumnach, potem poziome O i I domykają dolny wiersz
+    for x, shape_id, rotation in ((0, 0, 1), (1, 0, 1), (2, 1, 0), (4, 1, 0), (6, 1, 0), (8, 1, 0)):
+        engine.current_block = Block(x, 0, shape_id, rotation)
+        engine.hard_drop()
+    assert engine.lines_cleared == 2
+    assert engine.score == engine.rules["line_scores"][1]
+    for y, row in enumerate(engine.rows):
+        cells = sum(1 << (x + WALL_MARGIN) for x in range(GRID_WIDTH) if engine.grid[y][x])
+        assert row == EMPTY_ROW | cells
+    # Z pionowych I zostały po dwie komórki w kolumnach 0 i 1, zsunięte na dół
+    assert [bytes(row[:2]) for row in engine.grid[-3:]] == [b"\0\0", b"\1\1", b"\1\1"]
+    assert not any(engine.grid[y][2:].strip(b"\0") for y in range(GRID_HEIGHT))
+
+
+def test_valid_move_hits_locked_cells_and_walls():
+    engine = TetrisEngine(seed=1)
+    engine.rows[10] |= 1 << (4 + WALL_MARGIN)
+    block = Block(3, 8, 1)
+    assert engine.valid_move(block)
+    assert not engine.valid_move(block, 0, 1)
+    assert engine.valid_move(block, -3, 1)
+    assert not engine.valid_move(block, -4, 0)
+    assert not engine.valid_move(block, GRID_WIDTH - 4, 0)
+    assert not engine.valid_move(block, 0, GRID_HEIGHT - 9)
+
+
+def test_drop_distance_matches_row_by_row_search():
+    # Losowe plansze z nawisami i klocki w każdej pozycji: profil powierzchni (także odtworzony
+    # leniwie po czyszczeniu linii) daje to samo co przesuwanie klocka wiersz po wierszu
+    rng = random.Random(6)
+    for _ in range(40):
+        engine = TetrisEngine(seed=rng.getrandbits(32))
+        for y in range(GRID_HEIGHT // 2, GRID_HEIGHT):
+            filled = [x for x in range(GRID_WIDTH) if rng.random() < 0.45]
+            for x in filled:
+                engine.rows[y] |= 1 << (x + WALL_MARGIN)
+                engine.grid[y][x] = 1
+        if rng.random() < 0.5:
+            engine.rows[GRID_HEIGHT - 1] = FULL_ROW
+            engine.grid[GRID_HEIGHT - 1][:] = bytes([1]) * GRID_WIDTH
+            engine.clear_lines()
+            assert engine.column_tops is None
+        else:
+            engine.refresh_surface()
+        for shape_id in range(len(PIECES)):
+            for rotation in range(4):
+                for x in range(GRID_WIDTH - PIECES[shape_id][rotation].width + 1):
+                    for y in range(0, GRID_HEIGHT // 2 + 4, 3):
+                        block = Block(x, y, shape_id, rotation)
+                        if not engine.valid_move(block):
+                            continue
+                        distance = 0
+                        while engine.valid_move(block, 0, distance + 1):
+                            distance += 1
+                        assert engine.drop_distance(block) == distance
+        tops = engine.column_tops
+        engine.refresh_surface()
+        assert tops == engine.column_tops
@@ -0,0 +1,72 @@
+from tetris_engine import DOWN, GRID_WIDTH, LEFT, RIGHT
+from tetris_input import InputTimeline
+
+# Liczba akcji na krok logiki przy przytrzymanych klawiszach: DAS, potem co ARR
+
+STEP_MS = 1000 / 120
+
+
+def counts(timeline, steps, action, start=0):
+    # Ile akcji danego rodzaju wypada w kolejnych krokach od kroku start
+    return [timeline.take((start + i + 1) * STEP_MS).count(action) for i in range(steps)]
+
+
+def test_das_then_arr():
+    timeline = InputTimeline(das_ms=167, arr_ms=33)
+    timeline.press(LEFT, 0)
+    per_step = counts(timeline, 120, LEFT)
+    # Naciśnięcie w pierwszym kroku, cisza do 167 ms, potem powtórzenie co 33 ms
+    assert per_step[0] == 1
+    assert sum(per_step[1:20]) == 0
+    assert per_step[20] == 1
+    assert max(per_step) == 1
+    assert sum(per_step) == 1 + 1 + int((120 * STEP_MS - 167) // 33)
+
+
+def test_release_stops_repeat():
+    timeline = InputTimeline(das_ms=167, arr_ms=33)
+    timeline.press(RIGHT, 0)
+    timeline.release(RIGHT, 250)
+    per_step = counts(timeline, 120, RIGHT)
+    # 167, 200, 233 ms - potem klawisz już puszczony
+    assert sum(per_step) == 4
+
+
+def test_opposite_direction_restarts_das():
+    timeline = InputTimeline(das_ms=167, arr_ms=33)
+    timeline.press(LEFT, 0)
+    timeline.press(RIGHT, 100)
+    timeline.release(RIGHT, 300)
+    actions = [timeline.take((i + 1) * STEP_MS) for i in range(60)]
+    # Do 300 ms powtarza się ostatnio naciśnięty RIGHT (267 ms), LEFT rusza od nowa z DAS od puszczenia
+    assert sum(step.count(RIGHT) for step in actions) == 2
+    assert sum(step.count(LEFT) for step in actions) == 1 + 1 + int((60 * STEP_MS - 467) // 33)
+
+
+def test_soft_drop_repeats_without_das():
+    timeline = InputTimeline(soft_drop_ms=33)
+    timeline.press(DOWN, 0)
+    per_step = counts(timeline, 24, DOWN)
+    assert per_step[0] == 1
+    assert sum(per_step) == 1 + int((24 * STEP_MS - 33) // 33) + 1
+
+
+def test_zero_arr_goes_to_wall_then_one_per_step():
+    timeline = InputTimeline(das_ms=105, arr_ms=0)
+    timeline.press(LEFT, 0)
+    per_step = counts(timeline, 30, LEFT)
+    first = next(i for i, n in enumerate(per_step[1:], 1) if n)
+    assert per_step[first] == GRID_WIDTH
+    assert first == int(105 // STEP_MS)
+    assert per_step[first + 1:] == [1] * (len(per_step) - first - 1)
+
+
+def test_events_split_by_step_and_flush():
+    timeline = InputTimeline()
+    timeline.press(LEFT, 3)
+    timeline.release(LEFT, 4)
+    timeline.press(RIGHT, 12)
+    timeline.release(RIGHT, 13)
+    assert timeline.take(STEP_MS) == [LEFT]
+    assert timeline.take(STEP_MS, flush=True) == [RIGHT]
+    assert timeline.take(2 * STEP_MS) == []
@@ -0,0 +1,56 @@
+import random
+
+from tetris_bot import BotDriver
+from tetris_engine import GARBAGE, GRID_HEIGHT, GRID_WIDTH, TIME_UNIT_MS, TetrisEngine
+from tetris_net import apply_board_delta, board_checksum, encode_board_delta
+
+# Różnica planszy (tetris_net) odtwarza pełną planszę nadawcy: zwykłe blokady, czyszczenie linii i śmieci
+
+
+def random_board(rng):
+    return [bytearray(rng.choice((0, 0, rng.randint(1, GARBAGE + 1))) for _ in range(GRID_WIDTH))
+            for _ in range(GRID_HEIGHT)]
+
+
+def check_delta(old, new):
+    board = apply_board_delta(old, encode_board_delta(old, new))
+    assert board == new
+    assert board_checksum(board) == board_checksum(new)
+
+
+def test_delta_of_random_boards():
+    rng = random.Random(11)
+    for _ in range(200):
+        old = random_board(rng)
+        new = [bytearray(row) for row in old]
+        for _ in range(rng.randint(0, 12)):
+            new[rng.randrange(GRID_HEIGHT)][rng.randrange(GRID_WIDTH)] = rng.randint(0, GARBAGE + 1)
+        check_delta(old, new)
+        check_delta(old, random_board(rng))
+
+
+def test_delta_of_played_game_with_clears_and_garbage():
+    # Plansza po każdym kroku gry bota; wiersze przesunięte przez czyszczenie i śmieci idą jako kopie
+    rng = random.Random(12)
+    engine = TetrisEngine(seed=12)
+    driver = BotDriver(action_ms=50)
+    step_ms = 1000 / 120
+    sent = [bytearray(row) for row in engine.grid]
+    for tick in range(6000):
+        engine.step(driver.inputs(engine, step_ms), step_ms / TIME_UNIT_MS)
+        if tick % 500 == 499:
+            engine.add_garbage(rng.randint(1, 3), rng.randrange(GRID_WIDTH))
+        if engine.game_over:
+            break
+        board = [bytearray(row) for row in engine.grid]
+        check_delta(sent, board)
+        sent = board
+    assert engine.lines_cleared
+
+
+def test_checksum_sees_single_cell():
+    rng = random.Random(13)
+    board = random_board(rng)
+    other = [bytearray(row) for row in board]
+    other[5][3] ^= 1
+    assert board_checksum(board) != board_checksum(other)
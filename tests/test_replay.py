@@ -0,0 +1,67 @@
+import random
+
+from tetris_bot import BotDriver
+from tetris_engine import DOWN, LEFT, RIGHT, TIME_UNIT_MS, TetrisEngine
+from tetris_replay import Replay, ReplayPlayer, ReplayRecorder
+
+LOGIC_HZ = 120
+# Gęste keyframe'y, żeby część z nich wypadła w trakcie animacji czyszczenia linii
+KEYFRAME_INTERVAL = 7
+
+
+def record_game(path, seed=3, ticks=4000):
+    # Bot czyści linie; w trakcie animacji dokładamy akcje, jak przytrzymany klawisz z DAS/ARR
+    rng = random.Random(seed)
+    engine = TetrisEngine(seed=seed, clear_delay=2.0)
+    recorder = ReplayRecorder(engine, LOGIC_HZ, keyframe_interval=KEYFRAME_INTERVAL)
+    engine.reset_game()
+    driver = BotDriver(action_ms=50)
+    step_ms = 1000 / LOGIC_HZ
+    for _ in range(ticks):
+        inputs = driver.inputs(engine, step_ms)
+        if engine.clearing_rows:
+            inputs = inputs + [rng.choice((LEFT, RIGHT, DOWN))] * 2
+        recorder.record(inputs)
+        engine.step(inputs, step_ms / TIME_UNIT_MS)
+        engine.drain_events()
+        if engine.game_over:
+            break
+    recorder.save(str(path))
+    return Replay(str(path))
+
+
+def clearing_keyframe_ticks(replay):
+    engine = TetrisEngine(clear_delay=replay.clear_delay, rules=replay.rules)
+    ticks = []
+    for keyframe in replay.keyframes:
+        engine.restore(keyframe["state"].tobytes())
+        if engine.clearing_rows:
+            ticks.append(int(keyframe["tick"]))
+    return ticks
+
+
+def test_linear_playback_matches_recording(tmp_path):
+    replay = record_game(tmp_path / "game.trpl")
+    player = ReplayPlayer(replay)
+    player.run_to_end()
+    assert (player.engine.score, player.engine.lines_cleared) == (replay.score, replay.lines)
+    assert replay.lines > 0
+
+
+def test_seek_matches_linear_playback_inside_clears(tmp_path):
+    replay = record_game(tmp_path / "game.trpl")
+    ticks = clearing_keyframe_ticks(replay)
+    assert ticks
+    linear = ReplayPlayer(replay)
+    seeking = ReplayPlayer(replay)
+    # Rosnąco, liniowy gracz tylko idzie do przodu; seek zaczyna od keyframe'u z animacji
+    for tick in sorted(set(ticks + [t + 5 for t in ticks])):
+        while linear.tick < tick:
+            linear.step()
+        seeking.seek(tick)
+        assert seeking.engine.snapshot() == linear.engine.snapshot(), tick
+    seeking.seek(ticks[0])
+    fresh = ReplayPlayer(replay)
+    while fresh.tick < ticks[0]:
+        fresh.step()
+    assert seeking.engine.snapshot() == fresh.engine.snapshot()
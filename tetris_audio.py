@@ -0,0 +1,107 @@
+import time
+from collections import deque
+
+import numpy as np
+import pygame
+
+from frame_profiler import percentile
+
+# Dźwięk z małym opóźnieniem: mikser z małym buforem (pre_init przed pygame.init), próbki
+# zdekodowane raz do PCM przy wczytaniu, zarezerwowane kanały dla każdej kategorii
+# i jedno odtworzenie na klatkę dla identycznych zdarzeń.
+
+AUDIO_FREQUENCY = 44100
+AUDIO_SIZE = -16
+AUDIO_CHANNELS = 2
+# Próbki na jeden bufor urządzenia: 256 przy 44.1 kHz to ~5.8 ms (domyślnie pygame bierze 512-4096)
+AUDIO_BUFFER = 256
+# Kanały zarezerwowane dla kategorii - find_channel ich nie zabierze. Muzyka gra osobnym
+# strumieniem pygame.mixer.music, więc nie zajmuje żadnego z nich.
+CHANNEL_LAYOUT = {"drop": 2, "clear": 1}
+# Cisza na początku pliku (opóźnienie kodera mp3) jest obcinana przy wczytaniu; próg w jednostkach int16
+SILENCE_THRESHOLD = 32
+
+
+def trim_leading_silence(sound, threshold=SILENCE_THRESHOLD):
+    # Zwraca (dźwięk, liczba obciętych próbek)
+    samples = pygame.sndarray.array(sound)
+    loud = np.abs(samples.astype(np.int32))
+    if loud.ndim > 1:
+        loud = loud.max(axis=1)
+    start = int(np.argmax(loud > threshold))
+    if start == 0:
+        return sound, 0
+    return pygame.sndarray.make_sound(np.ascontiguousarray(samples[start:])), start
+
+
+class AudioEngine:
+    # profiler (FrameProfiler) - opóźnienie od zdarzenia do odtworzenia trafia do nakładki F3 jako "audio_latency"
+    def __init__(self, layout=CHANNEL_LAYOUT, buffer=AUDIO_BUFFER, profiler=None):
+        self.layout = dict(layout)
+        self.buffer = buffer
+        self.profiler = profiler
+        self.samples = {}
+        self.channels = {}
+        self.next_channel = {}
+        self.pending = {}
+        self.latency = deque(maxlen=256)
+        self.output_ms = 0.0
+
+    def pre_init(self):
+        # Musi być przed pygame.init() / pygame.mixer.init(), inaczej mikser startuje z domyślnym buforem
+        pygame.mixer.pre_init(AUDIO_FREQUENCY, AUDIO_SIZE, AUDIO_CHANNELS, self.buffer)
+
+    def init(self):
+        pygame.mixer.init()
+        frequency, size, channels = pygame.mixer.get_init()
+        # Jeden bufor grany + jeden wypełniany
+        self.output_ms = 2 * self.buffer / frequency * 1000
+        reserved = sum(self.layout.values())
+        pygame.mixer.set_num_channels(max(8, reserved + 4))
+        pygame.mixer.set_reserved(reserved)
+        index = 0
+        for category, count in self.layout.items():
+            self.channels[category] = [pygame.mixer.Channel(index + i) for i in range(count)]
+            self.next_channel[category] = 0
+            index += count
+
+    def load(self, category, path):
+        # Sound dekoduje cały plik do PCM od razu; tu dodatkowo bez ciszy na początku
+        self.samples[category], trimmed = trim_leading_silence(pygame.mixer.Sound(path))
+
+    def volume(self, category):
+        sound = self.samples.get(category)
+        return sound.get_volume() if sound else 1.0
+
+    def set_volume(self, category, value):
+        sound = self.samples.get(category)
+        if sound:
+            sound.set_volume(value)
+
+    def play(self, category, event_ns=None):
+        # Zdarzenie do odtworzenia w flush(); kilka takich samych w jednej klatce to jeden dźwięk
+        if category not in self.samples:
+            return
+        if event_ns is None:
+            event_ns = time.perf_counter_ns()
+        self.pending.setdefault(category, event_ns)
+
+    def flush(self):
+        # Raz na klatkę: wolny kanał kategorii, a gdy wszystkie grają - najdawniej uruchomiony
+        for category, event_ns in self.pending.items():
+            channels = self.channels.get(category)
+            if not channels:
+                continue
+            index = next((i for i, c in enumerate(channels) if not c.get_busy()), self.next_channel[category])
+            self.next_channel[category] = (index + 1) % len(channels)
+            channels[index].play(self.samples[category])
+            ms = (time.perf_counter_ns() - event_ns) / 1e6 + self.output_ms
+            self.latency.append(ms)
+            if self.profiler is not None and self.profiler.enabled:
+                self.profiler.add_sample("audio_latency", ms)
+        self.pending.clear()
+
+    def latency_summary(self):
+        # (p50, p95) w ms: od zdarzenia do play() plus szacowany czas bufora urządzenia
+        values = sorted(self.latency)
+        return percentile(values, 0.5), percentile(values, 0.95)
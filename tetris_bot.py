@@ -0,0 +1,219 @@
+import numpy as np
+
+from tetris_engine import GRID_WIDTH, GRID_HEIGHT, WALL_MARGIN, PIECES, Block, LEFT, RIGHT, ROTATE, DROP, HOLD
+
+# Bot do autoplay, dema w menu i długich testów: przegląda wszystkie ustawienia klocka osiągalne
+# z klawiatury (obroty z wall kickami, przesunięcia, zrzut) i ocenia plansze wynikowe naraz w NumPy.
+
+# Wagi cech planszy (aggregate height, lines, holes, bumpiness) - znany zestaw z algorytmu genetycznego
+DEFAULT_WEIGHTS = {"height": -0.510066, "lines": 0.760666, "holes": -0.35663, "bumpiness": -0.184483}
+TOP_OUT_PENALTY = -1e6
+
+
+def _distinct_rotations(shape_id):
+    # O ma jeden stan, I/S/Z po dwa - reszta daje te same komórki
+    seen = {}
+    for rotation, piece in enumerate(PIECES[shape_id]):
+        seen.setdefault(piece.cells, rotation)
+    return sorted(seen.values())
+
+
+def _piece_rows(piece, x):
+    # Maski wierszy klocka w kolumnie x, dopełnione zerami do 4 wierszy
+    masks = [0] * 4
+    for cx, cy in piece.cells:
+        masks[cy] |= 1 << (x + cx)
+    return masks
+
+
+def _drop_table(shape_id):
+    # Wszystkie (obrót, kolumna) dla zrzutu prosto z góry: maski wierszy oraz kolumny i wiersze komórek
+    masks, cells_x, cells_y = [], [], []
+    for rotation in _distinct_rotations(shape_id):
+        piece = PIECES[shape_id][rotation]
+        for x in range(GRID_WIDTH - piece.width + 1):
+            masks.append(_piece_rows(piece, x))
+            cells_x.append([x + cx for cx, cy in piece.cells])
+            cells_y.append([cy for cx, cy in piece.cells])
+    return np.array(masks, dtype=np.uint16), np.array(cells_x), np.array(cells_y)
+
+
+DROP_TABLES = [_drop_table(shape_id) for shape_id in range(len(PIECES))]
+
+# Plansze bota to wiersze uint16, bit x to kolumna x (jak rows w silniku, bez ścian)
+FULL_ROW_BITS = (1 << GRID_WIDTH) - 1
+COLUMN_SHIFTS = np.arange(GRID_WIDTH, dtype=np.uint16)
+POPCOUNT = np.array([bin(i).count("1") for i in range(1 << GRID_WIDTH)], dtype=np.int32)
+
+
+def board_rows(engine):
+    return np.array([(row >> WALL_MARGIN) & FULL_ROW_BITS for row in engine.rows], dtype=np.uint16)
+
+
+def column_heights(covered):
+    # covered - wiersze po OR od góry; wysokość kolumny to liczba wierszy z ustawionym bitem
+    return ((covered[:, :, None] >> COLUMN_SHIFTS) & 1).sum(axis=1, dtype=np.int32)
+
+
+def place(boards, ys, masks):
+    # boards (N, H), ys (N,), masks (N, 4) -> nowe plansze i maska ustawień mieszczących się w planszy
+    fits = ys >= 0
+    boards = boards.copy()
+    index = np.arange(len(boards))
+    for row in range(4):
+        boards[index, np.clip(ys + row, 0, GRID_HEIGHT - 1)] |= masks[:, row]
+    return boards, fits
+
+
+def clear_full_rows(boards):
+    full = boards == FULL_ROW_BITS
+    lines = full.sum(axis=1)
+    if lines.any():
+        # Pełne wiersze na górę (stabilnie, reszta zachowuje kolejność) i wyczyszczenie ich
+        order = np.argsort(~full, axis=1, kind="stable")
+        boards = np.take_along_axis(boards, order, axis=1)
+        boards[np.arange(GRID_HEIGHT)[None, :] < lines[:, None]] = 0
+    return boards, lines
+
+
+def evaluate(boards, lines, weights):
+    covered = np.bitwise_or.accumulate(boards, axis=1)
+    heights = column_heights(covered)
+    holes = POPCOUNT[covered & ~boards].sum(axis=1)
+    bumpiness = np.abs(np.diff(heights, axis=1)).sum(axis=1)
+    return (weights["height"] * heights.sum(axis=1)
+            + weights["lines"] * lines
+            + weights["holes"] * holes
+            + weights["bumpiness"] * bumpiness)
+
+
+class Placement:
+    __slots__ = ("actions", "x", "y", "shape_id", "rotation")
+
+    def __init__(self, actions, x, y, shape_id, rotation):
+        self.actions = actions
+        self.x = x
+        self.y = y
+        self.shape_id = shape_id
+        self.rotation = rotation
+
+
+class PlacementBot:
+    # lookahead - każde ustawienie oceniane razem z najlepszym ustawieniem następnego klocka
+    def __init__(self, weights=None, use_hold=True, lookahead=True):
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.use_hold = use_hold
+        self.lookahead = lookahead
+
+    def placements(self, engine, block, prefix=()):
+        # Tak jak gracz: najpierw obroty, potem przesunięcia w bok, na końcu twardy zrzut
+        rotations = []
+        probe = Block(block.x, block.y, block.shape_id, block.rotation)
+        actions = list(prefix)
+        for _ in range(4):
+            rotations.append((list(actions), probe.x, probe.y, probe.rotation))
+            target = engine.rotation_target(probe)
+            if target is None:
+                break
+            probe.x, probe.y, probe.rotation = target
+            actions.append(ROTATE)
+
+        results = []
+        seen = set()
+        for actions, x, y, rotation in rotations:
+            for direction, dx in ((None, 0), (LEFT, -1), (RIGHT, 1)):
+                shifted = Block(x, y, block.shape_id, rotation)
+                moves = []
+                while True:
+                    landed = Block(shifted.x, shifted.y, block.shape_id, rotation)
+                    landed.y += engine.drop_distance(landed)
+                    key = (landed.x, landed.y, landed.piece.cells)
+                    if key not in seen:
+                        seen.add(key)
+                        results.append(Placement(actions + moves + [DROP], landed.x, landed.y, block.shape_id, rotation))
+                    if direction is None or not engine.valid_move(shifted, dx, 0):
+                        break
+                    shifted.x += dx
+                    moves.append(direction)
+        return results
+
+    def candidates(self, engine):
+        options = [((), engine.current_block)]
+        if self.use_hold and not engine.hold_used and engine.hold_block is not None:
+            # Zamiana z trzymanym klockiem; przy pustym hold następny klocek nie jest jeszcze znany
+            swapped = Block.spawn(engine.hold_block.shape_id, engine.hold_block.rotation)
+            if engine.valid_move(swapped):
+                options.append(((HOLD,), swapped))
+        candidates = []
+        for prefix, block in options:
+            candidates.extend(self.placements(engine, block, prefix))
+        return candidates
+
+    def score(self, engine, candidates):
+        masks = np.array([_piece_rows(PIECES[c.shape_id][c.rotation], c.x) for c in candidates], dtype=np.uint16)
+        ys = np.array([c.y for c in candidates])
+        base = np.broadcast_to(board_rows(engine), (len(candidates), GRID_HEIGHT))
+        boards, fits = place(base, ys, masks)
+        boards, lines = clear_full_rows(boards)
+        if self.lookahead and engine.next_block is not None:
+            scores = self.lookahead_scores(boards, lines, engine.next_block.shape_id)
+        else:
+            scores = evaluate(boards, lines, self.weights)
+        return np.where(fits, scores, TOP_OUT_PENALTY)
+
+    def lookahead_scores(self, boards, lines, shape_id):
+        # Wszystkie plansze po drugim klocku w jednym przebiegu: N ustawień x K ustawień następnego
+        masks, cells_x, cells_y = DROP_TABLES[shape_id]
+        count, options = len(boards), len(masks)
+        tops = GRID_HEIGHT - column_heights(np.bitwise_or.accumulate(boards, axis=1))
+        ys = (tops[:, cells_x] - cells_y[None]).min(axis=2) - 1
+        second, fits = place(np.repeat(boards, options, axis=0), ys.reshape(-1), np.tile(masks, (count, 1)))
+        second, second_lines = clear_full_rows(second)
+        scores = evaluate(second, np.repeat(lines, options) + second_lines, self.weights)
+        scores = np.where(fits, scores, TOP_OUT_PENALTY)
+        return scores.reshape(count, options).max(axis=1)
+
+    def choose(self, engine):
+        # Lista akcji dla step(), kończy się DROP
+        candidates = self.candidates(engine)
+        if not candidates:
+            return [DROP]
+        scores = self.score(engine, candidates)
+        return list(candidates[int(np.argmax(scores))].actions)
+
+
+class BotDriver:
+    # Bot grający w czasie rzeczywistym gry: plan raz na klocek, jedna akcja co action_ms
+    def __init__(self, bot=None, action_ms=50):
+        self.bot = bot or PlacementBot()
+        self.action_ms = action_ms
+        self.reset()
+
+    def reset(self):
+        self.actions = []
+        self.block = None
+        self.timer = 0
+
+    def inputs(self, engine, elapsed_ms):
+        if engine.clearing_rows:
+            return []
+        self.timer -= elapsed_ms
+        if self.timer > 0:
+            return []
+        self.timer += self.action_ms
+        # Nowy klocek (także po HOLD albo po zablokowaniu przez grawitację) - nowy plan
+        if engine.current_block is not self.block or not self.actions:
+            self.block = engine.current_block
+            self.actions = self.bot.choose(engine)
+        return [self.actions.pop(0)]
+
+
+def play(engine, bot=None, max_pieces=None):
+    # Gra bota bez renderera aż do końca gry (albo max_pieces klocków); zwraca liczbę klocków
+    bot = bot or PlacementBot()
+    pieces = 0
+    while not engine.game_over and (max_pieces is None or pieces < max_pieces):
+        engine.step(bot.choose(engine))
+        engine.drain_events()
+        pieces += 1
+    return pieces
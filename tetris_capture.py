@@ -0,0 +1,182 @@
+import os
+import queue
+import struct
+import subprocess
+import threading
+import time
+import zlib
+
+import numpy as np
+
+# Nagrywanie obrazu końcowego (po przebiegach CRT i fisheye) bez zatrzymywania gry. Klatka jest kopiowana
+# na GPU do jednego z kilku buforów PBO po kolei (glReadPixels bez czekania), a odczytywana na CPU dopiero,
+# gdy ten bufor wraca w kolejce - GPU dawno skończyło kopię. Odczytane klatki idą do kolejki o stałej długości,
+# zapisuje je osobny wątek. Gdy zapis nie nadąża, klatki przepadają (dropped) zamiast hamować grę.
+
+CAPTURE_BUFFERS = 3
+CAPTURE_QUEUE = 16
+CAPTURE_FPS = 30
+# Szybka kompresja - przy nagrywaniu liczy się nadążanie, nie rozmiar plików
+PNG_LEVEL = 1
+# Koder dla ścieżek innych niż .rgb/.raw i katalog: surowe RGB na standardowe wejście procesu
+ENCODER_COMMAND = [
+    "ffmpeg", "-loglevel", "error", "-y", "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", "{width}x{height}",
+    "-r", "{fps}", "-i", "-", "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", "{path}",
+]
+
+
+def capture_format(path):
+    # "png" - katalog z sekwencją PNG, "raw" - jeden plik surowych klatek RGB, "pipe" - koder (ENCODER_COMMAND)
+    if path.endswith(("/", os.sep)) or os.path.isdir(path):
+        return "png"
+    if path.lower().endswith((".rgb", ".raw")):
+        return "raw"
+    return "pipe"
+
+
+def encode_png(pixels, width, height, level=PNG_LEVEL):
+    # pixels - wiersze RGB od góry, (height, width * 3). Własny zapis zamiast pygame.image.save: zlib puszcza GIL
+    # na czas kompresji, więc wątek zapisu nie zatrzymuje gry
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    # Bajt filtra 0 (bez filtra) przed każdym wierszem
+    scanlines = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    scanlines[:, 1:] = pixels
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(scanlines.data, level)) + chunk(b"IEND", b""))
+
+
+class VideoCapture:
+    # ctx - kontekst moderngl, size - rozmiar czytanego framebuffera, fps - co ile czasu brać klatkę
+    # (0 - każdą), command - lista argumentów kodera zamiast ENCODER_COMMAND
+    def __init__(self, ctx, size, path, fps=CAPTURE_FPS, buffers=CAPTURE_BUFFERS, queue_size=CAPTURE_QUEUE,
+                 command=None):
+        self.size = size
+        self.path = path
+        self.fps = fps
+        self.format = capture_format(path)
+        width, height = size
+        self.index = 0
+        self.interval_ns = 1_000_000_000 / fps if fps else 0
+        self.next_ns = 0
+        self.queue = queue.Queue(queue_size)
+        self.captured = 0
+        self.written = 0
+        # dropped - przepadłe w wątku gry (pełna kolejka), lost - w wątku zapisu po błędzie zapisu
+        self.dropped = 0
+        self.lost = 0
+        self.failed = None
+        self.first_ns = None
+        self.process = None
+        if self.format == "png":
+            os.makedirs(path, exist_ok=True)
+            self.file = None
+            self.timestamps = open(os.path.join(path, "frames.txt"), "w")
+        elif self.format == "raw":
+            self.file = open(path, "wb")
+            self.timestamps = open(path + ".txt", "w")
+        else:
+            args = [part.format(width=width, height=height, fps=fps or 60, path=path)
+                    for part in (command or ENCODER_COMMAND)]
+            self.process = subprocess.Popen(args, stdin=subprocess.PIPE)
+            self.file = self.process.stdin
+            self.timestamps = None
+        # Pierwsza linia: jak zrobić z tego film, dalej numer klatki i czas od pierwszej w ms
+        if self.format == "png":
+            self.timestamps.write("# ffmpeg -framerate {} -i frame_%06d.png out.mp4\n".format(fps or 60))
+        elif self.format == "raw":
+            self.timestamps.write("# ffmpeg -f rawvideo -pix_fmt rgb24 -s {}x{} -framerate {} -i {} out.mp4\n".format(
+                width, height, fps or 60, os.path.basename(path)))
+        # Bufory dopiero po otwarciu pliku/kodera - błąd otwarcia nie zostawia ich w kontekście
+        self.pbos = [ctx.buffer(reserve=width * height * 3) for _ in range(buffers)]
+        # Czas klatki skopiowanej do bufora, który czeka na odczyt, albo None
+        self.pending = [None] * buffers
+        self.writer = threading.Thread(target=self.write_frames, name="capture-writer", daemon=True)
+        self.writer.start()
+
+    def capture(self, framebuffer, now_ns=None):
+        # Po narysowaniu klatki, przed flip. Koszt w wątku gry: jedno glReadPixels do PBO
+        # i odczyt bufora sprzed len(pbos) klatek (albo nic, gdy kolejka jest pełna)
+        if now_ns is None:
+            now_ns = time.perf_counter_ns()
+        if now_ns < self.next_ns:
+            return
+        # Stały odstęp między klatkami; po dłuższej przerwie liczymy od teraz
+        self.next_ns = max(self.next_ns, now_ns - self.interval_ns) + self.interval_ns
+        slot = self.index % len(self.pbos)
+        self.index += 1
+        self.collect(slot)
+        framebuffer.read_into(self.pbos[slot], components=3, alignment=1)
+        self.pending[slot] = now_ns
+        self.captured += 1
+
+    def collect(self, slot):
+        t_ns = self.pending[slot]
+        if t_ns is None:
+            return
+        self.pending[slot] = None
+        if self.queue.full() or self.failed:
+            # Zapis nie nadąża - klatka przepada bez kopiowania z GPU
+            self.dropped += 1
+            return
+        self.queue.put_nowait((t_ns, self.pbos[slot].read()))
+
+    def write_frames(self):
+        width, height = self.size
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if self.failed:
+                self.lost += 1
+                continue
+            t_ns, data = item
+            if self.first_ns is None:
+                self.first_ns = t_ns
+            # Wiersze z glReadPixels idą od dołu obrazu
+            pixels = np.frombuffer(data, dtype=np.uint8).reshape(height, width * 3)[::-1]
+            try:
+                self.write_frame(self.written, np.ascontiguousarray(pixels))
+            except OSError as e:
+                # Pełny dysk albo koder się zamknął - dalsze klatki przepadają, gra idzie dalej
+                print("Capture stopped:", e)
+                self.failed = e
+                self.lost += 1
+                continue
+            if self.timestamps:
+                self.timestamps.write("{} {:.1f}\n".format(self.written, (t_ns - self.first_ns) / 1e6))
+            self.written += 1
+
+    def write_frame(self, number, pixels):
+        if self.format == "png":
+            with open(os.path.join(self.path, "frame_{:06d}.png".format(number)), "wb") as f:
+                f.write(encode_png(pixels, *self.size))
+        else:
+            self.file.write(pixels.data)
+
+    def close(self, read_pending=True):
+        # read_pending=False, gdy kontekstu GL już nie ma (po pygame.quit) - klatki w PBO przepadają
+        if read_pending:
+            for i in range(len(self.pbos)):
+                self.collect((self.index + i) % len(self.pbos))
+            for pbo in self.pbos:
+                pbo.release()
+        else:
+            self.dropped += sum(t_ns is not None for t_ns in self.pending)
+        self.pending = [None] * len(self.pbos)
+        self.queue.put(None)
+        self.writer.join()
+        try:
+            if self.file:
+                self.file.close()
+            if self.process:
+                self.process.wait()
+        except OSError as e:
+            print("Capture stopped:", e)
+        if self.timestamps:
+            self.timestamps.close()
+        return self.stats()
+
+    def stats(self):
+        return {"captured": self.captured, "written": self.written, "dropped": self.dropped + self.lost, "path": self.path}
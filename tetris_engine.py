@@ -0,0 +1,509 @@
+import random
+import struct
+
+# Reguły gry bez pygame i bez rysowania. Front end (tetris_single.py) tylko
+# tłumaczy klawisze na akcje, woła step() i rysuje stan silnika.
+
+GRID_WIDTH = 10
+GRID_HEIGHT = 20
+
+# fall_speed, clear_delay i elapsed w step() są liczone w jednostkach po 200 ms
+TIME_UNIT_MS = 200
+
+# Krzywa trudności i punktacja. TetrisEngine(rules={...}) nadpisuje wybrane wartości (symulacje balansu).
+DEFAULT_RULES = {
+    "fall_speed": 2.8,  # początkowy czas spadku o wiersz
+    "speed_multiplier": 0.8,  # mnożnik fall_speed przy każdym nowym poziomie
+    "min_fall_speed": 0.05,
+    "lines_per_level": 10,
+    "line_scores": (100, 300, 500, 800),
+}
+
+SHAPES = [
+    [[1, 1, 1, 1]],  # I
+    [[1, 1], [1, 1]],  # O
+    [[1, 1, 1], [0, 1, 0]],  # T
+    [[1, 1, 1], [1, 0, 0]],  # L
+    [[1, 1, 1], [0, 0, 1]],  # J
+    [[0, 1, 1], [1, 1, 0]],  # S
+    [[1, 1, 0], [0, 1, 1]]   # Z
+]
+
+# Id kształtu komórek śmieci w trybie versus (w grid: GARBAGE + 1), poza zakresem SHAPES
+GARBAGE = len(SHAPES)
+
+# Plansza jako maski bitowe: jeden int na wiersz, bit WALL_MARGIN + x to kolumna x.
+# Bity poza planszą są zawsze ustawione (ściany), więc kolizja to jedno AND,
+# a pełna linia to porównanie z FULL_ROW.
+WALL_MARGIN = 4
+FULL_ROW = (1 << (GRID_WIDTH + 2 * WALL_MARGIN)) - 1
+EMPTY_ROW = FULL_ROW ^ (((1 << GRID_WIDTH) - 1) << WALL_MARGIN)
+
+
+def _shape_masks(shape):
+    # Dla każdej kolumny x (z marginesem) maski wierszy klocka przesunięte o x
+    row_masks = [sum(1 << i for i, cell in enumerate(row) if cell) for row in shape]
+    return [[mask << x for mask in row_masks] for x in range(GRID_WIDTH + WALL_MARGIN + 1)]
+
+
+# Przesunięcia (dx, dy) próbowane po kolei przy obrocie, zanim obrót zostanie odrzucony
+WALL_KICKS = {
+    0: ((0, 0), (-1, 0), (1, 0), (-2, 0), (2, 0)),  # I
+    1: ((0, 0),),  # O
+}
+DEFAULT_WALL_KICKS = ((0, 0), (-1, 0), (1, 0))
+
+
+class PieceRotation:
+    # Jeden stan obrotu klocka: kształt, komórki, wymiary, maski kolizji i wall kicki
+    def __init__(self, shape, kicks):
+        self.shape = shape
+        self.cells = tuple((x, y) for y, row in enumerate(shape) for x, cell in enumerate(row) if cell)
+        self.width = len(shape[0])
+        self.height = len(shape)
+        self.masks = _shape_masks(shape)
+        # (kolumna, najniższy wiersz) dla każdej kolumny klocka - spód do odległości zrzutu
+        self.bottoms = tuple((x, max(cy for cx, cy in self.cells if cx == x))
+                             for x in range(self.width) if any(cx == x for cx, cy in self.cells))
+        self.kicks = kicks
+
+
+def _build_pieces():
+    pieces = []
+    for shape_id, shape in enumerate(SHAPES):
+        kicks = WALL_KICKS.get(shape_id, DEFAULT_WALL_KICKS)
+        rotations = []
+        for _ in range(4):
+            rotations.append(PieceRotation(shape, kicks))
+            # Obrót zgodnie z ruchem wskazówek zegara, lewy górny róg zostaje w miejscu
+            shape = [list(row) for row in zip(*shape[::-1])]
+        pieces.append(tuple(rotations))
+    return tuple(pieces)
+
+
+# PIECES[shape_id][rotation] -> PieceRotation, liczone raz przy imporcie
+PIECES = _build_pieces()
+
+
+# Akcje przyjmowane przez step()
+LEFT = "left"
+RIGHT = "right"
+DOWN = "down"
+ROTATE = "rotate"
+DROP = "drop"
+HOLD = "hold"
+# Kody akcji w zapisach binarnych (powtórki, snapshoty) - indeks w tej krotce
+ACTIONS = (LEFT, RIGHT, DOWN, ROTATE, DROP, HOLD)
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+
+# Zdarzenia zbierane w engine.events dla front endu (dźwięki, wstrząs ekranu)
+EVENT_LOCK = "lock"
+EVENT_CLEAR = "clear"
+
+
+class Block:
+    __slots__ = ("x", "y", "shape_id", "rotation")
+
+    def __init__(self, x, y, shape_id, rotation=0):
+        self.x = x
+        self.y = y
+        self.shape_id = shape_id
+        self.rotation = rotation
+
+    @property
+    def piece(self):
+        return PIECES[self.shape_id][self.rotation]
+
+    @property
+    def shape(self):
+        return PIECES[self.shape_id][self.rotation].shape
+
+    @property
+    def masks(self):
+        return PIECES[self.shape_id][self.rotation].masks
+
+    @classmethod
+    def spawn(cls, shape_id, rotation=0):
+        return cls(GRID_WIDTH // 2 - PIECES[shape_id][rotation].width // 2, 0, shape_id, rotation)
+
+
+class SplitMix64:
+    # Mały generator, którego cały stan to jedna liczba 64-bitowa - łatwo go zapisać w snapshocie
+    MASK = (1 << 64) - 1
+
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.state = seed & self.MASK
+
+    def next(self):
+        self.state = (self.state + 0x9E3779B97F4A7C15) & self.MASK
+        z = self.state
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & self.MASK
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & self.MASK
+        return z ^ (z >> 31)
+
+    def randrange(self, n):
+        return self.next() % n
+
+
+# Snapshot stanu gry o stałym rozmiarze: nagłówek struct + maski wierszy (rows, uint32)
+# + plansza jako bajty (id kształtu + 1). Maski są zapisane, żeby restore ich nie przeliczał.
+# Kolejność pól: rng, piece_count, score, lines, level, fall_speed, fall_time, clear_timer,
+# maska czyszczonych wierszy, aktywny klocek (x, y, kształt, obrót), następny, hold (255 - pusty),
+# flagi (hold_used, game_over), liczba akcji w buforze, bufor akcji (kody). step() nie buforuje więcej
+# niż SNAPSHOT_INPUT_BUFFER akcji, więc snapshot zawsze mieści cały bufor.
+SNAPSHOT_INPUT_BUFFER = 16
+SNAPSHOT_HEADER = struct.Struct("<QIQIHdddIbbBBBBBBBB%ds" % SNAPSHOT_INPUT_BUFFER)
+SNAPSHOT_ROWS = struct.Struct("<%dI" % GRID_HEIGHT)
+SNAPSHOT_GRID_OFFSET = SNAPSHOT_HEADER.size + SNAPSHOT_ROWS.size
+SNAPSHOT_SIZE = SNAPSHOT_GRID_OFFSET + GRID_WIDTH * GRID_HEIGHT
+NO_PIECE = 255
+
+
+class TetrisEngine:
+    # rows - maski bitowe do kolizji, grid - równoległe bytearray z id kształtu + 1 (0 - pusta) do rysowania.
+    # column_tops - profil powierzchni: wiersz najwyższej zajętej komórki w każdej kolumnie (GRID_HEIGHT -
+    # pusta kolumna), aktualizowany w lock_block. Po usunięciu linii None - liczony od nowa przy następnym
+    # drop_distance, więc samo czyszczenie linii nie płaci za profil; kto zmienia rows z zewnątrz,
+    # woła refresh_surface().
+    # clear_delay > 0 zostawia pełne linie na planszy tyle czasu (animacja w front endzie),
+    # bez renderera linie znikają od razu.
+    def __init__(self, seed=None, clear_delay=0, rules=None):
+        self.rng = SplitMix64(seed)
+        self.clear_delay = clear_delay
+        self.rules = dict(DEFAULT_RULES, **(rules or {}))
+        # piece_log - lista, do której trafia każdy wylosowany klocek (nagrywanie powtórek),
+        # forced_pieces - klocki brane z zapisu zamiast z generatora (odtwarzanie)
+        self.piece_log = None
+        self.forced_pieces = None
+        self.piece_count = 0
+        self.events = []
+        self.reset_game()
+
+    def reset_game(self):
+        self.piece_count = 0
+        self.rows = [EMPTY_ROW] * GRID_HEIGHT
+        self.grid = [bytearray(GRID_WIDTH) for _ in range(GRID_HEIGHT)]
+        self.column_tops = [GRID_HEIGHT] * GRID_WIDTH
+        self.current_block = self.new_block()
+        self.next_block = self.new_block()
+        self.hold_block = None
+        self.hold_used = False
+        self.game_over = False
+        self.score = 0
+        self.level = 1
+        self.lines_cleared = 0
+        self.fall_speed = self.rules["fall_speed"]
+        self.fall_time = 0
+        self.clearing_rows = ()
+        self.clear_timer = 0
+        self.input_buffer = []
+        self.events = []
+
+    def new_block(self):
+        # Generator losuje zawsze, także przy forced_pieces - stan (i snapshot) zgadza się z nagraniem
+        shape_id = self.rng.randrange(len(SHAPES))
+        if self.forced_pieces is not None and self.piece_count < len(self.forced_pieces):
+            shape_id = int(self.forced_pieces[self.piece_count])
+        self.piece_count += 1
+        if self.piece_log is not None:
+            self.piece_log.append(shape_id)
+        return Block.spawn(shape_id)
+
+    def valid_move(self, block, x_offset=0, y_offset=0):
+        masks = PIECES[block.shape_id][block.rotation].masks
+        x = block.x + x_offset + WALL_MARGIN
+        if x < 0 or x >= len(masks):
+            return False
+        y = block.y + y_offset
+        rows = self.rows
+        for mask in masks[x]:
+            if mask:
+                if y >= GRID_HEIGHT:
+                    return False
+                # Nad planszą liczą się tylko ściany
+                if (rows[y] if y >= 0 else EMPTY_ROW) & mask:
+                    return False
+            y += 1
+        return True
+
+    def rotation_target(self, block):
+        # Pozycja (x, y, rotation) po obrocie z pierwszym pasującym wall kickiem albo None
+        rotated = Block(block.x, block.y, block.shape_id, (block.rotation + 1) % 4)
+        for dx, dy in rotated.piece.kicks:
+            if self.valid_move(rotated, dx, dy):
+                return block.x + dx, block.y + dy, rotated.rotation
+        return None
+
+    def rotate_block(self):
+        target = self.rotation_target(self.current_block)
+        if target is not None:
+            block = self.current_block
+            block.x, block.y, block.rotation = target
+
+    def hold_current_block(self):
+        if self.hold_used:
+            return
+
+        if self.hold_block is None:
+            self.hold_block = Block.spawn(self.current_block.shape_id, self.current_block.rotation)
+            self.current_block = self.next_block
+            self.next_block = self.new_block()
+        else:
+            temp = self.current_block
+            new_block = Block.spawn(self.hold_block.shape_id, self.hold_block.rotation)
+            while not self.valid_move(new_block):
+                new_block.x -= 1
+                if new_block.x < 0:
+                    new_block.x = 0
+                    break
+            self.current_block = new_block
+            self.hold_block = Block.spawn(temp.shape_id, temp.rotation)
+        self.hold_used = True
+
+        while not self.valid_move(self.current_block):
+            self.current_block.y -= 1
+            if self.current_block.y < 0:
+                break
+
+    def lock_block(self):
+        block = self.current_block
+        piece = block.piece
+        masks = piece.masks[block.x + WALL_MARGIN]
+        for y, mask in enumerate(masks):
+            # Komórki nad planszą przepadają, i tak kończy się wtedy gra
+            if block.y + y >= 0:
+                self.rows[block.y + y] |= mask
+        tops = self.column_tops
+        for x, y in piece.cells:
+            if block.y + y >= 0:
+                self.grid[block.y + y][block.x + x] = block.shape_id + 1
+                if tops is not None and block.y + y < tops[block.x + x]:
+                    tops[block.x + x] = block.y + y
+        self.events.append((EVENT_LOCK,))
+
+        if self.clear_delay and FULL_ROW in self.rows:
+            # Punkty od razu, usunięcie linii i nowy klocek dopiero po animacji (patrz step)
+            self.clearing_rows = tuple(self.full_rows())
+            self.clear_timer = self.clear_delay
+            self.score_lines(len(self.clearing_rows))
+            return
+
+        self.clear_lines()
+        self.spawn_next_block()
+
+    def spawn_next_block(self):
+        self.current_block = self.next_block
+        self.next_block = self.new_block()
+        self.hold_used = False
+
+        if not self.valid_move(self.current_block):
+            self.game_over = True
+
+    def full_rows(self):
+        return [i for i, row in enumerate(self.rows) if row == FULL_ROW]
+
+    def remove_full_rows(self):
+        rows = self.rows
+        if FULL_ROW not in rows:
+            return 0
+        keep = [i for i, row in enumerate(rows) if row != FULL_ROW]
+        lines_cleared = GRID_HEIGHT - len(keep)
+        self.column_tops = None
+        self.rows = [EMPTY_ROW] * lines_cleared + [rows[i] for i in keep]
+        self.grid = [bytearray(GRID_WIDTH) for _ in range(lines_cleared)] + [self.grid[i] for i in keep]
+        return lines_cleared
+
+    def refresh_surface(self):
+        # Profil powierzchni od zera z rows (restore, plansze ustawione z zewnątrz)
+        tops = [GRID_HEIGHT] * GRID_WIDTH
+        covered = EMPTY_ROW
+        for y, row in enumerate(self.rows):
+            new = row & ~covered
+            if new:
+                for x in range(GRID_WIDTH):
+                    if new >> (x + WALL_MARGIN) & 1:
+                        tops[x] = y
+                covered |= row
+                if covered == FULL_ROW:
+                    break
+        self.column_tops = tops
+
+    def add_garbage(self, lines, hole):
+        # Linie śmieci od dołu (tryb versus): plansza przesuwa się w górę, w każdej linii dziura w kolumnie hole.
+        # Zajęte komórki wypchnięte nad planszę kończą grę, spadający klocek ucieka w górę przed śmieciami.
+        lines = min(lines, GRID_HEIGHT)
+        if any(row != EMPTY_ROW for row in self.rows[:lines]):
+            self.game_over = True
+        cells = bytearray([GARBAGE + 1] * GRID_WIDTH)
+        cells[hole] = 0
+        self.rows = self.rows[lines:] + [FULL_ROW ^ (1 << (hole + WALL_MARGIN))] * lines
+        self.grid = self.grid[lines:] + [bytearray(cells) for _ in range(lines)]
+        self.clearing_rows = tuple(y - lines for y in self.clearing_rows if y >= lines)
+        self.refresh_surface()
+        block = self.current_block
+        while not self.valid_move(block) and block.y > -GRID_HEIGHT:
+            block.y -= 1
+
+    def drop_distance(self, block):
+        # O ile wierszy klocek spadnie. Gdy każda kolumna klocka jest nad powierzchnią, to odczyt z profilu
+        # (tyle operacji, ile kolumn ma klocek); klocek wsunięty pod nawis sprawdzamy wiersz po wierszu.
+        tops = self.column_tops
+        if tops is None:
+            self.refresh_surface()
+            tops = self.column_tops
+        distance = GRID_HEIGHT
+        for x, bottom in PIECES[block.shape_id][block.rotation].bottoms:
+            gap = tops[block.x + x] - block.y - bottom - 1
+            if gap < 0:
+                distance = 0
+                while self.valid_move(block, 0, distance + 1):
+                    distance += 1
+                return distance
+            if gap < distance:
+                distance = gap
+        return distance
+
+    def clear_lines(self):
+        lines_cleared = self.remove_full_rows()
+        if lines_cleared:
+            self.score_lines(lines_cleared)
+
+    def score_lines(self, lines_cleared):
+        self.events.append((EVENT_CLEAR, lines_cleared))
+        self.lines_cleared += lines_cleared
+        rules = self.rules
+        self.score += rules["line_scores"][lines_cleared - 1] * self.level
+        per_level = rules["lines_per_level"]
+        if self.lines_cleared // per_level > (self.lines_cleared - lines_cleared) // per_level:
+            self.level += 1
+            self.fall_speed = max(rules["min_fall_speed"], self.fall_speed * rules["speed_multiplier"])
+
+    def hard_drop(self):
+        self.current_block.y += self.drop_distance(self.current_block)
+        self.lock_block()
+
+    def apply_input(self, action):
+        if action == LEFT and self.valid_move(self.current_block, -1, 0):
+            self.current_block.x -= 1
+        elif action == RIGHT and self.valid_move(self.current_block, 1, 0):
+            self.current_block.x += 1
+        elif action == DOWN and self.valid_move(self.current_block, 0, 1):
+            self.current_block.y += 1
+        elif action == ROTATE:
+            self.rotate_block()
+        elif action == DROP:
+            self.hard_drop()
+        elif action == HOLD:
+            self.hold_current_block()
+
+    def step(self, inputs=(), elapsed=0):
+        # Jeden krok: akcje w kolejności, potem grawitacja. elapsed w jednostkach fall_speed.
+        if self.clearing_rows:
+            # W trakcie animacji czyszczenia akcje czekają w buforze i wchodzą zaraz po niej. Bufor ma tyle
+            # miejsca co snapshot - nadmiarowe akcje przepadają tu, tak samo w grze, powtórce i po restore
+            self.input_buffer.extend(inputs)
+            del self.input_buffer[SNAPSHOT_INPUT_BUFFER:]
+            self.clear_timer -= elapsed
+            if self.clear_timer > 0:
+                return self.events
+            elapsed = -self.clear_timer
+            self.clearing_rows = ()
+            self.clear_timer = 0
+            self.remove_full_rows()
+            self.spawn_next_block()
+            inputs, self.input_buffer = self.input_buffer, []
+
+        for action in inputs:
+            if self.game_over:
+                break
+            self.apply_input(action)
+
+        if not self.game_over:
+            self.fall_time += elapsed
+            if self.fall_time >= self.fall_speed:
+                self.fall_time = 0
+                if self.valid_move(self.current_block, 0, 1):
+                    self.current_block.y += 1
+                else:
+                    self.lock_block()
+        return self.events
+
+    def drain_events(self):
+        events, self.events = self.events, []
+        return events
+
+    def snapshot(self, out=None):
+        # Cały stan gry w SNAPSHOT_SIZE bajtach (bez zdarzeń i konfiguracji silnika).
+        # out - gotowy bufor (bytearray / memoryview) do zapisu w miejscu, bez alokacji
+        block, next_block, hold = self.current_block, self.next_block, self.hold_block
+        clearing_mask = 0
+        for y in self.clearing_rows:
+            clearing_mask |= 1 << y
+        buffer = bytes(ACTION_CODES[action] for action in self.input_buffer)
+        fields = (
+            self.rng.state, self.piece_count, self.score, self.lines_cleared, self.level,
+            self.fall_speed, self.fall_time, self.clear_timer, clearing_mask,
+            block.x, block.y, block.shape_id, block.rotation,
+            next_block.shape_id, next_block.rotation,
+            hold.shape_id if hold else NO_PIECE, hold.rotation if hold else 0,
+            self.hold_used | self.game_over << 1, len(buffer), buffer,
+        )
+        if out is None:
+            return SNAPSHOT_HEADER.pack(*fields) + SNAPSHOT_ROWS.pack(*self.rows) + b"".join(self.grid)
+        SNAPSHOT_HEADER.pack_into(out, 0, *fields)
+        SNAPSHOT_ROWS.pack_into(out, SNAPSHOT_HEADER.size, *self.rows)
+        out[SNAPSHOT_GRID_OFFSET:SNAPSHOT_SIZE] = b"".join(self.grid)
+        return out
+
+    def restore(self, data):
+        (self.rng.state, self.piece_count, self.score, self.lines_cleared, self.level,
+         self.fall_speed, self.fall_time, self.clear_timer, clearing_mask,
+         x, y, shape_id, rotation, next_shape, next_rotation, hold_shape, hold_rotation,
+         flags, buffered, buffer) = SNAPSHOT_HEADER.unpack_from(data)
+        self.current_block = Block(x, y, shape_id, rotation)
+        self.next_block = Block.spawn(next_shape, next_rotation)
+        self.hold_block = Block.spawn(hold_shape, hold_rotation) if hold_shape != NO_PIECE else None
+        self.hold_used = bool(flags & 1)
+        self.game_over = bool(flags & 2)
+        self.clearing_rows = tuple(y for y in range(GRID_HEIGHT) if clearing_mask >> y & 1)
+        self.input_buffer = [ACTIONS[code] for code in buffer[:buffered]]
+        self.rows = list(SNAPSHOT_ROWS.unpack_from(data, SNAPSHOT_HEADER.size))
+        self.refresh_surface()
+        cells = memoryview(data)[SNAPSHOT_GRID_OFFSET:SNAPSHOT_SIZE]
+        self.grid = [bytearray(cells[y * GRID_WIDTH:(y + 1) * GRID_WIDTH]) for y in range(GRID_HEIGHT)]
+        self.events = []
+
+
+class SnapshotRing:
+    # Ostatnie depth snapshotów w jednym buforze - zapis bez alokacji (undo, rollback)
+    def __init__(self, depth):
+        self.depth = depth
+        self.buffer = bytearray(depth * SNAPSHOT_SIZE)
+        self.view = memoryview(self.buffer)
+        self.clear()
+
+    def clear(self):
+        self.head = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def slot(self, index):
+        return self.view[index * SNAPSHOT_SIZE:(index + 1) * SNAPSHOT_SIZE]
+
+    def push(self, engine):
+        # Najstarszy snapshot jest nadpisywany, gdy bufor jest pełny
+        engine.snapshot(self.slot(self.head))
+        self.head = (self.head + 1) % self.depth
+        self.count = min(self.count + 1, self.depth)
+
+    def pop(self):
+        # Widok na ostatni snapshot (ważny do następnego push) albo None
+        if not self.count:
+            return None
+        self.head = (self.head - 1) % self.depth
+        self.count -= 1
+        return self.slot(self.head)
@@ -0,0 +1,101 @@
+from collections import deque
+
+from frame_profiler import percentile
+from tetris_engine import GRID_WIDTH, LEFT, RIGHT, DOWN
+
+# Wejście z czasem (bez pygame): naciśnięcia i puszczenia klawiszy ze znacznikiem czasu odczytu,
+# rozdzielane na kroki logiki według tego, kiedy naprawdę nastąpiły, plus automatyczne powtarzanie
+# przytrzymanych klawiszy (DAS - opóźnienie przed pierwszym powtórzeniem, ARR - odstęp powtórzeń).
+# Czas w ms, w tej samej skali co zegar pętli gry (perf_counter).
+
+DAS_MS = 167
+ARR_MS = 33
+# Miękki zrzut powtarza się od razu, bez DAS
+SOFT_DROP_MS = 33
+SHIFT_ACTIONS = (LEFT, RIGHT)
+
+
+class InputTimeline:
+    # profiler (FrameProfiler) - opóźnienie od odczytu klawisza do wyświetlenia klatki trafia
+    # do nakładki F3 jako "input_latency"
+    def __init__(self, das_ms=DAS_MS, arr_ms=ARR_MS, soft_drop_ms=SOFT_DROP_MS, profiler=None):
+        self.das_ms = das_ms
+        self.arr_ms = arr_ms
+        self.soft_drop_ms = soft_drop_ms
+        self.profiler = profiler
+        self.queue = deque()
+        # akcja -> czas następnego powtórzenia
+        self.held = {}
+        # Przy obu kierunkach naraz powtarza się ostatnio naciśnięty
+        self.shift = None
+        self.applied = []
+        self.latency = deque(maxlen=256)
+
+    def press(self, action, t_ms):
+        self.queue.append((t_ms, action, True))
+
+    def release(self, action, t_ms):
+        self.queue.append((t_ms, action, False))
+
+    def clear(self):
+        # Undo, Restart, pauza: zaległe akcje przepadają, przytrzymane klawisze trzeba nacisnąć od nowa
+        self.queue.clear()
+        self.held.clear()
+        self.shift = None
+        self.applied.clear()
+
+    def take(self, step_end_ms, flush=False):
+        # Akcje na krok logiki kończący się w step_end_ms: zdarzenia sprzed końca kroku (flush - wszystkie
+        # zaległe, żeby ostatni krok klatki nie odkładał ich na następną) i powtórzenia przypadające w kroku
+        actions = []
+        while self.queue and (flush or self.queue[0][0] < step_end_ms):
+            t_ms, action, pressed = self.queue.popleft()
+            if pressed:
+                actions.append(action)
+                self.applied.append(t_ms)
+                self.arm(action, t_ms)
+            else:
+                self.held.pop(action, None)
+                if self.shift == action:
+                    # Wciąż przytrzymany przeciwny kierunek rusza od nowa, z pełnym DAS
+                    self.shift = next((a for a in SHIFT_ACTIONS if a in self.held), None)
+                    if self.shift:
+                        self.held[self.shift] = t_ms + self.das_ms
+        for action, due in self.held.items():
+            if action in SHIFT_ACTIONS and action != self.shift:
+                continue
+            interval = self.soft_drop_ms if action == DOWN else self.arr_ms
+            if due >= step_end_ms:
+                continue
+            if interval <= 0:
+                # ARR 0: za pierwszym razem od razu pod ścianę (nieudane przesunięcia silnik ignoruje),
+                # potem jedno przesunięcie na krok - nowy klocek też dojedzie do ściany
+                actions.extend([action] * (GRID_WIDTH if due > 0 else 1))
+                self.held[action] = 0
+                continue
+            while due < step_end_ms:
+                actions.append(action)
+                due += interval
+            self.held[action] = due
+        return actions
+
+    def arm(self, action, t_ms):
+        if action in SHIFT_ACTIONS:
+            self.held[action] = t_ms + self.das_ms
+            self.shift = action
+        elif action == DOWN:
+            self.held[action] = t_ms + self.soft_drop_ms
+
+    def presented(self, t_ms):
+        # Wołane po wyświetleniu klatki: opóźnienie dla każdego naciśnięcia, które weszło do logiki od poprzedniej
+        for pressed_ms in self.applied:
+            ms = t_ms - pressed_ms
+            self.latency.append(ms)
+            if self.profiler is not None and self.profiler.enabled:
+                self.profiler.add_sample("input_latency", ms)
+        self.applied.clear()
+
+    def latency_summary(self):
+        # (p50, p95, p99) w ms: od odczytu naciśnięcia do końca flip klatki z jego skutkiem
+        values = sorted(self.latency)
+        return percentile(values, 0.5), percentile(values, 0.95), percentile(values, 0.99)
@@ -0,0 +1,231 @@
+import asyncio
+import socket
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+
+from frame_profiler import percentile
+from tetris_engine import GRID_HEIGHT
+
+# Sieć trybu versus (bez pygame): połączenie TCP z drugim graczem na asyncio w osobnym wątku.
+# Gra dokłada wiadomości w trakcie klatki (send) i wysyła je jednym zapisem na koniec klatki (flush),
+# odebrane zbiera z poll(). Plansza idzie jako różnice względem ostatnio wysłanej, nie całe grid.
+
+PROTOCOL_VERSION = 1
+DEFAULT_PORT = 7777
+
+# Ramka: typ (u8), długość treści (u16), treść
+FRAME_HEADER = struct.Struct("<BH")
+MSG_HELLO = 1  # wersja protokołu, ziarno generatora klocków (ustala gospodarz)
+MSG_PIECE = 2  # aktywny klocek po akcjach gracza: x, y, kształt, obrót
+MSG_BOARD = 3  # numer różnicy + różnica planszy (encode_board_delta)
+MSG_FULL = 4  # numer różnicy + cała plansza, odpowiedź na MSG_RESYNC
+MSG_CHECK = 5  # numer różnicy + crc32 planszy po niej
+MSG_RESYNC = 6  # suma kontrolna się nie zgadza - prośba o MSG_FULL
+MSG_ATTACK = 7  # linie śmieci i kolumna dziury
+MSG_SCORE = 8  # wynik, linie, poziom
+MSG_OVER = 9  # koniec gry nadawcy
+MSG_PING = 10  # czas wysłania w ns, odsyłany bez zmian jako MSG_PONG
+MSG_PONG = 11
+# Nie idzie przez sieć - poll() zwraca go po zerwaniu połączenia
+MSG_CLOSED = 255
+
+HELLO = struct.Struct("<HQ")
+PIECE = struct.Struct("<bbBB")
+SEQ = struct.Struct("<H")
+CHECK = struct.Struct("<HI")
+ATTACK = struct.Struct("<BB")
+SCORE = struct.Struct("<IHH")
+PING = struct.Struct("<Q")
+
+# Różnica planszy: maska zmienionych wierszy (u32), potem bajt na każdy zmieniony wiersz:
+# 0x80 | y - kopia wiersza y sprzed zmiany (przesunięcie po czyszczeniu linii albo śmieciach),
+# n < 0x80 - n komórek względem tego samego wiersza, po bajcie (x << 4 | wartość).
+# Zablokowany klocek bez czyszczenia to zwykle ~10 bajtów zamiast 200.
+DELTA_ROWS = struct.Struct("<I")
+DELTA_COPY = 0x80
+
+
+def encode_board_delta(old, new):
+    changed = 0
+    body = bytearray()
+    sources = {bytes(row): y for y, row in enumerate(old)}
+    for y, (before, after) in enumerate(zip(old, new)):
+        if before == after:
+            continue
+        changed |= 1 << y
+        source = sources.get(bytes(after))
+        if source is not None:
+            body.append(DELTA_COPY | source)
+            continue
+        cells = [x << 4 | value for x, (was, value) in enumerate(zip(before, after)) if was != value]
+        body.append(len(cells))
+        body.extend(cells)
+    return DELTA_ROWS.pack(changed) + body
+
+
+def apply_board_delta(board, delta):
+    # Nowa lista wierszy; niezmienione wiersze są współdzielone ze starą
+    changed, = DELTA_ROWS.unpack_from(delta)
+    pos = DELTA_ROWS.size
+    result = list(board)
+    for y in range(GRID_HEIGHT):
+        if not changed >> y & 1:
+            continue
+        tag = delta[pos]
+        pos += 1
+        if tag & DELTA_COPY:
+            result[y] = bytearray(board[tag & ~DELTA_COPY])
+            continue
+        row = bytearray(board[y])
+        for cell in delta[pos:pos + tag]:
+            row[cell >> 4] = cell & 0xF
+        pos += tag
+        result[y] = row
+    return result
+
+
+def board_checksum(board):
+    return zlib.crc32(b"".join(board))
+
+
+class NetSession:
+    # Jedno połączenie z przeciwnikiem: host(port) czeka na pierwszego chętnego, connect(host, port) łączy się.
+    # Pętla asyncio chodzi w wątku w tle; PING obsługuje od razu ten wątek, więc RTT nie czeka na klatkę gry.
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.future = None
+        self.server = None
+        self.writer = None
+        self.connected = threading.Event()
+        self.closed = False
+        self.inbox = deque()
+        self.outbox = bytearray()
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.rtt = deque(maxlen=1024)
+        self.connected_at = None
+
+    def host(self, port=DEFAULT_PORT, address="0.0.0.0"):
+        self.thread.start()
+        self.future = asyncio.run_coroutine_threadsafe(self._host(address, port), self.loop)
+        return self
+
+    def connect(self, address, port=DEFAULT_PORT):
+        self.thread.start()
+        self.future = asyncio.run_coroutine_threadsafe(self._connect(address, port), self.loop)
+        return self
+
+    def wait_connected(self, timeout=None):
+        # True po nawiązaniu połączenia, False po upływie timeout; błąd połączenia (np. odmowa) jest rzucany
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while not self.connected.wait(0.05):
+            if self.future.done() and self.future.exception():
+                raise self.future.exception()
+            if deadline is not None and time.perf_counter() >= deadline:
+                return False
+        return True
+
+    async def _host(self, address, port):
+        self.server = await asyncio.start_server(self._accept, address, port)
+
+    async def _accept(self, reader, writer):
+        if self.writer is not None:
+            # Gra jest dla dwóch osób - kolejne połączenia są zamykane
+            writer.close()
+            return
+        self.server.close()
+        await self._serve(reader, writer)
+
+    async def _connect(self, address, port):
+        reader, writer = await asyncio.open_connection(address, port)
+        await self._serve(reader, writer)
+
+    async def _serve(self, reader, writer):
+        # Bez algorytmu Nagle'a małe ramki wychodzą od razu, nie czekają na potwierdzenie poprzednich
+        writer.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.writer = writer
+        self.connected_at = time.perf_counter()
+        self.connected.set()
+        try:
+            while True:
+                msg_type, size = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+                payload = await reader.readexactly(size) if size else b""
+                self.bytes_received += FRAME_HEADER.size + size
+                if msg_type == MSG_PING:
+                    self._write(FRAME_HEADER.pack(MSG_PONG, size) + payload)
+                elif msg_type == MSG_PONG:
+                    self.rtt.append((time.perf_counter_ns() - PING.unpack(payload)[0]) / 1e6)
+                else:
+                    self.inbox.append((msg_type, payload))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.closed = True
+            self.inbox.append((MSG_CLOSED, b""))
+            writer.close()
+
+    def _write(self, data):
+        if self.writer is not None and not self.writer.is_closing():
+            self.writer.write(data)
+            self.bytes_sent += len(data)
+
+    def send(self, msg_type, payload=b""):
+        # Z wątku gry; wychodzi dopiero w flush()
+        self.outbox += FRAME_HEADER.pack(msg_type, len(payload))
+        self.outbox += payload
+
+    def ping(self):
+        self.send(MSG_PING, PING.pack(time.perf_counter_ns()))
+
+    def flush(self):
+        # Wszystko z tej klatki jednym zapisem - jedno obudzenie wątku sieci i zwykle jeden pakiet
+        if not self.outbox or self.closed:
+            return
+        data = bytes(self.outbox)
+        self.outbox.clear()
+        self.loop.call_soon_threadsafe(self._write, data)
+
+    def poll(self):
+        messages = []
+        while self.inbox:
+            messages.append(self.inbox.popleft())
+        return messages
+
+    async def _shutdown(self):
+        if self.writer is not None:
+            self.writer.close()
+        if self.server is not None:
+            self.server.close()
+        # Zamknięte gniazdo kończy czytanie w _serve (EOF) - czekamy na to zamiast anulować zadania
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        if tasks:
+            await asyncio.wait(tasks, timeout=0.5)
+        self.loop.stop()
+
+    def close(self):
+        if self.thread.is_alive():
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop)
+            self.thread.join(1.0)
+            if not self.thread.is_alive():
+                self.loop.close()
+        self.closed = True
+
+    def stats(self):
+        # Przepustowość w bajtach/s od nawiązania połączenia (z nagłówkami ramek, bez TCP/IP) i RTT w ms
+        seconds = time.perf_counter() - self.connected_at if self.connected_at else 0.0
+        values = sorted(self.rtt)
+        return {
+            "seconds": seconds,
+            "sent_bytes": self.bytes_sent,
+            "received_bytes": self.bytes_received,
+            "sent_bps": self.bytes_sent / seconds if seconds else 0.0,
+            "received_bps": self.bytes_received / seconds if seconds else 0.0,
+            "rtt_p50": percentile(values, 0.5),
+            "rtt_p95": percentile(values, 0.95),
+            "rtt_p99": percentile(values, 0.99),
+            "rtt_max": values[-1] if values else 0.0,
+        }
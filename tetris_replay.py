@@ -0,0 +1,242 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+from tetris_engine import (
+    DEFAULT_RULES, SNAPSHOT_SIZE, TIME_UNIT_MS, ACTIONS, ACTION_CODES, TetrisEngine,
+)
+
+# Powtórki: stan generatora na starcie gry + log akcji z numerem kroku logiki + log klocków,
+# co KEYFRAME_INTERVAL kroków pełny snapshot stanu (szybkie przewijanie).
+#
+# Plik (little endian, bez wyrównania - w całości do np.memmap / mmap):
+#   nagłówek REPLAY_HEADER
+#   akcje:     n_inputs    x INPUT_DTYPE   (tick, kod akcji; bit ZERO_ELAPSED - akcja z pauzy, bez upływu czasu)
+#   klocki:    n_pieces    x uint8         (id kształtu z kolejnych new_block)
+#   keyframes: n_keyframes x KEYFRAME_DTYPE (tick, indeks pierwszej akcji od tego kroku, snapshot)
+#
+# Uruchomienie:
+#   python tetris_replay.py replays/x.trpl               # odtworzenie bez okna, najszybciej jak się da
+#   python tetris_replay.py replays/x.trpl --seek 6000   # stan po 6000 krokach
+#   python tetris_replay.py --index replays              # same nagłówki wszystkich plików w katalogu
+#   python tetris_single.py --replay replays/x.trpl      # odtworzenie w grze, w normalnym tempie
+
+REPLAY_MAGIC = b"TRPL"
+REPLAY_VERSION = 2
+REPLAY_DIR = "replays"
+REPLAY_EXTENSION = ".trpl"
+KEYFRAME_INTERVAL = 600
+
+# magic, wersja, logic_hz, stan generatora, czas utworzenia, liczba kroków, liczby akcji/klocków/keyframe'ów,
+# odstęp keyframe'ów, wynik, linie, poziom, flagi (bit 0 - gra zakończona), clear_delay,
+# reguły: fall_speed, speed_multiplier, min_fall_speed, lines_per_level, line_scores
+REPLAY_HEADER = struct.Struct("<4sHHQQIIIIIQIHHddddI4I")
+INPUT_DTYPE = np.dtype([("tick", "<u4"), ("code", "u1")])
+KEYFRAME_DTYPE = np.dtype([("tick", "<u4"), ("input_index", "<u4"), ("state", "u1", SNAPSHOT_SIZE)])
+ZERO_ELAPSED = 0x80
+FLAG_FINISHED = 1
+
+
+class ReplayRecorder:
+    # Nagrywa jedną grę; tworzony (albo start()) zaraz przed reset_game silnika, żeby złapać pierwsze klocki
+    def __init__(self, engine, logic_hz, keyframe_interval=KEYFRAME_INTERVAL):
+        self.engine = engine
+        self.logic_hz = logic_hz
+        self.keyframe_interval = keyframe_interval
+        self.start()
+
+    def start(self, rng_state=None, pieces=()):
+        # rng_state / pieces - nagranie od stanu zaraz po reset_game (np. restart z punktu kontrolnego):
+        # stan generatora sprzed resetu i klocki, które reset wylosował
+        self.rng_state = self.engine.rng.state if rng_state is None else rng_state
+        self.created = int(time.time())
+        self.inputs = []
+        self.pieces = list(pieces)
+        self.keyframes = []
+        self.tick = 0
+        self.engine.piece_log = self.pieces
+
+    def record(self, inputs, elapsed=True):
+        # Wołane przy każdym kroku logiki, przed engine.step; elapsed=False dla kroków bez upływu czasu
+        if elapsed and self.tick % self.keyframe_interval == 0:
+            self.keyframes.append((self.tick, len(self.inputs), self.engine.snapshot()))
+        flag = 0 if elapsed else ZERO_ELAPSED
+        for action in inputs:
+            self.inputs.append((self.tick, ACTION_CODES[action] | flag))
+        if elapsed:
+            self.tick += 1
+
+    def save(self, path):
+        engine = self.engine
+        rules = engine.rules
+        header = REPLAY_HEADER.pack(
+            REPLAY_MAGIC, REPLAY_VERSION, self.logic_hz, self.rng_state, self.created,
+            self.tick, len(self.inputs), len(self.pieces), len(self.keyframes), self.keyframe_interval,
+            engine.score, engine.lines_cleared, engine.level, FLAG_FINISHED if engine.game_over else 0,
+            engine.clear_delay, rules["fall_speed"], rules["speed_multiplier"], rules["min_fall_speed"],
+            rules["lines_per_level"], *rules["line_scores"],
+        )
+        keyframes = np.zeros(len(self.keyframes), dtype=KEYFRAME_DTYPE)
+        for i, (tick, input_index, state) in enumerate(self.keyframes):
+            keyframes[i] = (tick, input_index, np.frombuffer(state, dtype=np.uint8))
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(header)
+            f.write(np.array(self.inputs, dtype=INPUT_DTYPE).tobytes())
+            f.write(bytes(self.pieces))
+            f.write(keyframes.tobytes())
+        return path
+
+
+def new_replay_path(directory=REPLAY_DIR):
+    return os.path.join(directory, time.strftime("%Y%m%d-%H%M%S") + REPLAY_EXTENSION)
+
+
+class Replay:
+    # Plik powtórki zmapowany w pamięci; tablice to widoki na mmap, nic nie jest kopiowane
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        fields = REPLAY_HEADER.unpack_from(self.buffer)
+        (magic, version, self.logic_hz, self.rng_state, self.created,
+         self.ticks, n_inputs, n_pieces, n_keyframes, self.keyframe_interval,
+         self.score, self.lines, self.level, flags, self.clear_delay,
+         fall_speed, speed_multiplier, min_fall_speed, lines_per_level, *line_scores) = fields
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError("not a replay file: {}".format(path))
+        self.finished = bool(flags & FLAG_FINISHED)
+        self.rules = dict(DEFAULT_RULES, fall_speed=fall_speed, speed_multiplier=speed_multiplier,
+                          min_fall_speed=min_fall_speed, lines_per_level=lines_per_level,
+                          line_scores=tuple(line_scores))
+        offset = REPLAY_HEADER.size
+        self.inputs = np.frombuffer(self.buffer, dtype=INPUT_DTYPE, count=n_inputs, offset=offset)
+        offset += INPUT_DTYPE.itemsize * n_inputs
+        self.pieces = np.frombuffer(self.buffer, dtype=np.uint8, count=n_pieces, offset=offset)
+        offset += n_pieces
+        self.keyframes = np.frombuffer(self.buffer, dtype=KEYFRAME_DTYPE, count=n_keyframes, offset=offset)
+
+    def duration(self):
+        return self.ticks / self.logic_hz
+
+
+def read_header(path):
+    # Tylko nagłówek - do indeksowania katalogu z tysiącami powtórek
+    with open(path, "rb") as f:
+        data = f.read(REPLAY_HEADER.size)
+    fields = REPLAY_HEADER.unpack(data)
+    if fields[0] != REPLAY_MAGIC:
+        raise ValueError("not a replay file: {}".format(path))
+    return {
+        "path": path, "logic_hz": fields[2], "created": fields[4], "ticks": fields[5],
+        "seconds": fields[5] / fields[2], "score": fields[10], "lines": fields[11], "level": fields[12],
+        "finished": bool(fields[13] & FLAG_FINISHED),
+    }
+
+
+def index_replays(directory):
+    headers = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(REPLAY_EXTENSION):
+            try:
+                headers.append(read_header(os.path.join(directory, name)))
+            except (ValueError, struct.error):
+                continue
+    return headers
+
+
+class ReplayPlayer:
+    # Odtwarza powtórkę na podanym silniku (także na Game - wtedy z normalnym rysowaniem)
+    def __init__(self, replay, engine=None):
+        self.replay = replay
+        self.engine = engine or TetrisEngine(clear_delay=replay.clear_delay, rules=replay.rules)
+        self.engine.clear_delay = replay.clear_delay
+        self.engine.rules = dict(replay.rules)
+        self.engine.piece_log = None
+        self.engine.forced_pieces = replay.pieces
+        self.elapsed = 1000 / replay.logic_hz / TIME_UNIT_MS
+        self.restart()
+
+    def restart(self):
+        self.engine.rng.state = self.replay.rng_state
+        self.engine.reset_game()
+        self.tick = 0
+        self.input_index = 0
+
+    def finished(self):
+        return self.tick >= self.replay.ticks
+
+    def step(self):
+        # Jeden krok logiki: najpierw akcje z pauzy (bez upływu czasu), potem zwykły krok
+        inputs = self.replay.inputs
+        paused, regular = [], []
+        while self.input_index < len(inputs) and inputs[self.input_index]["tick"] == self.tick:
+            code = int(inputs[self.input_index]["code"])
+            (paused if code & ZERO_ELAPSED else regular).append(ACTIONS[code & ~ZERO_ELAPSED])
+            self.input_index += 1
+        if paused:
+            self.engine.step(paused, 0)
+        self.engine.step(regular, self.elapsed)
+        self.tick += 1
+
+    def seek(self, tick):
+        # Najbliższy keyframe nie później niż tick, dalej symulacja krok po kroku
+        tick = min(tick, self.replay.ticks)
+        keyframes = self.replay.keyframes
+        index = int(np.searchsorted(keyframes["tick"], tick, side="right")) - 1
+        if index >= 0 and (tick < self.tick or keyframes[index]["tick"] > self.tick):
+            keyframe = keyframes[index]
+            self.engine.restore(keyframe["state"].tobytes())
+            self.tick = int(keyframe["tick"])
+            self.input_index = int(keyframe["input_index"])
+        elif tick < self.tick:
+            self.restart()
+        while self.tick < tick:
+            self.step()
+        self.engine.drain_events()
+
+    def run_to_end(self):
+        while not self.finished():
+            self.step()
+            self.engine.events = []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play back or index replay files without a window")
+    parser.add_argument("replay", nargs="?", help="replay file to play back headless")
+    parser.add_argument("--seek", type=int, help="stop at this logic tick instead of the end")
+    parser.add_argument("--index", metavar="DIR", help="list every replay in a directory (headers only)")
+    args = parser.parse_args()
+
+    if args.index:
+        for header in index_replays(args.index):
+            print("{path}  {seconds:8.1f}s  score {score:>8}  lines {lines:>5}  level {level:>3}  {state}".format(
+                state="finished" if header["finished"] else "quit", **header))
+        return
+    if not args.replay:
+        parser.error("give a replay file or --index DIR")
+
+    replay = Replay(args.replay)
+    player = ReplayPlayer(replay)
+    start = time.perf_counter()
+    if args.seek is not None:
+        player.seek(args.seek)
+    else:
+        player.run_to_end()
+    seconds = time.perf_counter() - start
+    engine = player.engine
+    print("tick {} / {} ({:.1f}s of play) in {:.3f}s: score {} lines {} level {}{}".format(
+        player.tick, replay.ticks, player.tick / replay.logic_hz, seconds, engine.score,
+        engine.lines_cleared, engine.level, " game over" if engine.game_over else ""))
+    if args.seek is None and (engine.score, engine.lines_cleared) != (replay.score, replay.lines):
+        print("replay desync: recorded score {} lines {}".format(replay.score, replay.lines), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
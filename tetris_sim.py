@@ -0,0 +1,211 @@
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import struct
+import sys
+import time
+
+import numpy as np
+
+from tetris_engine import DEFAULT_RULES, TIME_UNIT_MS, TetrisEngine, EVENT_LOCK, LEFT, RIGHT, DOWN, ROTATE, DROP
+from tetris_bot import BotDriver
+
+# Farma symulacji do strojenia krzywej trudności: tysiące gier bez renderera na wszystkich rdzeniach,
+# wyniki strumieniowo do pliku kolumnowego. Przykład:
+#   python tetris_sim.py --games 2000 --player bot --speed-multiplier 0.75,0.8,0.85 --out sim.tsim
+#   python tetris_sim.py --summary sim.tsim
+
+LOGIC_HZ = 120
+MAX_GAME_SECONDS = 1200
+PLAYERS = ("bot", "random")
+
+# Kolumny pliku wynikowego: nazwa -> dtype (little endian)
+COLUMNS = (
+    ("seed", "<u8"),
+    ("player", "u1"),
+    ("fall_speed", "<f4"),
+    ("speed_multiplier", "<f4"),
+    ("survival_s", "<f4"),
+    ("lines", "<i4"),
+    ("score", "<i8"),
+    ("level", "<i2"),
+    ("pieces", "<i4"),
+    ("timed_out", "u1"),
+)
+FILE_MAGIC = b"TSIM1\n"
+
+
+class RandomPlayer:
+    # Gracz-skrypt: losowa akcja co action_ms, dolna granica dla krzywej trudności
+    ACTIONS = (LEFT, RIGHT, ROTATE, DOWN, DOWN, DROP)
+
+    def __init__(self, seed, action_ms=120):
+        self.rng = random.Random(seed)
+        self.action_ms = action_ms
+        self.timer = 0
+
+    def inputs(self, engine, elapsed_ms):
+        self.timer -= elapsed_ms
+        if self.timer > 0:
+            return []
+        self.timer += self.action_ms
+        return [self.rng.choice(self.ACTIONS)]
+
+
+def game_seed(base_seed, index):
+    # Ziarno gry zależy tylko od numeru gry, nie od tego, który proces ją dostał
+    return random.Random(base_seed * 1000003 + index).getrandbits(63)
+
+
+def run_game(task):
+    index, base_seed, player, rules, action_ms, logic_hz, max_seconds = task
+    seed = game_seed(base_seed, index)
+    engine = TetrisEngine(seed=seed, rules=rules)
+    if player == "bot":
+        driver = BotDriver(action_ms=action_ms)
+    else:
+        driver = RandomPlayer(seed, action_ms)
+
+    step_ms = 1000 / logic_hz
+    elapsed = step_ms / TIME_UNIT_MS
+    max_steps = int(max_seconds * logic_hz)
+    steps = 0
+    pieces = 0
+    while not engine.game_over and steps < max_steps:
+        engine.step(driver.inputs(engine, step_ms), elapsed)
+        for event in engine.drain_events():
+            if event[0] == EVENT_LOCK:
+                pieces += 1
+        steps += 1
+
+    return (
+        seed,
+        PLAYERS.index(player),
+        rules["fall_speed"],
+        rules["speed_multiplier"],
+        steps / logic_hz,
+        engine.lines_cleared,
+        engine.score,
+        engine.level,
+        pieces,
+        not engine.game_over,
+    )
+
+
+class ColumnWriter:
+    # Plik = nagłówek + bloki; blok to długość JSON-a z liczbą wierszy i kolumnami, potem kolumny jedna po drugiej
+    def __init__(self, path, chunk_rows=256):
+        self.file = open(path, "wb")
+        self.file.write(FILE_MAGIC)
+        self.chunk_rows = chunk_rows
+        self.rows = []
+
+    def append(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        columns = list(zip(*self.rows))
+        header = json.dumps({"rows": len(self.rows), "columns": COLUMNS}).encode()
+        self.file.write(struct.pack("<I", len(header)))
+        self.file.write(header)
+        for (name, dtype), values in zip(COLUMNS, columns):
+            self.file.write(np.asarray(values, dtype=dtype).tobytes())
+        self.file.flush()
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def read_results(path):
+    # {kolumna: np.ndarray} z całego pliku
+    chunks = {name: [] for name, dtype in COLUMNS}
+    with open(path, "rb") as f:
+        if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+            raise ValueError("not a simulation results file: {}".format(path))
+        while True:
+            size = f.read(4)
+            if not size:
+                break
+            header = json.loads(f.read(struct.unpack("<I", size)[0]))
+            for name, dtype in header["columns"]:
+                dtype = np.dtype(dtype)
+                chunks.setdefault(name, []).append(np.frombuffer(f.read(dtype.itemsize * header["rows"]), dtype=dtype))
+    return {name: np.concatenate(parts) for name, parts in chunks.items() if parts}
+
+
+def print_summary(results):
+    keys = sorted(set(zip(results["player"], results["fall_speed"], results["speed_multiplier"])))
+    print("{:<8} {:>6} {:>6} {:>7} {:>10} {:>8} {:>10} {:>7} {:>8}".format(
+        "player", "speed", "mult", "games", "survival_s", "lines", "score", "level", "timeout"))
+    for player, fall_speed, multiplier in keys:
+        mask = ((results["player"] == player) & (results["fall_speed"] == fall_speed)
+                & (results["speed_multiplier"] == multiplier))
+        print("{:<8} {:>6.2f} {:>6.2f} {:>7} {:>10.1f} {:>8.1f} {:>10.0f} {:>7.1f} {:>7.0%}".format(
+            PLAYERS[player], fall_speed, multiplier, int(mask.sum()),
+            np.median(results["survival_s"][mask]), np.median(results["lines"][mask]),
+            np.median(results["score"][mask]), np.median(results["level"][mask]),
+            results["timed_out"][mask].mean()))
+
+
+def parse_floats(text):
+    return [float(value) for value in text.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run headless games in parallel to tune the speed/score curve")
+    parser.add_argument("--games", type=int, default=1000, help="games per rules combination")
+    parser.add_argument("--player", choices=PLAYERS, default="bot")
+    parser.add_argument("--action-ms", type=float, default=50, help="player speed: one action every N ms")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--fall-speed", default=str(DEFAULT_RULES["fall_speed"]), help="comma-separated values to sweep")
+    parser.add_argument("--speed-multiplier", default=str(DEFAULT_RULES["speed_multiplier"]), help="comma-separated values to sweep")
+    parser.add_argument("--lines-per-level", type=int, default=DEFAULT_RULES["lines_per_level"])
+    parser.add_argument("--line-scores", default=",".join(map(str, DEFAULT_RULES["line_scores"])))
+    parser.add_argument("--logic-hz", type=int, default=LOGIC_HZ)
+    parser.add_argument("--max-seconds", type=float, default=MAX_GAME_SECONDS, help="game time limit per game")
+    parser.add_argument("--out", default="sim_results.tsim")
+    parser.add_argument("--summary", metavar="FILE", help="only print a summary of an existing results file")
+    args = parser.parse_args()
+
+    if args.summary:
+        print_summary(read_results(args.summary))
+        return
+
+    line_scores = tuple(int(value) for value in args.line_scores.split(","))
+    tasks = []
+    for fall_speed, multiplier in itertools.product(parse_floats(args.fall_speed), parse_floats(args.speed_multiplier)):
+        rules = dict(DEFAULT_RULES, fall_speed=fall_speed, speed_multiplier=multiplier,
+                     lines_per_level=args.lines_per_level, line_scores=line_scores)
+        # Te same numery gier (a więc ziarna) w każdej kombinacji - porównanie na identycznych sekwencjach klocków
+        tasks.extend((index, args.seed, args.player, rules, args.action_ms, args.logic_hz, args.max_seconds)
+                     for index in range(args.games))
+
+    writer = ColumnWriter(args.out)
+    start = time.perf_counter()
+    done = 0
+    try:
+        with multiprocessing.Pool(args.workers) as pool:
+            for row in pool.imap_unordered(run_game, tasks, chunksize=4):
+                writer.append(row)
+                done += 1
+                if done % 100 == 0 or done == len(tasks):
+                    rate = done / (time.perf_counter() - start)
+                    print("\r{}/{} games, {:.1f} games/s".format(done, len(tasks), rate), end="", file=sys.stderr)
+    finally:
+        writer.close()
+    print(file=sys.stderr)
+    print_summary(read_results(args.out))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,29 @@
 import pygame
 import random
+import functools
 import sys
 import os
+import struct
+import threading
+import time
 import numpy as np
 import moderngl
+from frame_profiler import FrameProfiler, NULL_STAGE
+from tetris_audio import AudioEngine
+from tetris_bot import BotDriver
+from tetris_capture import VideoCapture, CAPTURE_FPS
+from tetris_input import InputTimeline
+from tetris_replay import Replay, ReplayPlayer, ReplayRecorder, new_replay_path
+from tetris_net import NetSession, DEFAULT_PORT
+from tetris_versus import VersusLink, handshake, parse_address
+from tetris_engine import (
+    GRID_WIDTH, GRID_HEIGHT, GARBAGE, SNAPSHOT_SIZE, SnapshotRing, PIECES, TIME_UNIT_MS, TetrisEngine,
+    LEFT, RIGHT, DOWN, ROTATE, DROP, HOLD, EVENT_LOCK, EVENT_CLEAR,
+)
+
+# Początek startu gry - do pomiaru czasu do pierwszej interaktywnej klatki
+STARTUP_TIME = time.perf_counter()
+startup_stats = {}
 
 S_CURSOR_SHAPE = [
     [1, 0],
@@ -25,7 +45,12 @@ def draw_s_cursor(surface, pos, size=32):
                 pygame.draw.rect(surface, block_color, rect)
                 pygame.draw.rect(surface, border_color, rect, 2)
 
-def show_bios_intro():
+# Nowa linia intra co BIOS_LINE_MS. Intro kończy się, gdy zasoby z AssetLoader są gotowe;
+# BIOS_INTRO_FULL - pokazuje wszystkie linie (klawisz albo klik pomija resztę).
+BIOS_LINE_MS = 350
+BIOS_INTRO_FULL = False
+
+def show_bios_intro(loader):
     bios_lines = [
         "Phoenix Technologies Ltd.",
         "Copyright (C) 1985-2001",
@@ -44,17 +69,45 @@ def show_bios_intro():
         "Boot from CD-ROM:",
         "Starting TETRIS.EXE ..."
     ]
+    start = time.perf_counter()
     screen.fill((0, 0, 0))
-    font = pygame.font.SysFont("consolas", 32)
-    y = 120
-    for line in bios_lines:
-        text = font.render(line, True, (30, 100, 30))
-        screen.blit(text, (80, y))
-        render_fisheye_gl(fisheye_ctx, fisheye_prog, fisheye_vao, fisheye_texture, screen, distortion=0.15)
-        pygame.display.flip()
-        y += 38
-        pygame.time.delay(350)
-    pygame.time.delay(1200)
+    intro_start = pygame.time.get_ticks()
+    shown = 0
+    skipped = False
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                stop_capture()
+                pygame.quit()
+                sys.exit()
+            if event.type in (pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN):
+                skipped = True
+        redraw = False
+        if loader.done.is_set() and not loader.finished:
+            # Tekstura ramki CRT gotowa - od tej klatki widać ją wokół ekranu
+            finish_loading(loader)
+            redraw = True
+        if loader.finished and (skipped or not BIOS_INTRO_FULL or shown == len(bios_lines)):
+            break
+        due = min(len(bios_lines), (pygame.time.get_ticks() - intro_start) // BIOS_LINE_MS + 1)
+        # Pełna klatka CRT tylko wtedy, gdy coś się zmieniło
+        while shown < due:
+            text = bios_font.render(bios_lines[shown], True, (30, 100, 30))
+            screen.blit(text, (80, 120 + 38 * shown))
+            shown += 1
+            redraw = True
+        if redraw:
+            render_fisheye_gl(fisheye_ctx, fisheye_prog, fisheye_vao, fisheye_texture, screen, distortion=0.15)
+        clock.tick(FPS)
+    startup_stats["intro_ms"] = (time.perf_counter() - start) * 1000
+
+def log_startup():
+    if "interactive_ms" in startup_stats:
+        return
+    startup_stats["interactive_ms"] = (time.perf_counter() - STARTUP_TIME) * 1000
+    print("Startup: first interactive frame after {interactive_ms:.0f} ms "
+          "(assets {assets_ms:.0f} ms in background, intro {intro_ms:.0f} ms)".format(**dict(
+              {"assets_ms": 0, "intro_ms": 0}, **startup_stats)))
 
 FISHEYE_VERTEX_SHADER = '''
     #version 330
@@ -103,37 +156,466 @@ FISHEYE_FRAGMENT_SHADER = '''
     }
 '''
 
-def setup_fisheye_gl(screen_size):
-    ctx = moderngl.create_context()
+# Efekty CRT liczone na GPU. Wszystkie współrzędne w pikselach, od lewego górnego rogu,
+# tak jak w dawnych efektach na powierzchni pygame. Tekstury trzymają wiersze w kolejności
+# pamięci powierzchni (pierwszy wiersz = góra ekranu), więc wiersz tekstury = p.y.
+CRT_VERTEX_SHADER = '''
+    #version 330
+    in vec2 vert;
+    void main() {
+        gl_Position = vec4(vert, 0.0, 1.0);
+    }
+'''
+
+CRT_SCENE_GLSL = '''
+    uniform sampler2D Texture;
+    uniform vec2 resolution;
+    uniform float pixelation;
+    uniform float flicker;
+
+    vec3 scene(vec2 p) {
+        // Pikselizacja, potem linie skanowania co 4 piksele i migotanie
+        vec2 cell = clamp(floor(p / pixelation) * pixelation, vec2(0.0), resolution - 1.0);
+        vec3 color = texelFetch(Texture, ivec2(cell), 0).rgb;
+        if (mod(cell.y, 4.0) < 1.0) {
+            color *= 1.0 - 60.0 / 255.0;
+        }
+        return color * (1.0 - flicker);
+    }
+'''
+
+CRT_GLOW_FRAGMENT_SHADER = '''
+    #version 330
+''' + CRT_SCENE_GLSL + '''
+    out vec4 f_color;
+    void main() {
+        // Zmniejszenie 4x (średnia z bloku 4x4), powiększenie robi filtr liniowy tekstury
+        vec2 origin = floor(gl_FragCoord.xy) * 4.0;
+        vec3 sum = vec3(0.0);
+        for (int y = 0; y < 4; y++) {
+            for (int x = 0; x < 4; x++) {
+                sum += scene(origin + vec2(x, y));
+            }
+        }
+        f_color = vec4(sum / 16.0, 1.0);
+    }
+'''
+
+CRT_EFFECTS_FRAGMENT_SHADER = '''
+    #version 330
+''' + CRT_SCENE_GLSL + '''
+    uniform sampler2D GlowTexture;
+    uniform float glow;
+    uniform vec3 glitch;
+    uniform float static_chance;
+    uniform float static_seed;
+    out vec4 f_color;
+
+    float hash(float n) {
+        return fract(sin(n) * 43758.5453);
+    }
+
+    void main() {
+        vec2 p = floor(gl_FragCoord.xy);
+
+        // Glitch: przesunięty w poziomie pasek (y, wysokość, przesunięcie)
+        if (p.y >= glitch.x && p.y < glitch.x + glitch.y) {
+            float source_x = p.x - glitch.z;
+            if (source_x >= 0.0 && source_x < resolution.x) {
+                p.x = source_x;
+            }
+        }
+
+        vec3 color = scene(p);
+        vec2 glow_uv = (p + 0.5) / resolution;
+        color = mix(color, texture(GlowTexture, glow_uv).rgb, glow);
+
+        // Toczący się szum: pojedyncze jasne linie co 24 piksele
+        if (mod(p.y, 24.0) < 1.0 && hash(floor(p.y / 24.0) + static_seed) < static_chance) {
+            color += vec3(177.0 / 255.0);
+        }
+        f_color = vec4(min(color, vec3(1.0)), 1.0);
+    }
+'''
+
+CRT_EFFECTS = {"pixelation": "minimum", "glitch": "maximum", "static": "minimum"}
+
+# Poświata nakładana dwukrotnie z alfą 100
+CRT_GLOW_WEIGHT = 1.0 - (1.0 - 100 / 255) ** 2
+
+def _crt_effect_params(width, height, effects):
+    pixelation = {"minimum": 2, "medium": 4, "maximum": 6}.get(effects.get("pixelation"), 2)
+    flicker = 10 / 255 if random.randint(0, 20) == 0 else 0.0
+
+    shift_amount = {"minimum": 10, "medium": 20, "maximum": 40}.get(effects.get("glitch"), 20)
+    glitch = (0.0, 0.0, 0.0)
+    if random.random() < 0.1:
+        y_start = random.randint(0, height - 20)
+        slice_height = random.randint(5, 20)
+        offset = random.randint(-shift_amount, shift_amount)
+        glitch = (float(y_start), float(slice_height), float(offset))
+
+    static_chance = {"minimum": 0.03, "medium": 0.08, "maximum": 0.18}.get(effects.get("static"), 0.05)
+    return {
+        "pixelation": float(pixelation),
+        "flicker": flicker,
+        "glow": CRT_GLOW_WEIGHT,
+        "glitch": glitch,
+        "static_chance": static_chance,
+        "static_seed": random.random() * 1000.0,
+    }
+
+def setup_fisheye_gl(screen_size, standalone=False):
+    if standalone:
+        # Bez okna; na Linuksie EGL działa także bez serwera X (np. programowy llvmpipe)
+        backend = {"backend": "egl"} if sys.platform.startswith("linux") else {}
+        ctx = moderngl.create_context(standalone=True, **backend)
+    else:
+        ctx = moderngl.create_context()
     prog = ctx.program(
         vertex_shader=FISHEYE_VERTEX_SHADER,
         fragment_shader=FISHEYE_FRAGMENT_SHADER
     )
+    # Odwrócenie w pionie w współrzędnych tekstury: wiersze tekstur idą od góry ekranu
     vertices = np.array([
-        -1, -1, 0, 0,
-         1, -1, 1, 0,
-        -1,  1, 0, 1,
-         1,  1, 1, 1,
+        -1, -1, 0, 1,
+         1, -1, 1, 1,
+        -1,  1, 0, 0,
+         1,  1, 1, 0,
     ], dtype='f4')
     vbo = ctx.buffer(vertices.tobytes())
     vao = ctx.simple_vertex_array(prog, vbo, 'vert', 'in_text')
-    texture = ctx.texture(screen_size, 3)
+    texture = ctx.texture(screen_size, 4)
     texture.repeat_x = False
     texture.repeat_y = False
     return ctx, prog, vao, texture
 
 
-def render_fisheye_gl(ctx, prog, vao, texture, surface, distortion=0.08):
-    arr = pygame.image.tostring(pygame.transform.flip(surface, False, True), "RGB")
-    texture.write(arr)
-    ctx.clear()
-    prog['distortion'].value = distortion
+def setup_crt_passes(ctx, screen_size):
+    width, height = screen_size
+    vertices = np.array([-1, -1, 1, -1, -1, 1, 1, 1], dtype='f4')
+    vbo = ctx.buffer(vertices.tobytes())
+
+    glow_prog = ctx.program(vertex_shader=CRT_VERTEX_SHADER, fragment_shader=CRT_GLOW_FRAGMENT_SHADER)
+    glow_texture = ctx.texture((max(1, width // 4), max(1, height // 4)), 3)
+    glow_texture.repeat_x = False
+    glow_texture.repeat_y = False
+
+    effects_prog = ctx.program(vertex_shader=CRT_VERTEX_SHADER, fragment_shader=CRT_EFFECTS_FRAGMENT_SHADER)
+    post_texture = ctx.texture(screen_size, 3)
+    post_texture.repeat_x = False
+    post_texture.repeat_y = False
+
+    return {
+        "glow_prog": glow_prog,
+        "glow_vao": ctx.simple_vertex_array(glow_prog, vbo, 'vert'),
+        "glow_texture": glow_texture,
+        "glow_fbo": ctx.framebuffer(color_attachments=[glow_texture]),
+        "effects_prog": effects_prog,
+        "effects_vao": ctx.simple_vertex_array(effects_prog, vbo, 'vert'),
+        "post_texture": post_texture,
+        "post_fbo": ctx.framebuffer(color_attachments=[post_texture]),
+    }
+
+
+def _set_uniform(prog, name, value):
+    # Nieużywane uniformy są usuwane przez kompilator GLSL
+    uniform = prog.get(name, None)
+    if uniform is not None:
+        uniform.value = value
+
+
+def render_crt_passes(passes, texture, size, effects):
+    width, height = size
+    params = _crt_effect_params(width, height, effects)
+
+    glow_prog = passes["glow_prog"]
+    passes["glow_fbo"].use()
+    texture.use(location=0)
+    _set_uniform(glow_prog, 'Texture', 0)
+    _set_uniform(glow_prog, 'resolution', (width, height))
+    _set_uniform(glow_prog, 'pixelation', params["pixelation"])
+    _set_uniform(glow_prog, 'flicker', params["flicker"])
+    passes["glow_vao"].render(moderngl.TRIANGLE_STRIP)
+
+    effects_prog = passes["effects_prog"]
+    passes["post_fbo"].use()
     texture.use(location=0)
-    crt_texture.use(location=1)
-    prog['Texture'].value = 0
-    prog['BgTexture'].value = 1
-    vao.render(moderngl.TRIANGLE_STRIP)
-    pygame.display.flip()
+    passes["glow_texture"].use(location=1)
+    _set_uniform(effects_prog, 'Texture', 0)
+    _set_uniform(effects_prog, 'GlowTexture', 1)
+    _set_uniform(effects_prog, 'resolution', (width, height))
+    for name in ("pixelation", "flicker", "glow", "glitch", "static_chance", "static_seed"):
+        _set_uniform(effects_prog, name, params[name])
+    passes["effects_vao"].render(moderngl.TRIANGLE_STRIP)
+    return passes["post_texture"]
+
+
+# Zablokowane komórki planszy rysuje GPU prosto na teksturę płótna, po jego wysyłce i przed przebiegami CRT.
+# Cells - id kształtu + 1 na komórkę, jak grid silnika (0 - pusta, zostaje to, co na płótnie),
+# Tiles - kafelki kolejnych rodzajów komórek obok siebie, w każdym pikselu numer roli koloru (bez motywu),
+# Palette - kolor roli dla rodzaju komórki w bieżącym motywie. Zmiana motywu to zapis samej palety.
+BOARD_FRAGMENT_SHADER = '''
+    #version 330
+    uniform usampler2D Cells;
+    uniform usampler2D Tiles;
+    uniform sampler2D Palette;
+    uniform vec2 origin;
+    uniform int cell_size;
+    out vec4 f_color;
+    void main() {
+        ivec2 p = ivec2(gl_FragCoord.xy - origin);
+        ivec2 cell = p / cell_size;
+        int kind = int(texelFetch(Cells, cell, 0).r) - 1;
+        if (kind < 0) {
+            discard;
+        }
+        ivec2 tile = p - cell * cell_size;
+        int role = int(texelFetch(Tiles, ivec2(kind * cell_size + tile.x, tile.y), 0).r);
+        f_color = texelFetch(Palette, ivec2(role, kind), 0);
+    }
+'''
+
+# Rodzaje komórek w Cells/Tiles/Palette: kształty, śmieci (GARBAGE), mignięcie czyszczonej linii
+BOARD_FLASH = GARBAGE + 1
+BOARD_KINDS = BOARD_FLASH + 1
+# Kolory rysujące kafelki w Tiles - czerwony kanał to numer roli w kolejności _draw_cell_tile
+TILE_ROLES = ((0, 0, 0), (1, 0, 0), (2, 0, 0), (3, 0, 0))
+
+
+def build_board_tiles():
+    atlas = pygame.Surface((BOARD_KINDS * GRID_SIZE, GRID_SIZE))
+    for kind in range(BOARD_KINDS):
+        _draw_cell_tile(atlas, kind if kind < GARBAGE else None, kind * GRID_SIZE, 0, TILE_ROLES)
+    return pygame.image.tostring(atlas, "RGB")[::3]
+
+
+def board_palette(surface):
+    # Kolory w bajtach, które upload_surface wysyła z płótna - shader kopiuje je na teksturę płótna bez zmian
+    direct = _surface_swizzle(surface) is not None and surface.get_pitch() == surface.get_width() * 4
+    fills = list(COLORS) + [GB_GRID, WHITE]
+    palette = bytearray()
+    for fill in fills:
+        for color in (GB_GRID, fill, GB_BG, GB_ACCENT):
+            palette += surface.map_rgb(color).to_bytes(4, sys.byteorder) if direct else bytes(color) + b"\xff"
+    return bytes(palette)
+
+
+def setup_board_pass(ctx, texture):
+    vertices = np.array([-1, -1, 1, -1, -1, 1, 1, 1], dtype='f4')
+    prog = ctx.program(vertex_shader=CRT_VERTEX_SHADER, fragment_shader=BOARD_FRAGMENT_SHADER)
+    cells = ctx.texture((GRID_WIDTH, GRID_HEIGHT), 1, dtype="u1")
+    tiles = ctx.texture((BOARD_KINDS * GRID_SIZE, GRID_SIZE), 1, build_board_tiles(), dtype="u1")
+    palette = ctx.texture((len(TILE_ROLES), BOARD_KINDS), 4)
+    # Tekstury całkowitoliczbowe są niekompletne z filtrem liniowym
+    for board_texture in (cells, tiles, palette):
+        board_texture.filter = (moderngl.NEAREST, moderngl.NEAREST)
+    return {
+        "prog": prog,
+        "vao": ctx.simple_vertex_array(prog, ctx.buffer(vertices.tobytes()), 'vert'),
+        "fbo": ctx.framebuffer(color_attachments=[texture]),
+        "cells": cells,
+        "tiles": tiles,
+        "palette": palette,
+        "palette_key": None,
+    }
+
+
+def render_board_cells(passes, cells, origin):
+    # cells - GRID_WIDTH * GRID_HEIGHT bajtów (Game.board_cells), origin - lewy górny róg planszy na płótnie
+    if passes["palette_key"] != current_theme_idx:
+        passes["palette"].write(board_palette(screen))
+        passes["palette_key"] = current_theme_idx
+    # Tylko wiersze od najwyższej zajętej komórki w dół - nad nią shader i tak niczego nie rysuje
+    top = (len(cells) - len(cells.lstrip(b"\0"))) // GRID_WIDTH
+    if top == GRID_HEIGHT:
+        return
+    passes["cells"].write(cells)
+    prog = passes["prog"]
+    fbo = passes["fbo"]
+    fbo.viewport = (origin[0], origin[1] + top * GRID_SIZE, GRID_WIDTH * GRID_SIZE, (GRID_HEIGHT - top) * GRID_SIZE)
+    fbo.use()
+    passes["cells"].use(location=0)
+    passes["tiles"].use(location=1)
+    passes["palette"].use(location=2)
+    _set_uniform(prog, 'Cells', 0)
+    _set_uniform(prog, 'Tiles', 1)
+    _set_uniform(prog, 'Palette', 2)
+    _set_uniform(prog, 'origin', origin)
+    _set_uniform(prog, 'cell_size', GRID_SIZE)
+    passes["vao"].render(moderngl.TRIANGLE_STRIP)
+
+
+# "full" - cała klatka co klatkę, "dirty" - tylko przekazane prostokąty
+UPLOAD_MODE = "full"
+REPORT_UPLOAD_STATS = False
+upload_stats = {"frame_bytes": 0, "total_bytes": 0, "frames": 0}
+
+def _surface_swizzle(surface):
+    # Mapuje bajty piksela powierzchni (np. BGRX) na kanały RGB tekstury, bez konwersji na CPU
+    if surface.get_bytesize() != 4:
+        return None
+    swizzle = ""
+    for shift in surface.get_shifts()[:3]:
+        if shift % 8:
+            return None
+        byte = shift // 8 if sys.byteorder == "little" else 3 - shift // 8
+        swizzle += "RGBA"[byte]
+    return swizzle + "1"
+
+def upload_surface(texture, surface, rects=None):
+    width, height = surface.get_size()
+    swizzle = _surface_swizzle(surface)
+    if swizzle is None or surface.get_pitch() != width * 4:
+        # Nietypowy format powierzchni: jedna kopia przez tostring
+        if texture.swizzle != "RGBA":
+            texture.swizzle = "RGBA"
+        texture.write(pygame.image.tostring(surface, "RGBA"))
+        return width * height * 4
+
+    if texture.swizzle != swizzle:
+        texture.swizzle = swizzle
+    view = surface.get_view("1")
+    try:
+        if rects is None:
+            texture.write(view)
+            return width * height * 4
+        pixels = np.frombuffer(view, dtype=np.uint8).reshape(height, width * 4)
+        uploaded = 0
+        for rect in rects:
+            rect = pygame.Rect(rect).clip(surface.get_rect())
+            if rect.w == 0 or rect.h == 0:
+                continue
+            region = pixels[rect.top:rect.bottom, rect.left * 4:rect.right * 4]
+            texture.write(np.ascontiguousarray(region), viewport=(rect.x, rect.y, rect.w, rect.h))
+            uploaded += rect.w * rect.h * 4
+        return uploaded
+    finally:
+        del view
+
+# Profiler klatki: F3 w grze włącza/wyłącza, F4 zapisuje ślad dla chrome://tracing
+PROFILE = False
+PROFILE_OVERLAY = True
+PROFILE_TRACE_PATH = "frame_trace.json"
+PROFILE_OVERLAY_REFRESH = 15
+profiler = FrameProfiler()
+profiler.set_enabled(PROFILE)
+profiler_overlay = {"surface": None, "frame": None}
+
+class GpuTimer:
+    # Zapytania GL_TIME_ELAPSED w kółku; wynik czytamy kilka klatek później, kiedy GPU już skończyło
+    def __init__(self, ctx, lag=3):
+        self.queries = [ctx.query(time=True) for _ in range(lag)]
+        self.reset()
+
+    def begin(self):
+        index = self.index
+        self.index = (index + 1) % len(self.queries)
+        query = self.queries[index]
+        if self.submitted[index] is not None:
+            elapsed = query.elapsed
+            # Pierwszy odczyt po utworzeniu zapytań bywa śmieciowy (np. 2**32 - 1 na llvmpipe)
+            if self.warmed_up:
+                profiler.add_sample("gpu", elapsed / 1e6, self.submitted[index], "GPU")
+            self.warmed_up = True
+        self.submitted[index] = time.perf_counter_ns()
+        return query
+
+    def reset(self):
+        self.submitted = [None] * len(self.queries)
+        self.index = 0
+        self.warmed_up = False
+
+def draw_profiler_overlay(surface, dirty_rects):
+    # Tekst przerysowujemy co kilka klatek, żeby sama nakładka nie zaburzała pomiarów
+    overlay = profiler_overlay["surface"]
+    if overlay is None or profiler.frames - profiler_overlay["frame"] >= PROFILE_OVERLAY_REFRESH:
+        font = get_font(None, 24)
+        rows = [("ms", "p50", "p95", "p99")]
+        rows += [(name, "%.2f" % p50, "%.2f" % p95, "%.2f" % p99) for name, p50, p95, p99 in profiler.summary()]
+        line_height = font.get_linesize()
+        # Kolumny wyrównane do prawej krawędzi, bo domyślna czcionka nie jest o stałej szerokości
+        column_right = (0, 200, 270, 340)
+        overlay = pygame.Surface((column_right[-1] + 10, len(rows) * line_height + 12))
+        overlay.fill(BLACK)
+        for i, row in enumerate(rows):
+            y = 6 + i * line_height
+            for column, text in enumerate(row):
+                label = font.render(text, True, WHITE)
+                x = 8 if column == 0 else column_right[column] - label.get_width()
+                overlay.blit(label, (x, y))
+        profiler_overlay["surface"] = overlay
+        profiler_overlay["frame"] = profiler.frames
+    rect = surface.blit(overlay, (10, 10))
+    if dirty_rects is not None:
+        dirty_rects = list(dirty_rects) + [rect]
+    return dirty_rects
+
+def render_fisheye_gl(ctx, prog, vao, texture, surface, distortion=0.08, effects=None, dirty_rects=None, board=None):
+    # dirty_rects=() - płótno bez zmian, tekstura z poprzedniej klatki (sam takt animacji CRT).
+    # board - (komórki, róg planszy) dla render_board_cells, plansza gry dorysowywana na GPU
+    if UPLOAD_MODE != "dirty" and dirty_rects != ():
+        dirty_rects = None
+    if profiler.enabled and PROFILE_OVERLAY:
+        dirty_rects = draw_profiler_overlay(surface, dirty_rects)
+    with profiler.stage("upload"):
+        frame_bytes = upload_surface(texture, surface, dirty_rects)
+    upload_stats["frame_bytes"] = frame_bytes
+    upload_stats["total_bytes"] += frame_bytes
+    upload_stats["frames"] += 1
+    if REPORT_UPLOAD_STATS and upload_stats["frames"] % 300 == 0:
+        print("Upload: {} bytes/frame, average {:.0f} bytes/frame".format(
+            frame_bytes, upload_stats["total_bytes"] / upload_stats["frames"]))
+    gpu_query = gpu_timer.begin() if profiler.enabled else NULL_STAGE
+    with profiler.stage("gl_submit"), gpu_query:
+        if board is not None:
+            render_board_cells(board_pass, *board)
+        if effects:
+            texture = render_crt_passes(crt_passes, texture, surface.get_size(), effects)
+        gl_target.use()
+        ctx.clear()
+        prog['distortion'].value = distortion
+        texture.use(location=0)
+        crt_texture.use(location=1)
+        prog['Texture'].value = 0
+        prog['BgTexture'].value = 1
+        vao.render(moderngl.TRIANGLE_STRIP)
+    if video_capture is not None:
+        with profiler.stage("capture"):
+            video_capture.capture(gl_target)
+    with profiler.stage("flip"):
+        pygame.display.flip()
+    profiler.end_frame()
+
+# Nagrywanie obrazu z okna (po CRT i fisheye): --capture PATH od startu albo F5 w grze do CAPTURE_DIR
+CAPTURE_DIR = "captures"
+video_capture = None
+
+def start_capture(path):
+    global video_capture
+    stop_capture()
+    try:
+        video_capture = VideoCapture(fisheye_ctx, (DISPLAY_WIDTH, DISPLAY_HEIGHT), path, fps=CAPTURE_FPS)
+    except OSError as e:
+        print("Cannot start capture:", e)
+        return
+    print("Capture: recording to", path)
+
+def stop_capture():
+    global video_capture
+    capture, video_capture = video_capture, None
+    if capture is None:
+        return
+    # Po pygame.quit nie ma już kontekstu GL - klatek czekających w PBO nie da się odczytać
+    stats = capture.close(read_pending=pygame.display.get_init())
+    print("Capture: {written} frames written, {dropped} dropped ({path})".format(**stats))
+
+def toggle_capture():
+    if video_capture is not None:
+        stop_capture()
+        return
+    os.makedirs(CAPTURE_DIR, exist_ok=True)
+    start_capture(os.path.join(CAPTURE_DIR, time.strftime("%Y%m%d-%H%M%S") + ".rgb"))
 
 def resource_path(relative_path):
     try:
@@ -143,38 +625,51 @@ def resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 
+# Efekty dźwiękowe: kanały zarezerwowane dla "drop" i "clear", odtwarzanie raz na klatkę (tetris_audio.py)
+audio = AudioEngine(profiler=profiler)
+
+def init_audio():
+    audio.init()
+
+def load_sounds():
+    try:
+        audio.load("drop", resource_path("drop.mp3"))
+        audio.load("clear", resource_path("clear.mp3"))
+    except Exception as e:
+        print("Nie można załadować muzyki:", e)
+
+
+# Każda para (ścieżka, rozmiar) wczytywana raz - parsowanie TTF jest kosztowne
+_font_registry = {}
 
+def get_font(path, size):
+    font = _font_registry.get((path, size))
+    if font is None:
+        font = _font_registry[(path, size)] = pygame.font.Font(path, size)
+    return font
 
-pygame.init()
-pygame.mouse.set_visible(False)
-pygame.mixer.init()
-try:
-    drop_sound = pygame.mixer.Sound(resource_path("drop.mp3"))
-    clear_sound = pygame.mixer.Sound(resource_path("clear.mp3"))
-except Exception as e:
-    print("Nie można załadować muzyki:", e)
-    drop_sound = None 
-    clear_sound = None 
+# Wyrenderowane napisy; zwróconych powierzchni nie wolno modyfikować.
+# Czyszczone przy zmianie motywu w apply_theme.
+@functools.lru_cache(maxsize=256)
+def render_text(text, font, color):
+    return font.render(text, True, color)
 
+tetris_font_path = resource_path("Tetris.ttf")
 
-try:
-    tetris_font_path = resource_path("Tetris.ttf")
-    title_font = pygame.font.Font(tetris_font_path, 100)
-    menu_font = pygame.font.Font(tetris_font_path, 50)
-    score_font = pygame.font.Font(tetris_font_path, 30)
-except Exception:
-    title_font = pygame.font.SysFont('comicsans', 70)
-    menu_font = pygame.font.SysFont('comicsans', 50)
-    score_font = pygame.font.SysFont('comicsans', 30)
+def load_fonts():
+    global title_font, menu_font, score_font
+    try:
+        title_font = get_font(tetris_font_path, 100)
+        menu_font = get_font(tetris_font_path, 50)
+        score_font = get_font(tetris_font_path, 30)
+    except Exception:
+        title_font = pygame.font.SysFont('comicsans', 70)
+        menu_font = pygame.font.SysFont('comicsans', 50)
+        score_font = pygame.font.SysFont('comicsans', 30)
 
 
 GRID_SIZE = 56
-GRID_WIDTH = 10
-GRID_HEIGHT = 20
 SIDEBAR_WIDTH = 400
-info = pygame.display.Info()
-SCREEN_WIDTH = info.current_w
-SCREEN_HEIGHT = info.current_h
 
 THEMES = [
     {
@@ -278,6 +773,8 @@ current_theme_idx = 0
 
 def apply_theme(idx):
     global GB_BG, GB_GRID, GB_BLOCK, GB_ACCENT, RED, WHITE, BLACK, GRAY, DARK_GRAY, HIGHLIGHT, COLORS
+    global current_theme_idx
+    current_theme_idx = idx
     theme = THEMES[idx]
     GB_BG = theme["GB_BG"]
     GB_GRID = theme["GB_GRID"]
@@ -290,411 +787,586 @@ def apply_theme(idx):
     DARK_GRAY = GB_ACCENT
     HIGHLIGHT = GB_BLOCK
     COLORS = theme["COLORS"]
+    build_cell_sprites()
+    render_text.cache_clear()
+
+# Cień lądowania spadającego klocka
+SHOW_GHOST = True
+
+# Gotowe kafelki komórek dla bieżącego motywu i GRID_SIZE, rysowane jednym blitem
+cell_sprites = {}
+cell_sprites_key = None
+
+def _draw_cell_pattern(surface, shape_id, bx, by, accent):
+    if shape_id == 0:  # I
+        pygame.draw.rect(surface, accent, (bx+8, by+8, GRID_SIZE-16, GRID_SIZE-16), 2)
+    elif shape_id == 1:  # O
+        pygame.draw.rect(surface, accent, (bx+6, by+6, GRID_SIZE-12, GRID_SIZE-12), 2)
+        pygame.draw.rect(surface, accent, (bx+12, by+12, GRID_SIZE-24, GRID_SIZE-24), 1)
+    elif shape_id == 2:  # T
+        pygame.draw.rect(surface, accent, (bx+8, by+8, GRID_SIZE-16, GRID_SIZE-16), 1)
+        pygame.draw.circle(surface, accent, (bx+GRID_SIZE//2, by+GRID_SIZE//2), 3)
+    elif shape_id == 3:  # L
+        pygame.draw.rect(surface, accent, (bx+8, by+8, GRID_SIZE-16, GRID_SIZE-16), 1)
+        pygame.draw.line(surface, accent, (bx+GRID_SIZE-8, by+GRID_SIZE-8), (bx+GRID_SIZE-8, by+GRID_SIZE//2), 2)
+        pygame.draw.line(surface, accent, (bx+GRID_SIZE-8, by+GRID_SIZE-8), (bx+GRID_SIZE//2, by+GRID_SIZE-8), 2)
+    elif shape_id == 4:  # J
+        pygame.draw.rect(surface, accent, (bx+8, by+8, GRID_SIZE-16, GRID_SIZE-16), 1)
+        pygame.draw.line(surface, accent, (bx+8, by+GRID_SIZE-8), (bx+GRID_SIZE//2, by+GRID_SIZE-8), 2)
+        pygame.draw.line(surface, accent, (bx+8, by+GRID_SIZE-8), (bx+8, by+GRID_SIZE//2), 2)
+    elif shape_id == 5:  # S
+        pygame.draw.rect(surface, accent, (bx+8, by+8, GRID_SIZE-16, GRID_SIZE-16), 1)
+        pygame.draw.line(surface, accent, (bx+4, by+GRID_SIZE-8), (bx+GRID_SIZE-8, by+8), 2)
+    elif shape_id == 6:  # Z
+        pygame.draw.rect(surface, accent, (bx+8, by+8, GRID_SIZE-16, GRID_SIZE-16), 1)
+        pygame.draw.line(surface, accent, (bx+4, by+8), (bx+GRID_SIZE-8, by+GRID_SIZE-8), 2)
+
+def _draw_cell_tile(surface, shape_id, bx, by, colors):
+    # colors - (obramowanie, wypełnienie, środek, kontur i wzór)
+    edge, fill, center, accent = colors
+    pygame.draw.rect(surface, edge, (bx, by, GRID_SIZE, GRID_SIZE))
+    pygame.draw.rect(surface, fill, (bx+4, by+4, GRID_SIZE-8, GRID_SIZE-8))
+    pygame.draw.rect(surface, center, (bx+10, by+10, GRID_SIZE-20, GRID_SIZE-20))
+    pygame.draw.rect(surface, accent, (bx, by, GRID_SIZE, GRID_SIZE), 2)
+    _draw_cell_pattern(surface, shape_id, bx, by, accent)
+
+def _render_cell_sprite(state, key):
+    if state in ("empty", "shadow", "ghost"):
+        sprite = pygame.Surface((GRID_SIZE, GRID_SIZE), pygame.SRCALPHA)
+        if state == "empty":
+            pygame.draw.rect(sprite, GRAY, (0, 0, GRID_SIZE, GRID_SIZE), 1)
+        elif state == "ghost":
+            pygame.draw.rect(sprite, (*GB_ACCENT, 60), (4, 4, GRID_SIZE-8, GRID_SIZE-8))
+            pygame.draw.rect(sprite, GB_ACCENT, (4, 4, GRID_SIZE-8, GRID_SIZE-8), 2)
+        else:
+            pygame.draw.rect(sprite, (100, 70, 130), (0, 0, GRID_SIZE, GRID_SIZE), border_radius=6)
+        return sprite
+
+    sprite = pygame.Surface((GRID_SIZE, GRID_SIZE))
+    if state == "preview":
+        sprite.fill(COLORS[key])
+        pygame.draw.rect(sprite, BLACK, (0, 0, GRID_SIZE, GRID_SIZE), 2)
+        return sprite
+
+    if state == "remote":
+        # Plansza przeciwnika w trybie versus - te same kafelki w połowie rozmiaru
+        return pygame.transform.smoothscale(_render_cell_sprite("locked", key), (GRID_SIZE // 2, GRID_SIZE // 2))
+
+    # "locked"/"active" - kluczem jest id kształtu, "flash" - kolor mignięcia czyszczonej linii.
+    # Śmieci z trybu versus (id GARBAGE, spoza COLORS) mają kolor siatki i bez wzoru.
+    if state == "locked":
+        fill = COLORS[key] if key < len(COLORS) else GB_GRID
+        shape_id = key
+    elif state == "flash":
+        fill = key
+        shape_id = None
+    else:
+        fill = GB_BLOCK
+        shape_id = key
+    _draw_cell_tile(sprite, shape_id, 0, 0, (GB_GRID, fill, GB_BG, GB_ACCENT))
+    return sprite
+
+def build_cell_sprites():
+    global cell_sprites, cell_sprites_key
+    cell_sprites = {}
+    cell_sprites_key = (current_theme_idx, GRID_SIZE)
+    for key in [("empty", None), ("shadow", None), ("ghost", None)]:
+        cell_sprites[key] = _render_cell_sprite(*key)
+    for shape_id in range(len(COLORS)):
+        for key in [("active", shape_id), ("preview", shape_id)]:
+            cell_sprites[key] = _render_cell_sprite(*key)
+
+def cell_sprite(state, key=None):
+    if cell_sprites_key != (current_theme_idx, GRID_SIZE):
+        build_cell_sprites()
+    sprite = cell_sprites.get((state, key))
+    if sprite is None:
+        # Kafelki spoza motywu renderowane raz, przy pierwszym użyciu
+        sprite = cell_sprites[(state, key)] = _render_cell_sprite(state, key)
+    return sprite
 
 apply_theme(current_theme_idx)
 
+start_button = options_button = quit_button = None
+restart_button = menu_button = None
+resume_button = pause_restart_button = pause_quit_button = None
+back_button = theme_left_button = theme_right_button = None
+
+def place_button(button, x, y, width, height, text):
+    # Nowy przycisk tylko za pierwszym razem; potem ten sam obiekt dostaje nowe kolory i położenie,
+    # więc podświetlenie przycisku pod myszą (np. strzałki motywu) nie znika po kliknięciu
+    if button is None:
+        return Button(x, y, width, height, text, GRAY, HIGHLIGHT)
+    button.restyle(x, y, width, height, GRAY, HIGHLIGHT)
+    return button
+
 def rebuild_buttons():
     global start_button, options_button, quit_button
     global restart_button, menu_button
     global resume_button, pause_restart_button, pause_quit_button
     global back_button, theme_left_button, theme_right_button
 
-    start_button = Button(SCREEN_WIDTH//2 - 100, 360, 200, 50, "Start", GRAY, HIGHLIGHT)
-    options_button = Button(SCREEN_WIDTH//2 - 100, 470, 200, 50, "Options", GRAY, HIGHLIGHT)
-    quit_button = Button(SCREEN_WIDTH//2 - 100, 580, 200, 50, "Quit", GRAY, HIGHLIGHT)
-
-    restart_button = Button(SCREEN_WIDTH//2 - 100, 350, 200, 50, "Play Again", GRAY, HIGHLIGHT)
-    menu_button = Button(SCREEN_WIDTH//2 - 100, 470, 200, 50, "Main Menu", GRAY, HIGHLIGHT)
-
-    resume_button = Button(SCREEN_WIDTH//2 - 100, SCREEN_HEIGHT//2, 200, 50, "Resume", GRAY, HIGHLIGHT)
-    pause_restart_button = Button(SCREEN_WIDTH//2 - 100, SCREEN_HEIGHT//2 + 80, 200, 50, "Restart", GRAY, HIGHLIGHT)
-    pause_quit_button = Button(SCREEN_WIDTH//2 - 100, SCREEN_HEIGHT//2 + 160, 200, 50, "Quit to Menu", GRAY, HIGHLIGHT)
-
-    back_button = Button(SCREEN_WIDTH//2 - 100, 670, 200, 50, "Back", GRAY, HIGHLIGHT)
-    theme_left_button = Button(SCREEN_WIDTH//2 - 250, 800, 60, 50, "<", GRAY, HIGHLIGHT)
-    theme_right_button = Button(SCREEN_WIDTH//2 + 200, 800, 60, 50, ">", GRAY, HIGHLIGHT)
-
-SHAPES = [
-    [[1, 1, 1, 1]],  # I
-    [[1, 1], [1, 1]],  # O
-    [[1, 1, 1], [0, 1, 0]],  # T
-    [[1, 1, 1], [1, 0, 0]],  # L
-    [[1, 1, 1], [0, 0, 1]],  # J
-    [[0, 1, 1], [1, 1, 0]],  # S
-    [[1, 1, 0], [0, 1, 1]]   # Z
-]
-
-# Konfiguracja ekranu
-pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.OPENGL | pygame.DOUBLEBUF)
-screen = pygame.display.get_surface()
-fisheye_ctx, fisheye_prog, fisheye_vao, fisheye_texture = setup_fisheye_gl((SCREEN_WIDTH, SCREEN_HEIGHT))
+    start_button = place_button(start_button, SCREEN_WIDTH//2 - 100, 360, 200, 50, "Start")
+    options_button = place_button(options_button, SCREEN_WIDTH//2 - 100, 470, 200, 50, "Options")
+    quit_button = place_button(quit_button, SCREEN_WIDTH//2 - 100, 580, 200, 50, "Quit")
+
+    restart_button = place_button(restart_button, SCREEN_WIDTH//2 - 100, 350, 200, 50, "Play Again")
+    menu_button = place_button(menu_button, SCREEN_WIDTH//2 - 100, 470, 200, 50, "Main Menu")
+
+    resume_button = place_button(resume_button, SCREEN_WIDTH//2 - 100, SCREEN_HEIGHT//2, 200, 50, "Resume")
+    pause_restart_button = place_button(pause_restart_button, SCREEN_WIDTH//2 - 100, SCREEN_HEIGHT//2 + 80, 200, 50, "Restart")
+    pause_quit_button = place_button(pause_quit_button, SCREEN_WIDTH//2 - 100, SCREEN_HEIGHT//2 + 160, 200, 50, "Quit to Menu")
+
+    back_button = place_button(back_button, SCREEN_WIDTH//2 - 100, 670, 200, 50, "Back")
+    theme_left_button = place_button(theme_left_button, SCREEN_WIDTH//2 - 250, 800, 60, 50, "<")
+    theme_right_button = place_button(theme_right_button, SCREEN_WIDTH//2 + 200, 800, 60, 50, ">")
+
+# Płótno, na którym rysuje się cała gra (plansza, menu, efekty CRT); przebieg fisheye rozciąga je
+# na całe okno. None - natywna rozdzielczość okna, (w, h) - stałe płótno, ułamek (np. 0.5) - część
+# natywnej. Układ planszy i menu jest w pikselach pod ~1080 linii: na ekranie 4K 0.5 daje wygląd
+# jak na 1080p przy 4x mniejszej liczbie pikseli, płótno niższe niż ~1080 linii przycina planszę.
+RENDER_RESOLUTION = None
+
+def render_size(display_size):
+    if RENDER_RESOLUTION is None:
+        return display_size
+    if isinstance(RENDER_RESOLUTION, (int, float)):
+        return tuple(max(1, round(v * RENDER_RESOLUTION)) for v in display_size)
+    return tuple(RENDER_RESOLUTION)
+
+# Pozycja myszy (albo event.pos) w pikselach płótna - okno może mieć inny rozmiar
+def canvas_pos(pos):
+    return pos[0] * SCREEN_WIDTH // DISPLAY_WIDTH, pos[1] * SCREEN_HEIGHT // DISPLAY_HEIGHT
+
+def canvas_mouse_pos():
+    return canvas_pos(pygame.mouse.get_pos())
+
+# Konfiguracja ekranu. headless: okno bez OpenGL (np. SDL_VIDEODRIVER=dummy), osobny kontekst GL
+# i obraz końcowy w gl_target zamiast na ekranie - do benchmarków i testów bez monitora.
+# SCREEN_WIDTH/SCREEN_HEIGHT to rozmiar płótna, DISPLAY_WIDTH/DISPLAY_HEIGHT - okna.
+def init_display(size=None, headless=False):
+    global SCREEN_WIDTH, SCREEN_HEIGHT, DISPLAY_WIDTH, DISPLAY_HEIGHT, screen, gl_target
+    global fisheye_ctx, fisheye_prog, fisheye_vao, fisheye_texture, crt_passes, board_pass, crt_texture, gpu_timer
+    if size is None:
+        info = pygame.display.Info()
+        size = (info.current_w, info.current_h)
+    DISPLAY_WIDTH, DISPLAY_HEIGHT = size
+    SCREEN_WIDTH, SCREEN_HEIGHT = render_size(size)
+    if headless:
+        pygame.display.set_mode((DISPLAY_WIDTH, DISPLAY_HEIGHT))
+    else:
+        pygame.display.set_mode((DISPLAY_WIDTH, DISPLAY_HEIGHT), pygame.OPENGL | pygame.DOUBLEBUF,
+                                vsync=1 if RENDER_MODE == "vsync" else 0)
+    if (SCREEN_WIDTH, SCREEN_HEIGHT) == (DISPLAY_WIDTH, DISPLAY_HEIGHT):
+        screen = pygame.display.get_surface()
+    else:
+        screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), 0, 32)
+    # Tekstury i przebiegi CRT w rozmiarze płótna; skalowanie do okna (filtr liniowy) w przebiegu fisheye
+    fisheye_ctx, fisheye_prog, fisheye_vao, fisheye_texture = setup_fisheye_gl((SCREEN_WIDTH, SCREEN_HEIGHT), standalone=headless)
+    if headless:
+        gl_target = fisheye_ctx.simple_framebuffer((DISPLAY_WIDTH, DISPLAY_HEIGHT))
+    else:
+        gl_target = fisheye_ctx.screen
+    crt_passes = setup_crt_passes(fisheye_ctx, (SCREEN_WIDTH, SCREEN_HEIGHT))
+    board_pass = setup_board_pass(fisheye_ctx, fisheye_texture)
+    gpu_timer = GpuTimer(fisheye_ctx)
+    # Czarna ramka, dopóki AssetLoader nie przygotuje crt.png
+    crt_texture = fisheye_ctx.texture((1, 1), 3, bytes(3))
+
+class AssetLoader(threading.Thread):
+    # Dekodowanie i skalowanie zasobów w tle (w trakcie intra). Wysyłka na GPU i wszystko,
+    # co dotyka okna, zostaje w głównym wątku - w finish_loading.
+    def __init__(self, screen_size):
+        super().__init__(name="asset-loader", daemon=True)
+        self.screen_size = screen_size
+        self.crt_pixels = None
+        self.done = threading.Event()
+        self.finished = False
 
-crt_image = pygame.image.load(resource_path("crt.png")).convert()
-crt_image = pygame.transform.scale(crt_image, (SCREEN_WIDTH, SCREEN_HEIGHT))
-crt_image = pygame.transform.flip(crt_image, False, True) 
-crt_texture = fisheye_ctx.texture((SCREEN_WIDTH, SCREEN_HEIGHT), 3, pygame.image.tostring(crt_image, "RGB"))
-crt_texture.build_mipmaps()
+    def run(self):
+        start = time.perf_counter()
+        try:
+            try:
+                crt_image = pygame.image.load(resource_path("crt.png"))
+                crt_image = pygame.transform.scale(crt_image, self.screen_size)
+                self.crt_pixels = pygame.image.tostring(crt_image, "RGB")
+            except Exception as e:
+                print("Cannot load crt.png:", e)
+            load_fonts()
+            load_sounds()
+        finally:
+            startup_stats["assets_ms"] = (time.perf_counter() - start) * 1000
+            self.done.set()
+
+def finish_loading(loader):
+    global crt_texture
+    loader.done.wait()
+    if loader.crt_pixels is not None:
+        crt_texture.release()
+        crt_texture = fisheye_ctx.texture(loader.screen_size, 3, loader.crt_pixels)
+        crt_texture.build_mipmaps()
+        loader.crt_pixels = None
+    rebuild_buttons()
+    build_sliders()
+    loader.finished = True
+
+def init_game(size=None, headless=False, background=False):
+    # Wszystko, co otwiera okno, kontekst GL albo urządzenie audio - import modułu jest bez efektów ubocznych.
+    # background=True - zasoby ładują się w wątku, a finish_loading woła show_bios_intro
+    global bios_font
+    audio.pre_init()
+    pygame.init()
+    pygame.mouse.set_visible(False)
+    init_audio()
+    init_display(size, headless)
+    # Czcionka intra przed startem wątku - czcionki nie są otwierane w dwóch wątkach naraz
+    bios_font = pygame.font.SysFont("consolas", 32)
+    loader = AssetLoader((SCREEN_WIDTH, SCREEN_HEIGHT))
+    if background:
+        loader.start()
+    else:
+        loader.run()
+        finish_loading(loader)
+    return loader
 
 clock = pygame.time.Clock()
 FPS = 60
 
-# Funkcja do dynamicznego centrowania planszy:
-def get_margins():
-    win_w, win_h = pygame.display.get_surface().get_size()
-    margin_left = (win_w - (SIDEBAR_WIDTH + GRID_WIDTH * GRID_SIZE + SIDEBAR_WIDTH)) // 2 + SIDEBAR_WIDTH
-    margin_top = (win_h - GRID_HEIGHT * GRID_SIZE) // 2
-    return margin_left, margin_top
+# Rysowanie: "vsync" - flip czeka na odświeżenie monitora, "capped" - najwyżej FPS klatek, "uncapped" - bez limitu
+RENDER_MODE = "capped"
+
+# Logika gry w stałych krokach, niezależnie od tempa rysowania
+LOGIC_HZ = 120
+LOGIC_STEP_MS = 1000 / LOGIC_HZ
+# Po dłuższym przestoju (przeciąganie okna, zawieszenie) nie nadrabiamy wszystkiego naraz
+MAX_FRAME_MS = 250
+
+def render_fps():
+    return FPS if RENDER_MODE == "capped" else 0
+
+# Mignięcie czyszczonych linii: liczba faz i czas jednej fazy
+LINE_CLEAR_BLINKS = 4
+LINE_CLEAR_BLINK_MS = 100
+
+# Oszczędzanie energii: ekrany statyczne (menu, opcje, koniec gry) rysowane tylko po zdarzeniu,
+# a efekty CRT (migotanie, zakłócenia) odświeżane IDLE_FPS razy na sekundę; pauza czeka na zdarzenia.
+# Okno bez fokusu albo zminimalizowane - gra w pauzie i nic nie jest rysowane aż do powrotu.
+POWER_SAVING = True
+IDLE_FPS = 4
+IDLE_FRAME_MS = 1000 // IDLE_FPS
+PAUSE_ON_FOCUS_LOSS = True
+FOCUS_LOST_EVENTS = (pygame.WINDOWFOCUSLOST, pygame.WINDOWMINIMIZED)
+FOCUS_GAINED_EVENTS = (pygame.WINDOWFOCUSGAINED, pygame.WINDOWRESTORED)
+
+def wait_events(timeout_ms):
+    # Czeka (bez zużycia CPU) na pierwsze zdarzenie albo timeout_ms; zwraca wszystko z kolejki
+    event = pygame.event.wait(max(1, int(timeout_ms)))
+    events = pygame.event.get()
+    if event.type != pygame.NOEVENT:
+        events.insert(0, event)
+    return events
+
+def pump_events(deadline_ns, idle_deadline_ns=None):
+    # Zdarzenia ze znacznikiem czasu odczytu (perf_counter_ns), zbierane aż do deadline_ns.
+    # idle_deadline_ns - gdy do deadline_ns nic nie przyszło, czekamy dalej, do pierwszego zdarzenia
+    now = time.perf_counter_ns()
+    events = [(now, event) for event in pygame.event.get()]
+    while now < deadline_ns or (idle_deadline_ns and not events and now < idle_deadline_ns):
+        limit = deadline_ns if now < deadline_ns else idle_deadline_ns
+        event = pygame.event.wait(max(1, (limit - now) // 1_000_000))
+        now = time.perf_counter_ns()
+        if event.type != pygame.NOEVENT:
+            events.append((now, event))
+            events.extend((now, e) for e in pygame.event.get())
+    return events
+
+def wait_until_visible():
+    # Nic nie rysujemy, dopóki okno nie wróci; QUIT zostaje w kolejce dla wołającego
+    while True:
+        event = pygame.event.wait()
+        if event.type == pygame.QUIT:
+            pygame.event.post(event)
+            return
+        if event.type in FOCUS_GAINED_EVENTS:
+            return
 
-class Block:
-    def __init__(self, x, y, shape, color=None):
-        self.x = x
-        self.y = y
-        self.shape = shape
-        if color is None:
-            self.color = COLORS[SHAPES.index(shape)]
-        else:
-            self.color = color
-        self.rotation = 0
-
-def _apply_scanlines(screen):
-    width, height = screen.get_size()
-    scanline_surface = pygame.Surface((width, height), pygame.SRCALPHA)
-
-    for y in range(0, height, 4):
-        pygame.draw.line(scanline_surface, (0, 0, 0, 60), (0, y), (width, y))
-
-    screen.blit(scanline_surface, (0, 0))
-
-def _apply_pixelation(screen, pixelation):
-    pixelation = {"minimum": 2, "medium": 4, "maximum": 6}.get(pixelation, 2)
-    width, height = screen.get_size()
-    small_surf = pygame.transform.scale(screen, (width // pixelation, height // pixelation))
-    screen.blit(pygame.transform.scale(small_surf, (width, height)), (0, 0))
-
-def _apply_flicker(screen):
-    if random.randint(0, 20) == 0:
-        flicker_surface = pygame.Surface(screen.get_size(), pygame.SRCALPHA)
-        flicker_surface.fill((0, 0, 0, 10))
-        screen.blit(flicker_surface, (0, 0))
-
-def _apply_glow(screen):
-    width, height = screen.get_size()
-    glow_surf = pygame.transform.smoothscale(screen, (width // 4, height // 4))
-    glow_surf = pygame.transform.smoothscale(glow_surf, (width, height))
-    glow_surf.set_alpha(100)
-    screen.blit(glow_surf, (0, 0))
-    screen.blit(glow_surf, (0, 0))
-
-def _add_glitch_effect(height, width, glitch_surface, intensity):
-    shift_amount = {"minimum": 10, "medium": 20, "maximum": 40}.get(intensity, 20)
-    if random.random() < 0.1:
-        y_start = random.randint(0, height - 20)
-        slice_height = random.randint(5, 20)
-        offset = random.randint(-shift_amount, shift_amount)
-        slice_area = pygame.Rect(0, y_start, width, slice_height)
-        slice_copy = glitch_surface.subsurface(slice_area).copy()
-        glitch_surface.blit(slice_copy, (offset, y_start))
+def present_idle_frame():
+    # Takt animacji CRT na ekranie statycznym: bez rysowania płótna i bez wysyłania tekstury
+    render_fisheye_gl(fisheye_ctx, fisheye_prog, fisheye_vao, fisheye_texture, screen, distortion=0.15,
+                      effects=CRT_EFFECTS, dirty_rects=())
 
-def _add_rolling_static(screen, height, width, intensity):
-    static_chance = {"minimum": 0.03, "medium": 0.08, "maximum": 0.18}.get(intensity, 0.05)
-    static_surface = pygame.Surface((width, height), pygame.SRCALPHA)
+# Autoplay (F2 w grze) i demo po bezczynności w menu: bot wykonuje jedną akcję co AUTOPLAY_ACTION_MS
+AUTOPLAY_ACTION_MS = 50
+ATTRACT_IDLE_MS = 20000
 
-    for y in range(0, height, 24):
-        if random.random() < static_chance:
-            alpha = random.randint(8, 24)  
-            color = (177, 177, 177, alpha)
-            pygame.draw.line(static_surface, color, (0, y), (width, y))
+# Każda gra (poza demem) zapisywana jako powtórka w katalogu replays/
+RECORD_REPLAYS = True
+REPLAY_SEEK_SECONDS = 10
 
-    screen.blit(static_surface, (0, 0), special_flags=pygame.BLEND_ADD)
+# Zamknięcie okna w trakcie gry zapisuje ją do SUSPEND_PATH, następne uruchomienie wraca do niej w pauzie.
+# Plik: nagłówek (magic, wersja, stan generatora sprzed startu gry) + snapshot gry + snapshot punktu kontrolnego
+SUSPEND_PATH = "suspend.tsav"
+SUSPEND_MAGIC = b"TSAV"
+SUSPEND_VERSION = 1
+SUSPEND_HEADER = struct.Struct("<4sHQ")
 
+# Backspace cofa ostatni położony klocek, najwyżej UNDO_DEPTH razy z rzędu
+UNDO_DEPTH = 32
 
-class Game:
-    def __init__(self):
-        self.reset_game()
-        self.hold_block = None
-        self.hold_used = False
+# Funkcja do dynamicznego centrowania planszy:
+def get_margins():
+    win_w, win_h = screen.get_size()
+    margin_left = (win_w - (SIDEBAR_WIDTH + GRID_WIDTH * GRID_SIZE + SIDEBAR_WIDTH)) // 2 + SIDEBAR_WIDTH
+    margin_top = (win_h - GRID_HEIGHT * GRID_SIZE) // 2
+    return margin_left, margin_top
+
+KEY_ACTIONS = {
+    pygame.K_LEFT: LEFT,
+    pygame.K_RIGHT: RIGHT,
+    pygame.K_DOWN: DOWN,
+    pygame.K_UP: ROTATE,
+    pygame.K_SPACE: DROP,
+    pygame.K_q: HOLD,
+}
+
+class Game(TetrisEngine):
+    def __init__(self, seed=None):
         self.shake_frames = 0
         self.shake_offset = (0, 0) 
+        self.static_layer = None
+        self.static_layer_key = None
+        self.bot_driver = BotDriver(action_ms=AUTOPLAY_ACTION_MS)
+        self.autoplay = False
+        self.demo = False
+        self.replaying = False
+        self.recorder = None
+        self.frame_ns = None
+        # Tryb versus: VersusLink z połączeniem do przeciwnika i wynik ostatniej partii ("win"/"lose")
+        self.versus = None
+        self.versus_outcome = None
+        # Snapshoty w gotowych buforach: punkt kontrolny ze startu gry (Restart w pauzie) i historia do cofania
+        self.checkpoint = bytearray(SNAPSHOT_SIZE)
+        self.checkpoint_rng_state = 0
+        self.undo_ring = SnapshotRing(UNDO_DEPTH)
+        self.undo_block = None
+        # Klawisze z czasem naciśnięcia, DAS/ARR i pomiar opóźnienia do wyświetlenia (tetris_input.py)
+        self.controls = InputTimeline(profiler=profiler)
+        super().__init__(seed, clear_delay=LINE_CLEAR_BLINKS * LINE_CLEAR_BLINK_MS / TIME_UNIT_MS)
         
     def reset_game(self):
-        self.grid = [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
-        self.current_block = self.new_block()
-        self.next_block = self.new_block()
-        self.hold_block = None
-        self.hold_used = False
-        self.game_over = False
-        self.score = 0
-        self.level = 1
-        self.lines_cleared = 0
-        self.fall_speed = 2.8
-        
-        
-    def new_block(self):
-        shape = random.choice(SHAPES)
-        return Block(GRID_WIDTH // 2 - len(shape[0]) // 2, 0, shape)
-    
-    def valid_move(self, block, x_offset=0, y_offset=0):
-        for y, row in enumerate(block.shape):
-            for x, cell in enumerate(row):
-                if cell:
-                    new_x = block.x + x + x_offset
-                    new_y = block.y + y + y_offset
-                    if (new_x < 0 or new_x >= GRID_WIDTH or 
-                        new_y >= GRID_HEIGHT or 
-                        (new_y >= 0 and self.grid[new_y][new_x])):
-                        return False
+        # Poprzednia gra (np. Restart po końcu gry) trafia do pliku, nowe nagranie startuje przed losowaniem klocków
+        self.finish_replay()
+        self.checkpoint_rng_state = self.rng.state
+        if self.recording_enabled():
+            self.recorder = ReplayRecorder(self, LOGIC_HZ)
+        super().reset_game()
+        self.snapshot(self.checkpoint)
+        self.restart_history()
+
+    def restore(self, state):
+        super().restore(state)
+        self.invalidate_layers()
+
+    def restart_history(self):
+        self.undo_ring.clear()
+        self.undo_block = None
+        self.bot_driver.reset()
+        self.controls.clear()
+        self.invalidate_layers()
+
+    def recording_enabled(self):
+        # Partia versus zależy od śmieci przeciwnika, których powtórka nie zapisuje
+        return RECORD_REPLAYS and not self.demo and not self.replaying and not self.versus
+
+    def restart_from_checkpoint(self):
+        # Restart z pauzy: ta sama gra od początku (te same klocki), sam restore bez reset_game
+        self.finish_replay()
+        self.restore(self.checkpoint)
+        if self.recording_enabled():
+            self.recorder = ReplayRecorder(self, LOGIC_HZ)
+            self.recorder.start(self.checkpoint_rng_state, (self.current_block.shape_id, self.next_block.shape_id))
+        self.restart_history()
+
+    def undo(self):
+        # Powrót do chwili pojawienia się poprzedniego klocka. Dalsza gra nie wynika już
+        # z nagranych akcji, więc powtórka kończy się w tym miejscu. W versus nie ma cofania.
+        if len(self.undo_ring) < 2 or self.versus:
+            return
+        self.undo_ring.pop()
+        self.finish_replay()
+        self.restore(self.undo_ring.pop())
+        self.undo_block = None
+        self.bot_driver.reset()
+
+    def suspend(self, path=SUSPEND_PATH):
+        try:
+            with open(path, "wb") as f:
+                f.write(SUSPEND_HEADER.pack(SUSPEND_MAGIC, SUSPEND_VERSION, self.checkpoint_rng_state))
+                f.write(self.snapshot())
+                f.write(self.checkpoint)
+        except OSError as e:
+            print("Cannot save game:", e)
+
+    def resume(self, path=SUSPEND_PATH):
+        # Wczytuje i usuwa zapis; False, gdy go nie ma albo jest z innej wersji.
+        # Wznowiona gra nie jest nagrywana - nagranie zaczyna się dopiero od Restart.
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.remove(path)
+        except OSError:
+            return False
+        if len(data) != SUSPEND_HEADER.size + 2 * SNAPSHOT_SIZE:
+            return False
+        magic, version, rng_state = SUSPEND_HEADER.unpack_from(data)
+        if magic != SUSPEND_MAGIC or version != SUSPEND_VERSION:
+            return False
+        self.finish_replay()
+        states = memoryview(data)[SUSPEND_HEADER.size:]
+        self.restore(states[:SNAPSHOT_SIZE])
+        self.checkpoint[:] = states[SNAPSHOT_SIZE:]
+        self.checkpoint_rng_state = rng_state
+        self.restart_history()
         return True
-    
-    def rotate_block(self):
-        rotated = [list(row) for row in zip(*self.current_block.shape[::-1])]
-        old_shape = self.current_block.shape
-        self.current_block.shape = rotated
-        if not self.valid_move(self.current_block):
-            self.current_block.shape = old_shape
-    
-    def hold_current_block(self):
-        if self.hold_used:
+
+    def finish_replay(self):
+        recorder, self.recorder = self.recorder, None
+        self.piece_log = None
+        if recorder is None or recorder.tick == 0:
             return
+        try:
+            recorder.save(new_replay_path())
+        except OSError as e:
+            print("Cannot save replay:", e)
+
+    def start_versus(self, session, seed):
+        # Partia z przeciwnikiem po połączeniu i handshake; klocki z ziarna wspólnego dla obu graczy
+        self.versus_outcome = None
+        self.versus = VersusLink(self, session, seed)
+        self.versus.start()
+
+    def end_versus(self):
+        link, self.versus = self.versus, None
+        if link is None:
+            return
+        self.versus_outcome = link.outcome()
+        link.session.close()
+        self.invalidate_layers()
 
-        prev_x = self.current_block.x
-        prev_y = self.current_block.y
-        if self.hold_block is None:
-            new_block = Block(
-                GRID_WIDTH // 2 - len(self.current_block.shape[0]) // 2,
-                0,
-                [row[:] for row in self.current_block.shape],
-                self.current_block.color
-            )
-            self.hold_block = new_block
-            self.current_block = self.next_block
-            self.next_block = self.new_block()
-        else:
-            temp = self.current_block
-            new_block = Block(
-                GRID_WIDTH // 2 - len(self.hold_block.shape[0]) // 2,
-                0,
-                [row[:] for row in self.hold_block.shape],
-                self.hold_block.color
-            )
-            while not self.valid_move(new_block):
-                new_block.x -= 1
-                if new_block.x < 0:
-                    new_block.x = 0
-                    break
-            self.current_block = new_block
-            self.hold_block = Block(
-                GRID_WIDTH // 2 - len(temp.shape[0]) // 2,
-                0,
-                [row[:] for row in temp.shape],
-                temp.color
-            )
-        self.hold_used = True
-
-        while not self.valid_move(self.current_block):
-            self.current_block.y -= 1
-            if self.current_block.y < 0:
-                break
- 
-    def lock_block(self):
-        for y, row in enumerate(self.current_block.shape):
-            for x, cell in enumerate(row):
-                if cell:
-                    self.grid[self.current_block.y + y][self.current_block.x + x] = self.current_block.color
-                    try:
-                        if drop_sound:
-                            pygame.mixer.find_channel(True).play(drop_sound)
-                    except Exception:
-                        pass
-        
-        self.clear_lines()
-        self.current_block = self.next_block
-        self.next_block = self.new_block()
-        self.hold_used = False
-        self.shake_frames = 3
-        
-        if not self.valid_move(self.current_block):
-            self.game_over = True
-    
-    def clear_lines(self):
-        lines_to_clear = [i for i, row in enumerate(self.grid) if all(row)]
-        if lines_to_clear:
-            blink_times = 4
-            blink_delay = 100
-            for blink in range(blink_times):
-                for i in lines_to_clear:
-                    for x in range(GRID_WIDTH):
-                        self.grid[i][x] = WHITE if blink % 2 == 0 else COLORS[0]
-                margin_left, margin_top = get_margins()
-                self.draw(margin_left, margin_top, show_current_block=False)
-                pygame.time.delay(blink_delay)
-        for i in lines_to_clear:
-            del self.grid[i]
-            self.grid.insert(0, [0 for _ in range(GRID_WIDTH)])
-
-        lines_cleared = len(lines_to_clear)
-        if lines_cleared > 0:
-            try:
-                if clear_sound:
-                    pygame.mixer.find_channel(True).play(clear_sound)
-            except Exception:
-                pass
-            self.lines_cleared += lines_cleared
-            self.score += [100, 300, 500, 800][lines_cleared - 1] * self.level
-            if self.lines_cleared // 10 > (self.lines_cleared - lines_cleared) // 10:
-                self.level += 1
-                self.fall_speed = max(0.05, self.fall_speed * 0.8)
-    
-    def draw_grid(self, margin_left, margin_top):
-        for y in range(GRID_HEIGHT):
-            for x in range(GRID_WIDTH):
-                cell = self.grid[y][x]
-                bx = margin_left + x * GRID_SIZE
-                by = margin_top + y * GRID_SIZE
-                if cell:
-                    shape_id = None
-                    for idx, color in enumerate(COLORS):
-                        if cell == color:
-                            shape_id = idx
-                            break
-                    pygame.draw.rect(screen, GB_GRID, (bx, by, GRID_SIZE, GRID_SIZE))
-                    pygame.draw.rect(screen, cell, (bx+4, by+4, GRID_SIZE-8, GRID_SIZE-8))
-                    pygame.draw.rect(screen, GB_BG, (bx+10, by+10, GRID_SIZE-20, GRID_SIZE-20))
-                    pygame.draw.rect(screen, GB_ACCENT, (bx, by, GRID_SIZE, GRID_SIZE), 2)
-                    if shape_id == 0:  # I
-                        pygame.draw.rect(screen, GB_ACCENT, (bx+8, by+8, GRID_SIZE-16, GRID_SIZE-16), 2)
-                    elif shape_id == 1:  # O
-                        pygame.draw.rect(screen, GB_ACCENT, (bx+6, by+6, GRID_SIZE-12, GRID_SIZE-12), 2)
-                        pygame.draw.rect(screen, GB_ACCENT, (bx+12, by+12, GRID_SIZE-24, GRID_SIZE-24), 1)
-                    elif shape_id == 2:  # T
-                        pygame.draw.rect(screen, GB_ACCENT, (bx+8, by+8, GRID_SIZE-16, GRID_SIZE-16), 1)
-                        pygame.draw.circle(screen, GB_ACCENT, (bx+GRID_SIZE//2, by+GRID_SIZE//2), 3)
-                    elif shape_id == 3:  # L
-                        pygame.draw.rect(screen, GB_ACCENT, (bx+8, by+8, GRID_SIZE-16, GRID_SIZE-16), 1)
-                        pygame.draw.line(screen, GB_ACCENT, (bx+GRID_SIZE-8, by+GRID_SIZE-8), (bx+GRID_SIZE-8, by+GRID_SIZE//2), 2)
-                        pygame.draw.line(screen, GB_ACCENT, (bx+GRID_SIZE-8, by+GRID_SIZE-8), (bx+GRID_SIZE//2, by+GRID_SIZE-8), 2)
-                    elif shape_id == 4:  # J
-                        pygame.draw.rect(screen, GB_ACCENT, (bx+8, by+8, GRID_SIZE-16, GRID_SIZE-16), 1)
-                        pygame.draw.line(screen, GB_ACCENT, (bx+8, by+GRID_SIZE-8), (bx+GRID_SIZE//2, by+GRID_SIZE-8), 2)
-                        pygame.draw.line(screen, GB_ACCENT, (bx+8, by+GRID_SIZE-8), (bx+8, by+GRID_SIZE//2), 2)
-                    elif shape_id == 5:  # S
-                        pygame.draw.rect(screen, GB_ACCENT, (bx+8, by+8, GRID_SIZE-16, GRID_SIZE-16), 1)
-                        pygame.draw.line(screen, GB_ACCENT, (bx+4, by+GRID_SIZE-8), (bx+GRID_SIZE-8, by+8), 2)
-                    elif shape_id == 6:  # Z
-                        pygame.draw.rect(screen, GB_ACCENT, (bx+8, by+8, GRID_SIZE-16, GRID_SIZE-16), 1)
-                        pygame.draw.line(screen, GB_ACCENT, (bx+4, by+8), (bx+GRID_SIZE-8, by+GRID_SIZE-8), 2)
-                else:
-                    pygame.draw.rect(screen, GRAY, (bx, by, GRID_SIZE, GRID_SIZE), 1)
+    def playing(self):
+        # Gra trwa, dopóki nie przegra ten gracz albo (w versus) przeciwnik
+        return not self.game_over and not (self.versus and self.versus.finished())
+
+    def start_demo(self):
+        self.autoplay = True
+        self.demo = True
+        self.reset_game()
+
+    def stop_demo(self):
+        self.autoplay = False
+        self.demo = False
+
+
+    def handle_engine_events(self):
+        # Zdarzenia z kroków logiki tej klatki; opóźnienie dźwięku liczone od odczytu wejścia (frame_ns).
+        # W versus raz na klatkę wymiana z przeciwnikiem: zmiany planszy i atak wychodzą, śmieci przychodzą.
+        events = self.drain_events()
+        if self.versus:
+            self.versus.update(events)
+        for event in events:
+            if event[0] == EVENT_LOCK:
+                self.shake_frames = 3
+                audio.play("drop", self.frame_ns)
+            elif event[0] == EVENT_CLEAR:
+                audio.play("clear", self.frame_ns)
+        audio.flush()
+
+    def flash_phase(self):
+        # Która faza mignięcia czyszczonych linii: 0 - białe, 1 - kolor tła
+        elapsed_ms = (self.clear_delay - self.clear_timer) * TIME_UNIT_MS
+        return int(elapsed_ms // LINE_CLEAR_BLINK_MS) % 2
+
+    def board_cells(self):
+        # Zajęte komórki dla render_board_cells (puste są częścią statycznej warstwy). Czyszczone linie
+        # migają: faza 0 - kafelek mignięcia, faza 1 - kafelek I.
+        if not self.clearing_rows:
+            return b"".join(self.grid)
+        flash = bytes([BOARD_FLASH + 1 if self.flash_phase() == 0 else 1]) * GRID_WIDTH
+        return b"".join(flash if y in self.clearing_rows else row for y, row in enumerate(self.grid))
+
+    def draw_empty_grid(self, margin_left, margin_top, surface=None):
+        if surface is None:
+            surface = screen
+        empty = cell_sprite("empty")
+        surface.blits([
+            (empty, (margin_left + x * GRID_SIZE, margin_top + y * GRID_SIZE))
+            for y in range(GRID_HEIGHT)
+            for x in range(GRID_WIDTH)
+        ], doreturn=False)
     
     def draw_block(self, block, margin_left, margin_top, x_offset=0, y_offset=0):
-        def get_shape_id(shape):
-            for idx, s in enumerate(SHAPES):
-                if len(shape) == len(s) and len(shape[0]) == len(s[0]):
-                    if all([row == srow for row, srow in zip(shape, s)]):
-                        return idx
-            shape_sum = sum(sum(row) for row in shape)
-            for idx, s in enumerate(SHAPES):
-                if shape_sum == sum(sum(row) for row in s):
-                    return idx
-            return -1
-
-        shape_id = get_shape_id(block.shape)
-        color = COLORS[shape_id] if shape_id != -1 else GB_BLOCK
-
-        for y, row in enumerate(block.shape):
-            for x, cell in enumerate(row):
-                if cell:
-                    bx = margin_left + (block.x + x + x_offset) * GRID_SIZE
-                    by = margin_top + (block.y + y + y_offset) * GRID_SIZE
-
-                    pygame.draw.rect(screen, (100, 70, 130), (bx+4, by+4, GRID_SIZE, GRID_SIZE), border_radius=6)
-                    pygame.draw.rect(screen, color, (bx, by, GRID_SIZE, GRID_SIZE), border_radius=6)
-                    pygame.draw.rect(screen, GB_ACCENT, (bx, by, GRID_SIZE, GRID_SIZE), 4, border_radius=6)
-
-        shape_id = get_shape_id(block.shape)
-        for y, row in enumerate(block.shape):
-            for x, cell in enumerate(row):
-                if cell:
-                    bx = margin_left + (block.x + x + x_offset) * GRID_SIZE
-                    by = margin_top + (block.y + y + y_offset) * GRID_SIZE
-
-                    pygame.draw.rect(screen, GB_GRID, (bx, by, GRID_SIZE, GRID_SIZE))
-                    pygame.draw.rect(screen, GB_BLOCK, (bx+4, by+4, GRID_SIZE-8, GRID_SIZE-8))
-                    pygame.draw.rect(screen, GB_BG, (bx+10, by+10, GRID_SIZE-20, GRID_SIZE-20))
-                    pygame.draw.rect(screen, GB_ACCENT, (bx, by, GRID_SIZE, GRID_SIZE), 2)
-
-
-                    if shape_id == 0: 
-                        pygame.draw.rect(screen, GB_ACCENT, (bx+8, by+8, GRID_SIZE-16, GRID_SIZE-16), 2)
-                    elif shape_id == 1: 
-                        pygame.draw.rect(screen, GB_ACCENT, (bx+6, by+6, GRID_SIZE-12, GRID_SIZE-12), 2)
-                        pygame.draw.rect(screen, GB_ACCENT, (bx+12, by+12, GRID_SIZE-24, GRID_SIZE-24), 1)
-                    elif shape_id == 2: 
-                        pygame.draw.rect(screen, GB_ACCENT, (bx+8, by+8, GRID_SIZE-16, GRID_SIZE-16), 1)
-                        pygame.draw.circle(screen, GB_ACCENT, (bx+GRID_SIZE//2, by+GRID_SIZE//2), 3)
-                    elif shape_id == 3: 
-                        pygame.draw.rect(screen, GB_ACCENT, (bx+8, by+8, GRID_SIZE-16, GRID_SIZE-16), 1)
-                        pygame.draw.line(screen, GB_ACCENT, (bx+GRID_SIZE-8, by+GRID_SIZE-8), (bx+GRID_SIZE-8, by+GRID_SIZE//2), 2)
-                        pygame.draw.line(screen, GB_ACCENT, (bx+GRID_SIZE-8, by+GRID_SIZE-8), (bx+GRID_SIZE//2, by+GRID_SIZE-8), 2)
-                    elif shape_id == 4: 
-                        pygame.draw.rect(screen, GB_ACCENT, (bx+8, by+8, GRID_SIZE-16, GRID_SIZE-16), 1)
-                        pygame.draw.line(screen, GB_ACCENT, (bx+8, by+GRID_SIZE-8), (bx+GRID_SIZE//2, by+GRID_SIZE-8), 2)
-                        pygame.draw.line(screen, GB_ACCENT, (bx+8, by+GRID_SIZE-8), (bx+8, by+GRID_SIZE//2), 2)
-                    elif shape_id == 5:  
-                        pygame.draw.rect(screen, GB_ACCENT, (bx+8, by+8, GRID_SIZE-16, GRID_SIZE-16), 1)
-                        pygame.draw.line(screen, GB_ACCENT, (bx+4, by+GRID_SIZE-8), (bx+GRID_SIZE-8, by+8), 2)
-                    elif shape_id == 6:  
-                        pygame.draw.rect(screen, GB_ACCENT, (bx+8, by+8, GRID_SIZE-16, GRID_SIZE-16), 1)
-                        pygame.draw.line(screen, GB_ACCENT, (bx+4, by+8), (bx+GRID_SIZE-8, by+GRID_SIZE-8), 2)
-    
-    def draw_hold_block(self, margin_left, margin_top):
-        font = pygame.font.Font(tetris_font_path, 28)
-        hold_text = font.render('Hold', True, BLACK)
-        panel_x = margin_left + GRID_WIDTH * GRID_SIZE + 60
-        panel_y = margin_top + 400
-        panel_w = SIDEBAR_WIDTH - 100
-        panel_h = 200
+        shadow = cell_sprite("shadow")
+        tile = cell_sprite("active", block.shape_id)
+        positions = [
+            (margin_left + (block.x + x + x_offset) * GRID_SIZE, margin_top + (block.y + y + y_offset) * GRID_SIZE)
+            for x, y in block.piece.cells
+        ]
+        # Najpierw wszystkie cienie, potem kafelki, żeby cień nie wchodził na sąsiednie komórki
+        screen.blits([(shadow, (bx+4, by+4)) for bx, by in positions], doreturn=False)
+        screen.blits([(tile, pos) for pos in positions], doreturn=False)
+
+    def draw_ghost(self, block, margin_left, margin_top):
+        # Miejsce lądowania: odległość zrzutu z profilu powierzchni silnika, bez pętli po wierszach
+        distance = self.drop_distance(block)
+        if distance == 0:
+            return
+        ghost = cell_sprite("ghost")
+        screen.blits([
+            (ghost, (margin_left + (block.x + x) * GRID_SIZE, margin_top + (block.y + y + distance) * GRID_SIZE))
+            for x, y in block.piece.cells
+        ], doreturn=False)
+
+    def next_panel_rect(self, margin_left, margin_top):
+        return pygame.Rect(margin_left + GRID_WIDTH * GRID_SIZE + 60, margin_top + 200, SIDEBAR_WIDTH - 100, 150)
 
-        pygame.draw.rect(screen, BLACK, (panel_x-16, panel_y-16, panel_w+32, panel_h+32), 2, border_radius=18)
-        pygame.draw.rect(screen, WHITE, (panel_x, panel_y, panel_w, panel_h), 0, border_radius=14)
+    def hold_panel_rect(self, margin_left, margin_top):
+        return pygame.Rect(margin_left + GRID_WIDTH * GRID_SIZE + 60, margin_top + 400, SIDEBAR_WIDTH - 100, 200)
 
-        text_rect = hold_text.get_rect(center=(panel_x + panel_w//2, panel_y + 28))
-        screen.blit(hold_text, text_rect)
+    def draw_preview_panel(self, panel, title, surface=None):
+        if surface is None:
+            surface = screen
+        font = get_font(tetris_font_path, 28)
+        title_text = render_text(title, font, BLACK)
+        pygame.draw.rect(surface, BLACK, panel.inflate(32, 32), 2, border_radius=18)
+        pygame.draw.rect(surface, WHITE, panel, 0, border_radius=14)
+        text_rect = title_text.get_rect(center=(panel.centerx, panel.y + 28))
+        surface.blit(title_text, text_rect)
+
+    def draw_preview_block(self, panel, piece, shape_id):
+        block_width = piece.width * GRID_SIZE
+        block_height = piece.height * GRID_SIZE
+
+        y_offset = panel.y + 80 + (panel.h - 100 - block_height) // 2
+        x_offset = panel.x + (panel.w - block_width) // 2
+
+        tile = cell_sprite("preview", shape_id)
+        screen.blits([
+            (tile, (x_offset + x * GRID_SIZE, y_offset + y * GRID_SIZE))
+            for x, y in piece.cells
+        ], doreturn=False)
 
+    def draw_hold_block(self, margin_left, margin_top):
         if self.hold_block:
-            shape_id = None
-            for idx, s in enumerate(SHAPES):
-                if self.hold_block.shape == s:
-                    shape_id = idx
-                    break
-            if shape_id is None:
-                for idx, color in enumerate(COLORS):
-                    if self.hold_block.color == color:
-                        shape_id = idx
-                        break
-            base_shape = SHAPES[shape_id] if shape_id is not None else self.hold_block.shape
-            block_width = len(base_shape[0]) * GRID_SIZE
-            block_height = len(base_shape) * GRID_SIZE
-
-            y_offset = panel_y + 80 + (panel_h - 100 - block_height) // 2
-            x_offset = panel_x + (panel_w - block_width) // 2
-
-            for y, row in enumerate(base_shape):
-                for x, cell in enumerate(row):
-                    if cell:
-                        pygame.draw.rect(
-                            screen,
-                            self.hold_block.color,
-                            [x_offset + x * GRID_SIZE, y_offset + y * GRID_SIZE, GRID_SIZE, GRID_SIZE],
-                            0
-                        )
-                        pygame.draw.rect(
-                            screen,
-                            BLACK,
-                            [x_offset + x * GRID_SIZE, y_offset + y * GRID_SIZE, GRID_SIZE, GRID_SIZE],
-                            2
-                        )
-
-    def draw_board_gradient(self, margin_left, margin_top):
+            shape_id = self.hold_block.shape_id
+            self.draw_preview_block(self.hold_panel_rect(margin_left, margin_top), PIECES[shape_id][0], shape_id)
+
+    def draw_next_block(self, margin_left, margin_top):
+        block = self.next_block
+        self.draw_preview_block(self.next_panel_rect(margin_left, margin_top), block.piece, block.shape_id)
+
+    def draw_board_gradient(self, margin_left, margin_top, surface=None):
+        if surface is None:
+            surface = screen
         top_color = GB_BG   
         bottom_color = GB_GRID   
 
@@ -705,23 +1377,25 @@ class Game:
             g = int(top_color[1] * (1 - ratio) + bottom_color[1] * ratio)
             b = int(top_color[2] * (1 - ratio) + bottom_color[2] * ratio)
             pygame.draw.line(
-                screen,
+                surface,
                 (r, g, b),
                 (margin_left, margin_top + i),
                 (margin_left + GRID_WIDTH * GRID_SIZE - 1, margin_top + i)
             )
 
     
-    def draw_left_panel(self, margin_left, margin_top):
+    def draw_left_panel(self, margin_left, margin_top, surface=None):
+            if surface is None:
+                surface = screen
             panel_x = margin_left - SIDEBAR_WIDTH
             panel_y = margin_top
             panel_w = SIDEBAR_WIDTH + 100
             panel_h = GRID_HEIGHT * GRID_SIZE
 
-            pygame.draw.rect(screen, BLACK, (panel_x, panel_y, panel_w, panel_h), 3, border_radius=12)
+            pygame.draw.rect(surface, BLACK, (panel_x, panel_y, panel_w, panel_h), 3, border_radius=12)
 
             try:
-                controls_font = pygame.font.Font(tetris_font_path, 15)
+                controls_font = get_font(tetris_font_path, 15)
             except Exception:
                 controls_font = pygame.font.SysFont('comicsans', 20)
             controls = [
@@ -734,159 +1408,355 @@ class Game:
                 "ESC -  pause"
             ]
             for i, line in enumerate(controls):
-                text = controls_font.render(line, True, BLACK)
-                screen.blit(text, (panel_x + 20, panel_y + 22 + i * 34))
-
-
-    def draw(self, margin_left, margin_top, show_current_block=True):
-        shake_x, shake_y = 0, 0
-        if getattr(self, 'shake_frames', 0) > 0:
-            shake_x = random.randint(-6, 6)
-            shake_y = random.randint(-6, 6)
-            self.shake_frames -= 1
-        margin_left += shake_x
-        margin_top += shake_y
-
-        screen.fill(WHITE)
-        border_width = 10
-        pygame.draw.rect(screen, BLACK, [margin_left - border_width, margin_top, border_width, GRID_HEIGHT * GRID_SIZE])
-        pygame.draw.rect(screen, BLACK, [margin_left + GRID_WIDTH * GRID_SIZE, margin_top, border_width, GRID_HEIGHT * GRID_SIZE])
-        self.draw_left_panel(margin_left, margin_top)
-        self.draw_board_gradient(margin_left, margin_top)
-        self.draw_grid(margin_left, margin_top)
-        if show_current_block:
-            self.draw_block(self.current_block, margin_left, margin_top)
+                text = render_text(line, controls_font, BLACK)
+                surface.blit(text, (panel_x + 20, panel_y + 22 + i * 34))
+
+    def opponent_rect(self, margin_left, margin_top):
+        # Plansza przeciwnika w lewym panelu, komórki o połowę mniejsze
+        cell = GRID_SIZE // 2
+        return pygame.Rect(margin_left - SIDEBAR_WIDTH + 60, margin_top + 90, GRID_WIDTH * cell, GRID_HEIGHT * cell)
+
+    def opponent_text_rect(self, margin_left, margin_top):
+        board = self.opponent_rect(margin_left, margin_top)
+        return pygame.Rect(board.x, board.bottom + 16, SIDEBAR_WIDTH - 80, 130)
+
+    def draw_opponent_panel(self, margin_left, margin_top, surface):
+        # Statyczna część lewego panelu w versus: ramka, napis i tło planszy przeciwnika
+        panel_x = margin_left - SIDEBAR_WIDTH
+        pygame.draw.rect(surface, BLACK, (panel_x, margin_top, SIDEBAR_WIDTH + 100, GRID_HEIGHT * GRID_SIZE), 3, border_radius=12)
+        title = render_text("Opponent", score_font, BLACK)
+        surface.blit(title, (panel_x + 60, margin_top + 30))
+        board = self.opponent_rect(margin_left, margin_top)
+        pygame.draw.rect(surface, WHITE, board)
+        pygame.draw.rect(surface, BLACK, board.inflate(8, 8), 4)
+
+    def draw_opponent(self, margin_left, margin_top):
+        remote = self.versus.remote
+        board = self.opponent_rect(margin_left, margin_top)
+        cell = board.w // GRID_WIDTH
+        sprites = [
+            (cell_sprite("remote", value - 1), (board.x + x * cell, board.y + y * cell))
+            for y, row in enumerate(remote.grid)
+            for x, value in enumerate(row)
+            if value
+        ]
+        if remote.block and not remote.game_over:
+            x, y, shape_id, rotation = remote.block
+            tile = cell_sprite("remote", shape_id)
+            sprites.extend(
+                (tile, (board.x + (x + cx) * cell, board.y + (y + cy) * cell))
+                for cx, cy in PIECES[shape_id][rotation].cells
+                if y + cy >= 0
+            )
+        screen.blits(sprites, doreturn=False)
 
-        pygame.draw.rect(screen, BLACK, [margin_left + GRID_WIDTH * GRID_SIZE, margin_top, SIDEBAR_WIDTH, GRID_HEIGHT * GRID_SIZE], 2, border_radius=12)
+        text = self.opponent_text_rect(margin_left, margin_top)
+        texts = [f'Score: {remote.score}', f'Lines: {remote.lines_cleared}']
+        incoming = sum(lines for lines, hole in self.versus.pending_garbage)
+        if incoming:
+            texts.append(f'Incoming: {incoming}')
+        for i, line in enumerate(texts):
+            screen.blit(render_text(line, score_font, RED if i == 2 else BLACK), (text.x, text.y + i * 40))
 
-        score_text = score_font.render(f'Score: {self.score}', True, BLACK)
-        level_text = score_font.render(f'Level: {self.level}', True, BLACK)
-        lines_text = score_font.render(f'Lines: {self.lines_cleared}', True, BLACK)
+    def draw_hud(self, margin_left, margin_top):
+        score_text = render_text(f'Score: {self.score}', score_font, BLACK)
+        level_text = render_text(f'Level: {self.level}', score_font, BLACK)
+        lines_text = render_text(f'Lines: {self.lines_cleared}', score_font, BLACK)
 
         screen.blit(score_text, [margin_left + GRID_WIDTH * GRID_SIZE + 20, margin_top + 20])
         screen.blit(level_text, [margin_left + GRID_WIDTH * GRID_SIZE + 20, margin_top + 60])
         screen.blit(lines_text, [margin_left + GRID_WIDTH * GRID_SIZE + 20, margin_top + 100])
 
-        self.draw_next_block(margin_left, margin_top)
-        self.draw_hold_block(margin_left, margin_top)
-        _apply_scanlines(screen)
-        _apply_pixelation(screen, "minimum")
-        _apply_flicker(screen)
-        _apply_glow(screen)
-        _add_glitch_effect(screen.get_height(), screen.get_width(), screen, "maximum")
-        _add_rolling_static(screen, screen.get_height(), screen.get_width(), "minimum")
-        render_fisheye_gl(fisheye_ctx, fisheye_prog, fisheye_vao, fisheye_texture, screen, distortion=0.15)
-
-        draw_s_cursor(screen, pygame.mouse.get_pos())
-
-        
+    def hud_rect(self, margin_left, margin_top):
+        # Trzy linie draw_hud do prawej krawędzi ekranu - dłuższy wynik nie wychodzi poza obszar, który jest zmazywany
+        x = margin_left + GRID_WIDTH * GRID_SIZE + 20
+        return pygame.Rect(x, margin_top + 20, screen.get_width() - x, 80 + score_font.get_linesize())
 
+    def get_static_layer(self, margin_left, margin_top):
+        # Wszystko, co zmienia się tylko przy zmianie motywu albo marginesów
+        key = (current_theme_idx, GRID_SIZE, margin_left, margin_top, screen.get_size(), bool(self.versus))
+        if self.static_layer_key == key:
+            return self.static_layer
 
-    def draw_next_block(self, margin_left, margin_top):
-        font = pygame.font.Font(tetris_font_path, 28)
-        next_text = font.render('Next', True, BLACK)
-        panel_x = margin_left + GRID_WIDTH * GRID_SIZE + 60 
-        panel_y = margin_top + 200  
-        panel_w = SIDEBAR_WIDTH - 100 
-        panel_h = 150  
+        layer = pygame.Surface(screen.get_size())
+        layer.fill(WHITE)
+        border_width = 10
+        pygame.draw.rect(layer, BLACK, [margin_left - border_width, margin_top, border_width, GRID_HEIGHT * GRID_SIZE])
+        pygame.draw.rect(layer, BLACK, [margin_left + GRID_WIDTH * GRID_SIZE, margin_top, border_width, GRID_HEIGHT * GRID_SIZE])
+        if self.versus:
+            self.draw_opponent_panel(margin_left, margin_top, layer)
+        else:
+            self.draw_left_panel(margin_left, margin_top, layer)
+        self.draw_board_gradient(margin_left, margin_top, layer)
+        self.draw_empty_grid(margin_left, margin_top, layer)
+        pygame.draw.rect(layer, BLACK, [margin_left + GRID_WIDTH * GRID_SIZE, margin_top, SIDEBAR_WIDTH, GRID_HEIGHT * GRID_SIZE], 2, border_radius=12)
+        self.draw_preview_panel(self.next_panel_rect(margin_left, margin_top), 'Next', layer)
+        self.draw_preview_panel(self.hold_panel_rect(margin_left, margin_top), 'Hold', layer)
+
+        self.static_layer = layer
+        self.static_layer_key = key
+        self.invalidate_layers()
+        return layer
+
+    def invalidate_layers(self):
+        # Wymusza pełne złożenie następnej klatki (np. po ekranie pauzy)
+        self.layer_signatures = {}
+        self.layer_offset = None
+
+    def layer_regions(self, margin_left, margin_top, show_current_block):
+        # Obszar ekranu, stan, od którego zależy jego zawartość, i funkcja rysująca
+        # Na płótnie plansza to tylko spadający klocek z cieniem, grid zmienia miejsce cienia
+        block = self.current_block
+        board_state = (
+            b"".join(self.grid),
+            (block.x, block.y, block.shape_id, block.rotation) if show_current_block else None,
+        )
+        hold = self.hold_block
+        regions = {
+            # +4 na cień spadającego klocka; od górnej krawędzi ekranu, bo klocek bywa nad wierszem 0
+            # (po hold y -= 1 albo wypchnięty przez linie śmieci) i jego komórki trzeba potem zmazać
+            "board": (
+                pygame.Rect(margin_left, 0, GRID_WIDTH * GRID_SIZE + 4, margin_top + GRID_HEIGHT * GRID_SIZE + 4),
+                board_state,
+                lambda ml, mt: self.draw_board(ml, mt, show_current_block),
+            ),
+            "hud": (
+                self.hud_rect(margin_left, margin_top),
+                (self.score, self.level, self.lines_cleared),
+                self.draw_hud,
+            ),
+            "next": (
+                self.next_panel_rect(margin_left, margin_top).inflate(32, 32),
+                (self.next_block.shape_id, self.next_block.rotation),
+                self.draw_next_block,
+            ),
+            "hold": (
+                self.hold_panel_rect(margin_left, margin_top).inflate(32, 32),
+                hold.shape_id if hold else None,
+                self.draw_hold_block,
+            ),
+        }
+        if self.versus:
+            remote = self.versus.remote
+            regions["opponent"] = (
+                self.opponent_rect(margin_left, margin_top).inflate(8, 8).union(self.opponent_text_rect(margin_left, margin_top)),
+                (b"".join(remote.grid), remote.block, remote.score, remote.lines_cleared, remote.game_over,
+                 sum(lines for lines, hole in self.versus.pending_garbage)),
+                self.draw_opponent,
+            )
+        return regions
 
-        pygame.draw.rect(screen, BLACK, (panel_x-16, panel_y-16, panel_w+32, panel_h+32), 2, border_radius=18)
-        pygame.draw.rect(screen, WHITE, (panel_x, panel_y, panel_w, panel_h), 0, border_radius=14)
+    def draw_board(self, margin_left, margin_top, show_current_block=True):
+        # Zablokowane komórki dorysowuje GPU (render_board_cells), tu tylko spadający klocek
+        if show_current_block:
+            if SHOW_GHOST:
+                self.draw_ghost(self.current_block, margin_left, margin_top)
+            self.draw_block(self.current_block, margin_left, margin_top)
 
-        text_rect = next_text.get_rect(center=(panel_x + panel_w//2, panel_y + 28))
-        screen.blit(next_text, text_rect)
+    def compose_frame(self, margin_left, margin_top, show_current_block=True):
+        shake_x, shake_y = 0, 0
+        if getattr(self, 'shake_frames', 0) > 0:
+            shake_x = random.randint(-6, 6)
+            shake_y = random.randint(-6, 6)
+            self.shake_frames -= 1
+        offset = (shake_x, shake_y)
+
+        with profiler.stage("static_layer"):
+            static_layer = self.get_static_layer(margin_left, margin_top)
+        regions = self.layer_regions(margin_left, margin_top, show_current_block)
+        dirty_rects = []
+        if offset != self.layer_offset:
+            # Wstrząs przesuwa wszystkie warstwy naraz - składamy całą klatkę z przesunięciem
+            screen.fill(WHITE)
+            screen.blit(static_layer, offset)
+            for name, (rect, state, draw) in regions.items():
+                with profiler.stage(name):
+                    draw(margin_left + shake_x, margin_top + shake_y)
+            dirty_rects.append(screen.get_rect())
+        else:
+            for name, (rect, state, draw) in regions.items():
+                if self.layer_signatures.get(name) == state:
+                    continue
+                with profiler.stage(name):
+                    screen.blit(static_layer, rect, rect)
+                    draw(margin_left, margin_top)
+                dirty_rects.append(rect)
+
+        self.layer_offset = offset
+        self.board_origin = (margin_left + shake_x, margin_top + shake_y)
+        self.layer_signatures = {name: state for name, (rect, state, draw) in regions.items()}
+        return dirty_rects
 
-        block = self.next_block
-        block_width = len(block.shape[0]) * GRID_SIZE
-        block_height = len(block.shape) * GRID_SIZE
-
-        y_offset = panel_y + 80 + (panel_h - 100 - block_height) // 2
-        x_offset = panel_x + (panel_w - block_width) // 2
-
-        for y, row in enumerate(block.shape):
-            for x, cell in enumerate(row):
-                if cell:
-                    pygame.draw.rect(
-                        screen,
-                        block.color,
-                        [x_offset + x * GRID_SIZE, y_offset + y * GRID_SIZE, GRID_SIZE, GRID_SIZE],
-                        0
-                    )
-                    pygame.draw.rect(
-                        screen,
-                        BLACK,
-                        [x_offset + x * GRID_SIZE, y_offset + y * GRID_SIZE, GRID_SIZE, GRID_SIZE],
-                        2
-                    )
+    def draw(self, margin_left, margin_top, show_current_block=True):
+        # Zablokowany klocek jest już w planszy, następny pojawia się po animacji
+        show_current_block = show_current_block and not self.clearing_rows
+        dirty_rects = self.compose_frame(margin_left, margin_top, show_current_block)
+        render_fisheye_gl(fisheye_ctx, fisheye_prog, fisheye_vao, fisheye_texture, screen, distortion=0.15, effects=CRT_EFFECTS,
+                          dirty_rects=dirty_rects, board=(self.board_cells(), self.board_origin))
 
     
-    def run(self):
-        fall_time = 0
-        paused = False
-        started = False
-
-        while not self.game_over:
-            if not paused:
-                fall_time += clock.get_rawtime() / 200
-            clock.tick(FPS)
-
-            for event in pygame.event.get():
+    def run(self, paused=False):
+        self.invalidate_layers()
+        if paused:
+            draw_pause()
+        # Czas spędzony w menu nie trafia do gry
+        self.controls.clear()
+        accumulator = 0.0
+        frame_start = time.perf_counter_ns()
+
+        while self.playing():
+            # Zamiast spać w clock.tick czekamy na zdarzenia do końca klatki - każde ma czas odczytu
+            fps = render_fps()
+            deadline = frame_start + (1_000_000_000 // fps if fps else 0)
+            if paused and POWER_SAVING:
+                events = pump_events(deadline, frame_start + IDLE_FRAME_MS * 1_000_000)
+            else:
+                events = pump_events(deadline)
+            now = time.perf_counter_ns()
+            accumulator += min((now - frame_start) / 1e6, MAX_FRAME_MS)
+            frame_start = self.frame_ns = now
+            pause_changed = False
+
+            for t_ns, event in events:
+                if event.type in FOCUS_LOST_EVENTS and PAUSE_ON_FOCUS_LOSS:
+                    wait_until_visible()
+                    if self.demo:
+                        return 'menu'
+                    paused = True
+                    pause_changed = True
+                    self.controls.clear()
+                    frame_start = time.perf_counter_ns()
+                    accumulator = 0.0
+                    break
                 if event.type == pygame.QUIT:
+                    if not self.demo and not self.versus:
+                        self.suspend()
+                    self.finish_replay()
+                    stop_capture()
                     pygame.quit()
                     sys.exit()
+                if self.demo and event.type in (pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN):
+                    return 'menu'
                 if paused:
-                    resume_button.check_hover(pygame.mouse.get_pos())
-                    pause_restart_button.check_hover(pygame.mouse.get_pos())
-                    pause_quit_button.check_hover(pygame.mouse.get_pos())
+                    resume_button.check_hover(canvas_mouse_pos())
+                    pause_restart_button.check_hover(canvas_mouse_pos())
+                    pause_quit_button.check_hover(canvas_mouse_pos())
+                    pause_changed = True
                     if event.type == pygame.MOUSEBUTTONDOWN:
-                        if resume_button.is_clicked(pygame.mouse.get_pos(), event):
+                        if resume_button.is_clicked(canvas_mouse_pos(), event):
                             paused = False
-                        if pause_restart_button.is_clicked(pygame.mouse.get_pos(), event):
-                            self.reset_game()
+                        if pause_restart_button.is_clicked(canvas_mouse_pos(), event) and not self.versus:
+                            self.restart_from_checkpoint()
                             paused = False
-                            started = False
-                            break 
-                        if pause_quit_button.is_clicked(pygame.mouse.get_pos(), event):
+                            break
+                        if pause_quit_button.is_clicked(canvas_mouse_pos(), event):
+                            self.finish_replay()
                             return 'menu'
                     if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
                         paused = False
-                    draw_pause()
-                    break
+                    continue
 
                 if event.type == pygame.KEYDOWN:
-                    if not paused and event.key in [pygame.K_LEFT, pygame.K_RIGHT, pygame.K_DOWN, pygame.K_UP, pygame.K_SPACE, pygame.K_q]:
-                        started = True
-
-                    if event.key == pygame.K_LEFT and not paused and self.valid_move(self.current_block, -1, 0):
-                        self.current_block.x -= 1
-                    if event.key == pygame.K_RIGHT and not paused and self.valid_move(self.current_block, 1, 0):
-                        self.current_block.x += 1
-                    if event.key == pygame.K_DOWN and not paused and self.valid_move(self.current_block, 0, 1):
-                        self.current_block.y += 1
-                    if event.key == pygame.K_UP and not paused:
-                        self.rotate_block()
-                    if event.key == pygame.K_SPACE and not paused:
-                        while self.valid_move(self.current_block, 0, 1):
-                            self.current_block.y += 1
-                        self.lock_block()
-                    if event.key == pygame.K_q and not paused:
-                        self.hold_current_block()
+                    if event.key in KEY_ACTIONS:
+                        self.controls.press(KEY_ACTIONS[event.key], t_ns / 1e6)
                     if event.key == pygame.K_ESCAPE:
-                            paused = True
+                        paused = True
+                        pause_changed = True
+                    elif event.key == pygame.K_BACKSPACE:
+                        self.undo()
+                        self.controls.clear()
+                    elif event.key == pygame.K_F2:
+                        self.autoplay = not self.autoplay
+                        self.bot_driver.reset()
+                    elif event.key == pygame.K_F3:
+                        profiler.set_enabled(not profiler.enabled)
+                        gpu_timer.reset()
+                        self.invalidate_layers()
+                    elif event.key == pygame.K_F4 and profiler.trace:
+                        profiler.export_chrome_trace(PROFILE_TRACE_PATH)
+                    elif event.key == pygame.K_F5:
+                        toggle_capture()
+                elif event.type == pygame.KEYUP and event.key in KEY_ACTIONS:
+                    self.controls.release(KEY_ACTIONS[event.key], t_ns / 1e6)
+
+            # Ekran pauzy rysowany raz na klatkę, po obsłużeniu wszystkich zdarzeń
+            if pause_changed:
+                self.invalidate_layers()
+                if paused:
+                    draw_pause()
 
             if paused:
+                # Akcje sprzed naciśnięcia ESC nadal się liczą, grawitacja stoi w pauzie;
+                # przytrzymane klawisze po pauzie trzeba nacisnąć od nowa
+                inputs = self.controls.take(now / 1e6, flush=True)
+                self.controls.clear()
+                if self.recorder:
+                    self.recorder.record(inputs, elapsed=False)
+                self.step(inputs, 0)
+                accumulator = 0.0
+                self.handle_engine_events()
                 continue
 
-            if fall_time >= self.fall_speed:
-                fall_time = 0
-                if self.valid_move(self.current_block, 0, 1):
-                    self.current_block.y += 1
-                else:
-                    self.lock_block()
+            # Zaległe kroki logiki; każdy dostaje zdarzenia ze swojego przedziału czasu i powtórzenia
+            # przytrzymanych klawiszy (DAS/ARR), ostatni także wszystko, co przyszło później w tej klatce.
+            # Jeśli żaden krok nie przypadł, zdarzenia czekają na następny.
+            with profiler.stage("logic"):
+                step_end = now / 1e6 - accumulator + LOGIC_STEP_MS
+                while accumulator >= LOGIC_STEP_MS and self.playing():
+                    inputs = self.controls.take(step_end, flush=accumulator < 2 * LOGIC_STEP_MS)
+                    if self.current_block is not self.undo_block:
+                        # Nowy klocek - stan sprzed jego ruchów trafia do historii cofania
+                        self.undo_ring.push(self)
+                        self.undo_block = self.current_block
+                    if self.autoplay:
+                        inputs = inputs + self.bot_driver.inputs(self, LOGIC_STEP_MS)
+                    if self.recorder:
+                        self.recorder.record(inputs)
+                    self.step(inputs, LOGIC_STEP_MS / TIME_UNIT_MS)
+                    accumulator -= LOGIC_STEP_MS
+                    step_end += LOGIC_STEP_MS
+            self.handle_engine_events()
+
             margin_left, margin_top = get_margins()
             self.draw(margin_left, margin_top)
+            self.controls.presented(time.perf_counter_ns() / 1e6)
+        self.finish_replay()
         return 'game_over'
 
+    def watch_replay(self, path):
+        # Powtórka w normalnym tempie przez zwykłe rysowanie; strzałki przewijają, ESC kończy
+        self.finish_replay()
+        self.replaying = True
+        player = ReplayPlayer(Replay(path), engine=self)
+        step_ms = 1000 / player.replay.logic_hz
+        seek_ticks = REPLAY_SEEK_SECONDS * player.replay.logic_hz
+        clock.tick()
+        accumulator = 0.0
+        try:
+            while True:
+                accumulator += min(clock.tick(render_fps()), MAX_FRAME_MS)
+                self.frame_ns = time.perf_counter_ns()
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        return
+                    if event.type == pygame.KEYDOWN:
+                        if event.key == pygame.K_ESCAPE:
+                            return
+                        if event.key == pygame.K_RIGHT:
+                            player.seek(player.tick + seek_ticks)
+                        elif event.key == pygame.K_LEFT:
+                            player.seek(max(0, player.tick - seek_ticks))
+                while accumulator >= step_ms and not player.finished():
+                    player.step()
+                    accumulator -= step_ms
+                self.handle_engine_events()
+
+                margin_left, margin_top = get_margins()
+                self.draw(margin_left, margin_top)
+        finally:
+            self.replaying = False
+            self.forced_pieces = None
+
 class Button:
     def __init__(self, x, y, width, height, text, color, hover_color, padding_x=24, padding_y=10):
         self.base_x = x
@@ -901,8 +1771,17 @@ class Button:
         self.padding_y = padding_y
         self.update_rect()
 
+    def restyle(self, x, y, width, height, color, hover_color):
+        self.base_x = x
+        self.base_y = y
+        self.base_width = width
+        self.base_height = height
+        self.color = color
+        self.hover_color = hover_color
+        self.update_rect()
+
     def update_rect(self):
-        text_surface = menu_font.render(self.text, True, BLACK)
+        text_surface = render_text(self.text, menu_font, BLACK)
         text_width, text_height = text_surface.get_size()
         btn_width = max(self.base_width, text_width + 2 * self.padding_x)
         btn_height = max(self.base_height, text_height + 2 * self.padding_y)
@@ -919,7 +1798,7 @@ class Button:
         color = self.hover_color if self.is_hovered else self.color
         pygame.draw.rect(surface, color, self.rect, border_radius=8)
         pygame.draw.rect(surface, BLACK, self.rect, 6, border_radius=8)
-        text_surface = menu_font.render(self.text, True, BLACK)
+        text_surface = render_text(self.text, menu_font, BLACK)
         text_rect = text_surface.get_rect(center=self.rect.center)
         surface.blit(text_surface, text_rect)
     
@@ -932,83 +1811,54 @@ class Button:
             return self.rect.collidepoint(pos)
         return False
 
-start_button = Button(SCREEN_WIDTH//2 - 100, 360, 200, 50, "Start", GRAY, HIGHLIGHT)
-options_button = Button(SCREEN_WIDTH//2 - 100, 470, 200, 50, "Options", GRAY, HIGHLIGHT)
-quit_button = Button(SCREEN_WIDTH//2 - 100, 580, 200, 50, "Quit", GRAY, HIGHLIGHT)
-
-restart_button = Button(SCREEN_WIDTH//2 - 100, 350, 200, 50, "Play Again", GRAY, HIGHLIGHT)
-menu_button = Button(SCREEN_WIDTH//2 - 100, 470, 200, 50, "Main Menu", GRAY, HIGHLIGHT)
+def draw_pause():
+    with profiler.stage("draw_pause"):
+        screen.fill(WHITE)
+        pause_font = get_font(tetris_font_path, 80)
+        pause_text = render_text('PAUSE', pause_font, RED)
+        pause_rect = pause_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 100))
+        screen.blit(pause_text, pause_rect)
+        resume_button.draw(screen)
+        pause_quit_button.draw(screen)
+        pause_restart_button.draw(screen)
+        draw_s_cursor(screen, canvas_mouse_pos())
 
-resume_button = Button(SCREEN_WIDTH//2 - 100, SCREEN_HEIGHT//2, 200, 50, "Resume", GRAY, HIGHLIGHT)
-pause_restart_button = Button(SCREEN_WIDTH//2 - 100, SCREEN_HEIGHT//2 + 80, 200, 50, "Restart", GRAY, HIGHLIGHT)
-pause_quit_button = Button(SCREEN_WIDTH//2 - 100, SCREEN_HEIGHT//2 + 160, 200, 50, "Quit to Menu", GRAY, HIGHLIGHT)
+    render_fisheye_gl(fisheye_ctx, fisheye_prog, fisheye_vao, fisheye_texture, screen, distortion=0.15, effects=CRT_EFFECTS)
 
-def draw_pause():
-    screen.fill(WHITE)
-    pause_font = pygame.font.Font(tetris_font_path, 80)
-    pause_text = pause_font.render('PAUSE', True, RED)
-    pause_rect = pause_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 100))
-    screen.blit(pause_text, pause_rect)
-    resume_button.draw(screen)
-    pause_quit_button.draw(screen)
-    pause_restart_button.draw(screen)
-    draw_s_cursor(screen, pygame.mouse.get_pos())
 
-    _apply_scanlines(screen)
-    _apply_pixelation(screen, "minimum")
-    _apply_flicker(screen)
-    _apply_glow(screen)
-    _add_glitch_effect(screen.get_height(), screen.get_width(), screen, "maximum")
-    _add_rolling_static(screen, screen.get_height(), screen.get_width(), "minimum")
+def draw_menu():
+    with profiler.stage("draw_menu"):
+        screen.fill(WHITE) 
 
-    render_fisheye_gl(fisheye_ctx, fisheye_prog, fisheye_vao, fisheye_texture, screen, distortion=0.15)
+        title_text = render_text('TETRIS', title_font, BLACK)
+        title_rect = title_text.get_rect(center=(SCREEN_WIDTH//2, 150))
+        screen.blit(title_text, title_rect)
 
+        start_button.draw(screen)
+        options_button.draw(screen)
+        quit_button.draw(screen)
+        draw_s_cursor(screen, canvas_mouse_pos())
 
-def draw_menu():
-    screen.fill(WHITE) 
-    
-    title_text = title_font.render('TETRIS', True, BLACK)
-    title_rect = title_text.get_rect(center=(SCREEN_WIDTH//2, 150))
-    screen.blit(title_text, title_rect)
-    
-    start_button.draw(screen)
-    options_button.draw(screen)
-    quit_button.draw(screen)
-    draw_s_cursor(screen, pygame.mouse.get_pos())
-
-    _apply_scanlines(screen)
-    _apply_pixelation(screen, "minimum")
-    _apply_flicker(screen)
-    _apply_glow(screen)
-    _add_glitch_effect(screen.get_height(), screen.get_width(), screen, "maximum")
-    _add_rolling_static(screen, screen.get_height(), screen.get_width(), "minimum")
-
-    render_fisheye_gl(fisheye_ctx, fisheye_prog, fisheye_vao, fisheye_texture, screen, distortion=0.15)
+    render_fisheye_gl(fisheye_ctx, fisheye_prog, fisheye_vao, fisheye_texture, screen, distortion=0.15, effects=CRT_EFFECTS)
     
 
-def draw_game_over(score):
-    screen.fill(WHITE)
-    
-    game_over_text = title_font.render('GAME OVER', True, RED)
-    game_over_rect = game_over_text.get_rect(center=(SCREEN_WIDTH//2, 150))
-    screen.blit(game_over_text, game_over_rect)
-    
-    score_text = menu_font.render(f'Score: {score}', True, BLACK)
-    score_rect = score_text.get_rect(center=(SCREEN_WIDTH//2, 250))
-    screen.blit(score_text, score_rect)
-    
-    restart_button.draw(screen)
-    menu_button.draw(screen)
-    draw_s_cursor(screen, pygame.mouse.get_pos())
+def draw_game_over(score, title='GAME OVER'):
+    with profiler.stage("draw_game_over"):
+        screen.fill(WHITE)
 
-    _apply_scanlines(screen)
-    _apply_pixelation(screen, "minimum")
-    _apply_flicker(screen)
-    _apply_glow(screen)
-    _add_glitch_effect(screen.get_height(), screen.get_width(), screen, "maximum")
-    _add_rolling_static(screen, screen.get_height(), screen.get_width(), "minimum")
+        game_over_text = render_text(title, title_font, RED)
+        game_over_rect = game_over_text.get_rect(center=(SCREEN_WIDTH//2, 150))
+        screen.blit(game_over_text, game_over_rect)
 
-    render_fisheye_gl(fisheye_ctx, fisheye_prog, fisheye_vao, fisheye_texture, screen, distortion=0.15)
+        score_text = render_text(f'Score: {score}', menu_font, BLACK)
+        score_rect = score_text.get_rect(center=(SCREEN_WIDTH//2, 250))
+        screen.blit(score_text, score_rect)
+
+        restart_button.draw(screen)
+        menu_button.draw(screen)
+        draw_s_cursor(screen, canvas_mouse_pos())
+
+    render_fisheye_gl(fisheye_ctx, fisheye_prog, fisheye_vao, fisheye_texture, screen, distortion=0.15, effects=CRT_EFFECTS)
 
 class Slider:
     def __init__(self, x, y, width, min_val=0.0, max_val=1.0, value=1.0):
@@ -1029,7 +1879,7 @@ class Slider:
 
     def handle_event(self, event):
         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-            mx, my = event.pos
+            mx, my = canvas_pos(event.pos)
             handle_x = int(self.x + (self.value - self.min_val) / (self.max_val - self.min_val) * self.width)
             if abs(mx-handle_x) < self.handle_radius+2 and abs(my-(self.y+self.height//2)) < self.handle_radius+2:
                 self.dragging = True
@@ -1039,78 +1889,153 @@ class Slider:
             self.dragging = False
         elif event.type == pygame.MOUSEMOTION:
             if getattr(self, 'dragging', False):
-                mx = event.pos[0]
+                mx = canvas_pos(event.pos)[0]
                 rel = (mx - self.x) / self.width
                 rel = max(0.0, min(1.0, rel))
                 self.value = self.min_val + rel * (self.max_val - self.min_val)
                 pygame.mixer.music.set_volume(self.value)
 
-back_button = Button(SCREEN_WIDTH//2 - 100, 670, 200, 50, "Back", GRAY, HIGHLIGHT)
-volume_slider = Slider(SCREEN_WIDTH//2 - 120, 350, 240, value=pygame.mixer.music.get_volume())
-drop_volume_slider = Slider(
-    SCREEN_WIDTH//2 - 120, 550, 240,
-    value=drop_sound.get_volume() if drop_sound else 1.0
-)
-theme_left_button = Button(SCREEN_WIDTH//2 - 250, 800, 60, 50, "<", GRAY, HIGHLIGHT)
-theme_right_button = Button(SCREEN_WIDTH//2 + 200, 800, 60, 50, ">", GRAY, HIGHLIGHT)
+def build_sliders():
+    global volume_slider, drop_volume_slider
+    volume_slider = Slider(SCREEN_WIDTH//2 - 120, 350, 240, value=pygame.mixer.music.get_volume())
+    drop_volume_slider = Slider(
+        SCREEN_WIDTH//2 - 120, 550, 240,
+        value=audio.volume("drop")
+    )
 
 def draw_options():
+    with profiler.stage("draw_options"):
+        screen.fill(WHITE)
+        title_text = render_text('Options', title_font, BLACK)
+        title_rect = title_text.get_rect(center=(SCREEN_WIDTH//2, 150))
+        screen.blit(title_text, title_rect)
+
+        label = render_text("Music", menu_font, BLACK)
+        label_rect = label.get_rect(center=(SCREEN_WIDTH//2, 300))
+        screen.blit(label, label_rect)
+        volume_slider.draw(screen)
+        percent = int(volume_slider.value * 100)
+        percent_text = render_text(f"{percent}%", score_font, BLACK)
+        percent_rect = percent_text.get_rect(center=(SCREEN_WIDTH//2, 400))
+        screen.blit(percent_text, percent_rect)
+
+        drop_label = render_text("Sound", menu_font, BLACK)
+        drop_label_rect = drop_label.get_rect(center=(SCREEN_WIDTH//2, 400))
+        screen.blit(drop_label, (SCREEN_WIDTH//2 - drop_label.get_width()//2, 470))
+        drop_volume_slider.draw(screen)
+        drop_percent = int(drop_volume_slider.value * 100)
+        drop_percent_text = render_text(f"{drop_percent}%", score_font, BLACK)
+        drop_percent_rect = drop_percent_text.get_rect(center=(SCREEN_WIDTH//2, 600))
+        screen.blit(drop_percent_text, drop_percent_rect)
+
+        back_button.draw(screen)
+
+        theme_label = render_text("Theme", menu_font, BLACK)
+        theme_label_rect = theme_label.get_rect(center=(SCREEN_WIDTH//2, 800))
+        screen.blit(theme_label, theme_label_rect)
+        theme_name = render_text(THEMES[current_theme_idx]["name"], score_font, BLACK)
+        theme_name_rect = theme_name.get_rect(center=(SCREEN_WIDTH//2, 850))
+        screen.blit(theme_name, theme_name_rect)
+        theme_left_button.draw(screen)
+        theme_right_button.draw(screen)
+        draw_s_cursor(screen, canvas_mouse_pos())
+
+    render_fisheye_gl(fisheye_ctx, fisheye_prog, fisheye_vao, fisheye_texture, screen, distortion=0.15, effects=CRT_EFFECTS)
+
+VERSUS_TITLES = {"win": "YOU WIN", "lose": "YOU LOSE", "left": "OPPONENT LEFT"}
+
+def connect_versus(argv):
+    # --versus-host [PORT] czeka na przeciwnika, --versus HOST[:PORT] łączy się z nim.
+    # Zwraca (sesja, ziarno) albo None, gdy gracz zrezygnował (ESC) albo połączenie się nie udało.
+    session = NetSession()
+    if "--versus-host" in argv:
+        index = argv.index("--versus-host")
+        port = int(argv[index + 1]) if index + 1 < len(argv) and argv[index + 1].isdigit() else DEFAULT_PORT
+        session.host(port)
+        message = f'Waiting for opponent on port {port}'
+        seed = random.getrandbits(63)
+    else:
+        address = parse_address(argv[argv.index("--versus") + 1])
+        session.connect(*address)
+        message = 'Connecting to {}:{}'.format(*address)
+        seed = None
+
     screen.fill(WHITE)
-    title_text = title_font.render('Options', True, BLACK)
-    title_rect = title_text.get_rect(center=(SCREEN_WIDTH//2, 150))
-    screen.blit(title_text, title_rect)
-
-    label = menu_font.render("Music", True, BLACK)
-    label_rect = label.get_rect(center=(SCREEN_WIDTH//2, 300))
-    screen.blit(label, label_rect)
-    volume_slider.draw(screen)
-    percent = int(volume_slider.value * 100)
-    percent_text = score_font.render(f"{percent}%", True, BLACK)
-    percent_rect = percent_text.get_rect(center=(SCREEN_WIDTH//2, 400))
-    screen.blit(percent_text, percent_rect)
-
-    drop_label = menu_font.render("Sound", True, BLACK)
-    drop_label_rect = drop_label.get_rect(center=(SCREEN_WIDTH//2, 400))
-    screen.blit(drop_label, (SCREEN_WIDTH//2 - drop_label.get_width()//2, 470))
-    drop_volume_slider.draw(screen)
-    drop_percent = int(drop_volume_slider.value * 100)
-    drop_percent_text = score_font.render(f"{drop_percent}%", True, BLACK)
-    drop_percent_rect = drop_percent_text.get_rect(center=(SCREEN_WIDTH//2, 600))
-    screen.blit(drop_percent_text, drop_percent_rect)
-
-    back_button.draw(screen)
-
-    theme_label = menu_font.render("Theme", True, BLACK)
-    theme_label_rect = theme_label.get_rect(center=(SCREEN_WIDTH//2, 800))
-    screen.blit(theme_label, theme_label_rect)
-    theme_name = score_font.render(THEMES[current_theme_idx]["name"], True, BLACK)
-    theme_name_rect = theme_name.get_rect(center=(SCREEN_WIDTH//2, 850))
-    screen.blit(theme_name, theme_name_rect)
-    theme_left_button.draw(screen)
-    theme_right_button.draw(screen)
-    draw_s_cursor(screen, pygame.mouse.get_pos())
-
-    _apply_scanlines(screen)
-    _apply_pixelation(screen, "minimum")
-    _apply_flicker(screen)
-    _apply_glow(screen)
-    _add_glitch_effect(screen.get_height(), screen.get_width(), screen, "maximum")
-    _add_rolling_static(screen, screen.get_height(), screen.get_width(), "minimum")
-
-    render_fisheye_gl(fisheye_ctx, fisheye_prog, fisheye_vao, fisheye_texture, screen, distortion=0.15)
-
-def main():
+    text = render_text(message, menu_font, BLACK)
+    screen.blit(text, text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2)))
+    hint = render_text('ESC - cancel', score_font, BLACK)
+    screen.blit(hint, hint.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 80)))
+    render_fisheye_gl(fisheye_ctx, fisheye_prog, fisheye_vao, fisheye_texture, screen, distortion=0.15, effects=CRT_EFFECTS)
+    try:
+        while not session.wait_connected(IDLE_FRAME_MS / 1000):
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    session.close()
+                    stop_capture()
+                    pygame.quit()
+                    sys.exit()
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                    session.close()
+                    return None
+            present_idle_frame()
+        return session, handshake(session, seed)
+    except (OSError, TimeoutError) as e:
+        print("Cannot start versus game:", e)
+        session.close()
+        return None
+
+def main(versus=None):
+    # versus - (sesja, ziarno) z connect_versus(): od razu partia z przeciwnikiem
     game = Game()
     current_screen = 'menu'
+    idle_since = pygame.time.get_ticks()
+    resume_paused = False
+    if versus is not None:
+        game.start_versus(*versus)
+        current_screen = 'game'
+    else:
+        # Gra przerwana zamknięciem okna wraca od razu, w pauzie
+        resume_paused = game.resume()
+        if resume_paused:
+            current_screen = 'game'
+            log_startup()
+
+    last_draw = 0
+    drawn_screen = None
 
     while True:
-        mouse_pos = pygame.mouse.get_pos()
+        events = []
+        if current_screen != 'game':
+            if POWER_SAVING:
+                # Do następnego taktu animacji CRT (albo do startu dema w menu) czekamy na zdarzenia
+                now = pygame.time.get_ticks()
+                timeout = last_draw + IDLE_FRAME_MS - now
+                if current_screen == 'menu':
+                    timeout = min(timeout, idle_since + ATTRACT_IDLE_MS - now)
+                events = wait_events(timeout)
+            else:
+                events = pygame.event.get()
+            if PAUSE_ON_FOCUS_LOSS and any(event.type in FOCUS_LOST_EVENTS for event in events):
+                wait_until_visible()
+                drawn_screen = None
+                events = pygame.event.get()
+
+        mouse_pos = canvas_mouse_pos()
+        if current_screen != 'menu':
+            idle_since = pygame.time.get_ticks()
+        # Ekran statyczny rysowany od nowa po zdarzeniu albo zmianie ekranu, w takcie animacji same efekty CRT
+        now = pygame.time.get_ticks()
+        redraw = not POWER_SAVING or bool(events) or current_screen != drawn_screen
+        idle_tick = not redraw and now - last_draw >= IDLE_FRAME_MS
 
         if current_screen == 'menu':
-            for event in pygame.event.get():
+            for event in events:
                 if event.type == pygame.QUIT:
+                    stop_capture()
                     pygame.quit()
                     sys.exit()
+                if event.type in (pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN, pygame.MOUSEMOTION):
+                    idle_since = pygame.time.get_ticks()
 
                 start_button.check_hover(mouse_pos)
                 quit_button.check_hover(mouse_pos)
@@ -1120,52 +2045,60 @@ def main():
                     game.reset_game()
                     current_screen = 'game'
                 if quit_button.is_clicked(mouse_pos, event):
+                    stop_capture()
                     pygame.quit()
                     sys.exit()
                 if options_button.is_clicked(mouse_pos, event):
                     current_screen = 'options'
 
-            draw_menu()
+            if current_screen == 'menu' and pygame.time.get_ticks() - idle_since > ATTRACT_IDLE_MS:
+                game.start_demo()
+                current_screen = 'game'
+            if redraw:
+                draw_menu()
 
         elif current_screen == 'options':
-            global current_theme_idx
-            for event in pygame.event.get():
+            for event in events:
                 if event.type == pygame.QUIT:
+                    stop_capture()
                     pygame.quit()
                     sys.exit()
                 back_button.check_hover(mouse_pos)
                 volume_slider.handle_event(event)
                 drop_volume_slider.handle_event(event)
                 pygame.mixer.music.set_volume(volume_slider.value)           
-                try:
-                    if drop_sound:
-                        drop_sound.set_volume(drop_volume_slider.value)
-                except Exception:
-                    pass
+                audio.set_volume("drop", drop_volume_slider.value)
                 if back_button.is_clicked(mouse_pos, event):
                     current_screen = 'menu'
                 theme_left_button.check_hover(mouse_pos)
                 theme_right_button.check_hover(mouse_pos)
                 if theme_left_button.is_clicked(mouse_pos, event): 
-                    current_theme_idx = (current_theme_idx - 1) % len(THEMES)
-                    apply_theme(current_theme_idx)
+                    apply_theme((current_theme_idx - 1) % len(THEMES))
                     rebuild_buttons()
                 if theme_right_button.is_clicked(mouse_pos, event):
-                    current_theme_idx = (current_theme_idx + 1) % len(THEMES)
-                    apply_theme(current_theme_idx)
+                    apply_theme((current_theme_idx + 1) % len(THEMES))
                     rebuild_buttons()
-            draw_options()
+            if redraw:
+                draw_options()
 
         elif current_screen == 'game':
-            result = game.run()
-            if result == 'menu':
+            result = game.run(paused=resume_paused)
+            resume_paused = False
+            # Partia versus kończy się z grą; Play Again zaczyna już zwykłą grę
+            game.end_versus()
+            if game.demo:
+                # Demo kończy się klawiszem albo końcem gry - zawsze powrót do menu
+                game.stop_demo()
+                current_screen = 'menu'
+            elif result == 'menu':
                 current_screen = 'menu'
             elif result == 'game_over':
                 current_screen = 'game_over'
 
         elif current_screen == 'game_over':
-            for event in pygame.event.get():
+            for event in events:
                 if event.type == pygame.QUIT:
+                    stop_capture()
                     pygame.quit()
                     sys.exit()
 
@@ -1178,15 +2111,38 @@ def main():
                 if menu_button.is_clicked(mouse_pos, event):
                     current_screen = 'menu'
 
-            draw_game_over(game.score)
+            if redraw:
+                draw_game_over(game.score, VERSUS_TITLES.get(game.versus_outcome, 'GAME OVER'))
 
-        clock.tick(FPS)
+        if idle_tick and current_screen == drawn_screen:
+            present_idle_frame()
+        if redraw or idle_tick:
+            last_draw = now
+            drawn_screen = current_screen
+        log_startup()
+        clock.tick(render_fps())
 
 if __name__ == "__main__":
-    show_bios_intro()
+    loader = init_game(background=True)
+    if "--capture" in sys.argv:
+        start_capture(sys.argv[sys.argv.index("--capture") + 1])
+    # Każde wyjście przez pygame.quit zamyka nagranie wcześniej (klatki z PBO są jeszcze do odczytu), finally - przy wyjątku
     try:
-        pygame.mixer.music.load(resource_path("theme.mp3"))
-        pygame.mixer.music.play(-1)
-    except Exception as e:
-        print("Cannot load music:", e)
-    main()
\ No newline at end of file
+        if "--replay" in sys.argv:
+            finish_loading(loader)
+            Game().watch_replay(sys.argv[sys.argv.index("--replay") + 1])
+            stop_capture()
+            pygame.quit()
+            sys.exit()
+        show_bios_intro(loader)
+        try:
+            pygame.mixer.music.load(resource_path("theme.mp3"))
+            pygame.mixer.music.play(-1)
+        except Exception as e:
+            print("Cannot load music:", e)
+        versus = None
+        if "--versus" in sys.argv or "--versus-host" in sys.argv:
+            versus = connect_versus(sys.argv)
+        main(versus)
+    finally:
+        stop_capture()
\ No newline at end of file
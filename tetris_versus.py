@@ -0,0 +1,292 @@
+import argparse
+import json
+import random
+import time
+
+from tetris_engine import GRID_WIDTH, GRID_HEIGHT, TIME_UNIT_MS, EVENT_LOCK, EVENT_CLEAR, TetrisEngine
+from tetris_bot import BotDriver
+from tetris_net import (
+    DEFAULT_PORT, PROTOCOL_VERSION, NetSession, encode_board_delta, apply_board_delta, board_checksum,
+    MSG_HELLO, MSG_PIECE, MSG_BOARD, MSG_FULL, MSG_CHECK, MSG_RESYNC, MSG_ATTACK, MSG_SCORE, MSG_OVER, MSG_CLOSED,
+    HELLO, PIECE, SEQ, CHECK, ATTACK, SCORE,
+)
+
+# Tryb versus dla dwóch graczy (bez pygame): każdy gra na własnym silniku w swoim procesie, przeciwnik
+# widzi jego planszę odtworzoną z różnic. Czyszczenie kilku linii naraz wysyła przeciwnikowi linie śmieci.
+# Uruchomiony bezpośrednio to bot-przeciwnik do gry i testów na jednym komputerze:
+#   python tetris_versus.py --host                      # bot czeka na gracza (tetris_single.py --versus 127.0.0.1)
+#   python tetris_versus.py --connect 127.0.0.1:7777    # bot dołącza do gracza (tetris_single.py --versus-host)
+
+# Linie śmieci za 1, 2, 3 i 4 linie wyczyszczone jednym klockiem
+GARBAGE_TABLE = (0, 0, 1, 2, 4)
+CHECK_INTERVAL_MS = 1000
+PING_INTERVAL_MS = 500
+HANDSHAKE_TIMEOUT_S = 5.0
+
+LOGIC_HZ = 120
+BOT_FPS = 60
+BOT_ACTION_MS = 150
+
+
+def handshake(session, seed=None, timeout=HANDSHAKE_TIMEOUT_S):
+    # Obie strony wysyłają HELLO; ziarno klocków ustala ta, która je podała (gospodarz) - obaj gracze
+    # dostają te same klocki. Zwraca wspólne ziarno.
+    session.send(MSG_HELLO, HELLO.pack(PROTOCOL_VERSION, seed or 0))
+    session.flush()
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        # HELLO jest pierwszą wiadomością przeciwnika; to, co przyszło za nim, zostaje w kolejce dla VersusLink
+        if not session.inbox:
+            time.sleep(0.001)
+            continue
+        msg_type, payload = session.inbox.popleft()
+        if msg_type == MSG_CLOSED:
+            raise ConnectionError("opponent disconnected")
+        if msg_type != MSG_HELLO:
+            continue
+        version, peer_seed = HELLO.unpack(payload)
+        if version != PROTOCOL_VERSION:
+            raise ConnectionError("opponent uses protocol version {}, expected {}".format(version, PROTOCOL_VERSION))
+        return seed if seed is not None else peer_seed
+    raise TimeoutError("no HELLO from the opponent")
+
+
+class RemoteBoard:
+    # Stan przeciwnika złożony z jego wiadomości
+    def __init__(self):
+        self.grid = [bytearray(GRID_WIDTH) for _ in range(GRID_HEIGHT)]
+        self.seq = 0
+        self.block = None
+        self.score = 0
+        self.lines_cleared = 0
+        self.level = 1
+        self.game_over = False
+        self.disconnected = False
+        self.desyncs = 0
+
+    def handle(self, msg_type, payload):
+        # True, gdy plansza rozjechała się z planszą przeciwnika i trzeba poprosić o całą
+        if msg_type == MSG_BOARD:
+            self.seq, = SEQ.unpack_from(payload)
+            self.grid = apply_board_delta(self.grid, memoryview(payload)[SEQ.size:])
+        elif msg_type == MSG_FULL:
+            self.seq, = SEQ.unpack_from(payload)
+            cells = payload[SEQ.size:]
+            self.grid = [bytearray(cells[y * GRID_WIDTH:(y + 1) * GRID_WIDTH]) for y in range(GRID_HEIGHT)]
+        elif msg_type == MSG_CHECK:
+            seq, checksum = CHECK.unpack(payload)
+            if seq != self.seq or checksum != board_checksum(self.grid):
+                self.desyncs += 1
+                return True
+        elif msg_type == MSG_PIECE:
+            self.block = PIECE.unpack(payload)
+        elif msg_type == MSG_SCORE:
+            self.score, self.lines_cleared, self.level = SCORE.unpack(payload)
+        elif msg_type == MSG_OVER:
+            self.game_over = True
+        elif msg_type == MSG_CLOSED:
+            self.disconnected = True
+        return False
+
+
+class VersusLink:
+    # Łączy silnik lokalnego gracza z sesją sieciową. update(events) raz na klatkę (albo krok) ze zdarzeniami
+    # silnika: wysyła zmiany i atak, przyjmuje śmieci i planszę przeciwnika.
+    def __init__(self, engine, session, seed):
+        self.engine = engine
+        self.session = session
+        self.seed = seed
+        # Dziury w śmieciach losuje nadawca; osobny generator, żeby nie ruszać kolejności klocków
+        self.hole_rng = random.Random()
+        self.remote = RemoteBoard()
+        self.pending_garbage = []
+        self.sent_grid = None
+        self.seq = 0
+        self.sent_block = None
+        self.sent_score = None
+        self.sent_over = False
+        self.next_check = 0.0
+        self.next_ping = 0.0
+        # Statystyki: zablokowane klocki, wysłane różnice i ich rozmiar, linie śmieci w obie strony
+        self.locks = 0
+        self.deltas = 0
+        self.delta_bytes = 0
+        self.garbage_sent = 0
+        self.garbage_received = 0
+
+    def start(self):
+        # Nowa partia od wspólnego ziarna - obaj gracze dostają te same klocki
+        self.engine.rng.state = self.seed
+        self.engine.reset_game()
+        self.sent_grid = [bytes(row) for row in self.engine.grid]
+        self.seq = 0
+
+    def finished(self):
+        return self.engine.game_over or self.remote.game_over or self.remote.disconnected
+
+    def outcome(self):
+        # "win", "lose", "left" (przeciwnik się rozłączył) albo None, gdy partia trwa
+        if self.engine.game_over:
+            return "lose"
+        if self.remote.game_over:
+            return "win"
+        if self.remote.disconnected:
+            return "left"
+        return None
+
+    def update(self, events):
+        session = self.session
+        for msg_type, payload in session.poll():
+            if msg_type == MSG_ATTACK:
+                lines, hole = ATTACK.unpack(payload)
+                self.pending_garbage.append((lines, hole))
+                self.garbage_received += lines
+            elif msg_type == MSG_RESYNC:
+                session.send(MSG_FULL, SEQ.pack(self.seq) + b"".join(self.sent_grid))
+            elif self.remote.handle(msg_type, payload):
+                session.send(MSG_RESYNC)
+
+        engine = self.engine
+        locked = cleared = False
+        attack = 0
+        for event in events:
+            if event[0] == EVENT_LOCK:
+                locked = True
+                self.locks += 1
+            elif event[0] == EVENT_CLEAR:
+                cleared = True
+                attack += GARBAGE_TABLE[min(event[1], len(GARBAGE_TABLE) - 1)]
+        # Atak najpierw znosi czekające śmieci, reszta idzie do przeciwnika
+        while attack and self.pending_garbage:
+            lines, hole = self.pending_garbage[0]
+            cancelled = min(attack, lines)
+            attack -= cancelled
+            if cancelled == lines:
+                self.pending_garbage.pop(0)
+            else:
+                self.pending_garbage[0] = (lines - cancelled, hole)
+        if attack:
+            session.send(MSG_ATTACK, ATTACK.pack(attack, self.hole_rng.randrange(GRID_WIDTH)))
+            self.garbage_sent += attack
+        if locked and not cleared and self.pending_garbage and not engine.game_over:
+            # Śmieci wchodzą, gdy klocek legnie bez czyszczenia linii
+            for lines, hole in self.pending_garbage:
+                engine.add_garbage(lines, hole)
+            self.pending_garbage = []
+
+        grid = [bytes(row) for row in engine.grid]
+        if grid != self.sent_grid:
+            delta = encode_board_delta(self.sent_grid, grid)
+            self.seq = (self.seq + 1) & 0xFFFF
+            session.send(MSG_BOARD, SEQ.pack(self.seq) + delta)
+            self.sent_grid = grid
+            self.deltas += 1
+            self.delta_bytes += len(delta)
+
+        block = engine.current_block
+        pose = None if engine.clearing_rows else (block.x, block.y, block.shape_id, block.rotation)
+        if pose != self.sent_block and pose is not None:
+            session.send(MSG_PIECE, PIECE.pack(*pose))
+        self.sent_block = pose
+        score = (engine.score, engine.lines_cleared, engine.level)
+        if score != self.sent_score:
+            session.send(MSG_SCORE, SCORE.pack(*score))
+            self.sent_score = score
+        if engine.game_over and not self.sent_over:
+            session.send(MSG_OVER)
+            self.sent_over = True
+
+        now = time.perf_counter() * 1000
+        if now >= self.next_check:
+            session.send(MSG_CHECK, CHECK.pack(self.seq, board_checksum(self.sent_grid)))
+            self.next_check = now + CHECK_INTERVAL_MS
+        if now >= self.next_ping:
+            session.ping()
+            self.next_ping = now + PING_INTERVAL_MS
+        session.flush()
+
+    def stats(self):
+        stats = self.session.stats()
+        stats.update(
+            locks=self.locks,
+            deltas=self.deltas,
+            delta_bytes_avg=self.delta_bytes / self.deltas if self.deltas else 0.0,
+            garbage_sent=self.garbage_sent,
+            garbage_received=self.garbage_received,
+            desyncs=self.remote.desyncs,
+            outcome=self.outcome(),
+        )
+        return stats
+
+
+def play_bot(link, seconds=None, action_ms=BOT_ACTION_MS, fps=BOT_FPS):
+    # Bot w czasie rzeczywistym: kroki logiki LOGIC_HZ, wymiana z przeciwnikiem raz na klatkę fps
+    engine = link.engine
+    driver = BotDriver(action_ms=action_ms)
+    step_ms = 1000 / LOGIC_HZ
+    frame_s = 1 / fps
+    steps_per_frame = LOGIC_HZ // fps
+    start = next_frame = time.perf_counter()
+    link.start()
+    while not link.finished() and (seconds is None or time.perf_counter() - start < seconds):
+        for _ in range(steps_per_frame):
+            engine.step(driver.inputs(engine, step_ms), step_ms / TIME_UNIT_MS)
+            if engine.game_over:
+                break
+        link.update(engine.drain_events())
+        next_frame += frame_s
+        time.sleep(max(0.0, next_frame - time.perf_counter()))
+    # Ostatnie wiadomości przeciwnika (np. jego koniec gry) i chwila na wysłanie własnych
+    time.sleep(0.1)
+    link.update(engine.drain_events())
+
+
+def parse_address(text):
+    host, _, port = text.rpartition(":")
+    if not host:
+        return text, DEFAULT_PORT
+    return host, int(port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless bot opponent for the versus mode")
+    role = parser.add_mutually_exclusive_group(required=True)
+    role.add_argument("--host", action="store_true", help="wait for the player to connect")
+    role.add_argument("--connect", metavar="HOST[:PORT]", help="connect to a player who hosts")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on with --host")
+    parser.add_argument("--action-ms", type=float, default=BOT_ACTION_MS, help="bot speed: one action every N ms")
+    parser.add_argument("--seconds", type=float, help="stop after this long even if nobody lost")
+    parser.add_argument("--seed", type=int, help="piece seed when hosting (random by default)")
+    parser.add_argument("--json", action="store_true", help="print the final statistics as JSON")
+    args = parser.parse_args()
+
+    session = NetSession()
+    if args.host:
+        session.host(args.port)
+        print("waiting for the opponent on port {}".format(args.port), flush=True)
+        seed = args.seed if args.seed is not None else random.getrandbits(63)
+    else:
+        session.connect(*parse_address(args.connect))
+        seed = None
+    session.wait_connected()
+    link = VersusLink(TetrisEngine(), session, handshake(session, seed))
+    try:
+        play_bot(link, args.seconds, args.action_ms)
+    finally:
+        session.close()
+
+    stats = link.stats()
+    if args.json:
+        print(json.dumps(stats))
+        return
+    print("result: {}, score {}, {} pieces, garbage sent {} / received {}".format(
+        stats["outcome"] or "no result", link.engine.score, stats["locks"], stats["garbage_sent"],
+        stats["garbage_received"]))
+    print("sent {:.0f} B/s, received {:.0f} B/s, {:.1f} B per board delta, {} desyncs".format(
+        stats["sent_bps"], stats["received_bps"], stats["delta_bytes_avg"], stats["desyncs"]))
+    print("rtt ms: p50 {:.2f}  p95 {:.2f}  p99 {:.2f}  max {:.2f}".format(
+        stats["rtt_p50"], stats["rtt_p95"], stats["rtt_p99"], stats["rtt_max"]))
+
+
+if __name__ == "__main__":
+    main()